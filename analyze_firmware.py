@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 """
 Analyze firmware zip to extract ARB index.
-Wraps payload-dumper-go and arbextract usage.
+Extracts xbl_config with the built-in payload reader and reads the ARB
+index with the built-in ELF parser; otaripper, payload-dumper-go and
+arbextract remain as fallbacks.
+With --url, xbl_config is pulled straight from the remote OTA via HTTP Range requests,
+or, if the server ignores Range, from a plain download that is read as it arrives
+and aborted as soon as xbl_config is complete.
 """
 
 import shlex
@@ -30,6 +35,10 @@ def run_command(cmd, cwd=None):
 
 import shutil
 import zipfile
+from payload import locate_payload, read_manifest, extract_partition, find_partition, scan_zip_stream
+from remote_file import RemoteFile, StreamingFile, signed_url_refresher
+from arb_reader import read_arb
+from blob_cache import BlobCache
 
 def extract_ota_metadata(zip_path):
     """Peek into the zip to find META-INF/com/android/metadata"""
@@ -60,17 +69,193 @@ def extract_ota_metadata(zip_path):
         logger.warning(f"Failed to extract metadata from zip: {e}")
     return metadata
 
-def analyze_firmware(zip_path, tools_dir, output_dir, final_dir=None):
-    zip_path = Path(zip_path).resolve()
+def restore_cached_partition(cache, manifest, partition, final_img):
+    """Restore the partition from the blob cache if the manifest's partition hash is known."""
+    if not cache:
+        return False
+    info = find_partition(manifest, partition)
+    if not info or not info['hash']:
+        return False
+    if cache.restore_blob(info['hash'].hex(), final_img):
+        logger.info(f"{partition} hash {info['hash'].hex()[:12]} found in blob cache, skipping data fetch")
+        return True
+    return False
+
+def extract_remote(url, final_img, partition="xbl_config", cache=None, refresh=None):
+    """
+    Extract a single partition from a remote OTA zip without downloading it.
+    Reads the zip central directory, payload header/manifest and the partition's
+    data blobs via Range requests (the blobs prefetched together, coalesced).
+    refresh optionally re-signs an expired URL (see remote_file.signed_url_refresher).
+    Returns OTA metadata dict, or None on failure.
+    """
+    try:
+        with RemoteFile(url, refresh=refresh) as remote:
+            metadata = extract_ota_metadata(remote)
+            payload_offset = locate_payload(remote)
+            header, manifest = read_manifest(remote, payload_offset)
+            if not restore_cached_partition(cache, manifest, partition, final_img):
+                info = find_partition(manifest, partition)
+                if info:
+                    remote.prefetch((header['data_offset'] + op['data_offset'], op['data_length'])
+                                    for op in info['operations'])
+                extract_partition(remote, partition, payload_offset, header, manifest, out_path=final_img)
+            logger.info(f"Remote extraction fetched {remote.bytes_fetched} bytes "
+                        f"in {remote.requests_made} requests (zip size {remote.size}, {remote.cache_hits} block cache hits)")
+    except Exception as e:
+        logger.error(f"Remote extraction failed: {e}")
+        return None
+
+    logger.info(f"Extracted {partition} to {final_img}")
+    return metadata
+
+OTA_METADATA_NAME = 'META-INF/com/android/metadata'
+
+def extract_streaming(url, final_img, partition="xbl_config", cache=None):
+    """
+    Extract a single partition from a plain (non-Range) download of an OTA zip.
+    Local zip headers, payload header/manifest and the partition's blobs are parsed
+    as the bytes arrive; the transfer is closed once the partition is complete, so
+    nothing is written to disk and the rest of the payload is never downloaded.
+    Returns OTA metadata dict, or None on failure.
+    """
+    metadata = {}
+    try:
+        with StreamingFile(url) as stream:
+            payload_offset, entries = scan_zip_stream(stream, keep=(OTA_METADATA_NAME,))
+            for line in entries.get(OTA_METADATA_NAME, b'').decode('utf-8', 'replace').splitlines():
+                if '=' in line:
+                    k, v = line.split('=', 1)
+                    metadata[k.strip()] = v.strip()
+            header, manifest = read_manifest(stream, payload_offset)
+            if not restore_cached_partition(cache, manifest, partition, final_img):
+                extract_partition(stream, partition, payload_offset, header, manifest, out_path=final_img)
+            total = f"{stream.size} bytes" if stream.size else "unknown size"
+            logger.info(f"Streaming extraction stopped after {stream.bytes_received} bytes (zip {total})")
+    except Exception as e:
+        logger.error(f"Streaming extraction failed: {e}")
+        return None
+
+    logger.info(f"Extracted {partition} to {final_img}")
+    return metadata
+
+def extract_local(zip_path, final_img, partition="xbl_config", cache=None):
+    """Extract a partition from a local OTA zip with the built-in payload reader."""
+    try:
+        logger.info("Attempting in-process payload extraction...")
+        with open(zip_path, 'rb') as f:
+            payload_offset = locate_payload(f)
+            header, manifest = read_manifest(f, payload_offset)
+            if not restore_cached_partition(cache, manifest, partition, final_img):
+                extract_partition(f, partition, payload_offset, header, manifest, out_path=final_img)
+    except Exception as e:
+        logger.warning(f"In-process extraction failed: {e}")
+        return False
+    logger.info(f"Extracted {partition} to {final_img}")
+    return True
+
+def extract_with_tools(zip_path, tools_dir, output_dir, final_dir, final_img):
+    """Extract xbl_config with otaripper, falling back to payload-dumper-go."""
+    otaripper = tools_dir / "otaripper"
+
+    # Clean/Create directories for extraction
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.mkdir(parents=True)
+    
+    if not final_dir.exists():
+        final_dir.mkdir(parents=True)
+        
+    # otaripper <zip> -p <partitions> -o <output>
+    cmd_extract = [str(otaripper), str(zip_path), "-p", "xbl_config", "-o", str(output_dir), "-n"]
+    logger.info("Attempting extraction with otaripper...")
+    
+    if not run_command(cmd_extract):
+        logger.warning("otaripper failed, attempting fallback with payload-dumper-go...")
+        
+        # Fallback to payload-dumper-go
+        # payload-dumper-go -p <partitions> -o <output> <zip>
+        pdg = tools_dir / "payload-dumper-go"
+        cmd_fallback = [str(pdg), "-p", "xbl_config", "-o", str(output_dir), str(zip_path)]
+        
+        if not run_command(cmd_fallback):
+            logger.error("Both otaripper and payload-dumper-go failed to extract firmware.")
+            return False
+        
+    # Find extracted image recursively
+    img_files = list(output_dir.rglob("*xbl_config*.img"))
+    if not img_files:
+        logger.error("xbl_config image not found in extraction output")
+        return False
+    
+    # Move and rename
+    src_img = img_files[0]
+    logger.info(f"Found image: {src_img}")
+    logger.info(f"Moving to: {final_img}")
+    shutil.move(src_img, final_img)
+    
+    # Cleanup temp extraction
+    shutil.rmtree(output_dir)
+
+    return True
+
+def read_arb_info(final_img, arbextract):
+    """
+    Read ARB index and OEM version. Values are strings, as parsed from arbextract output.
+    Uses the in-process ELF parser and only spawns arbextract if that fails.
+    """
+    try:
+        info = read_arb(final_img)
+        logger.info(f"Read ARB in-process (MBN v{info['mbn_version']})")
+        return {k: str(info[k]) for k in ('arb_index', 'major', 'minor')}
+    except (OSError, ValueError) as e:
+        logger.warning(f"In-process ARB parsing failed ({e}), falling back to arbextract...")
+
+    cmd_arb = [str(arbextract), str(final_img)]
+    output = run_command(cmd_arb)
+    if not output:
+        return None
+        
+    # Parse Output
+    # Expected output format from arbextract:
+    # ARB (Anti-Rollback): 1
+    # Major Version: 3
+    # Minor Version: 0
+    
+    result = {}
+    for line in output.splitlines():
+        if "ARB (Anti-Rollback)" in line:
+            result['arb_index'] = line.split(':')[-1].strip()
+        elif "Major Version" in line:
+            result['major'] = line.split(':')[-1].strip()
+        elif "Minor Version" in line:
+            result['minor'] = line.split(':')[-1].strip()
+    return result
+
+def analyze_firmware(zip_path, tools_dir, output_dir, final_dir=None, url=None, cache=None, cache_key=None):
+    """
+    Extract xbl_config and read its ARB index.
+    cache is an optional BlobCache; cache_key is (device, variant, version) for its index.
+    """
+    zip_path = Path(zip_path).resolve() if zip_path else None
     tools_dir = Path(tools_dir).resolve()
     output_dir = Path(output_dir).resolve()
     final_dir = Path(final_dir).resolve() if final_dir else Path("firmware_data").resolve()
     
-    otaripper = tools_dir / "otaripper"
     arbextract = tools_dir / "arbextract"
     
     final_img = final_dir / "xbl_config.img"
     
+    # Known (device, variant, version) with a memoized result: nothing to fetch or parse
+    if cache and cache_key:
+        digest = cache.lookup(*cache_key)
+        cached_result = cache.get_result(digest)
+        if cached_result:
+            logger.info(f"Blob cache hit for {' '.join(cache_key)} ({digest[:12]})")
+            if not final_img.exists():
+                cache.restore_blob(digest, final_img)
+            return dict(cached_result)
+    
     # 0. Extract basic metadata (always try even if cache hit)
     metadata = {}
     if zip_path and Path(zip_path).exists():
@@ -79,6 +264,15 @@ def analyze_firmware(zip_path, tools_dir, output_dir, final_dir=None):
     # 1. Skip extraction if image already exists (cache hit optimization)
     if final_img.exists():
         logger.info(f"Image already exists at {final_img}, skipping extraction.")
+    elif url:
+        refresh = signed_url_refresher(*cache_key) if cache_key else None
+        remote_metadata = extract_remote(url, final_img, cache=cache, refresh=refresh)
+        if remote_metadata is None:
+            logger.info("Falling back to streaming the download up to the end of the partition...")
+            remote_metadata = extract_streaming(url, final_img, cache=cache)
+        if remote_metadata is None:
+            return None
+        metadata = metadata or remote_metadata
     else:
         if not zip_path or not Path(zip_path).exists():
             logger.error("Missing firmware.zip and no cached image found.")
@@ -86,69 +280,31 @@ def analyze_firmware(zip_path, tools_dir, output_dir, final_dir=None):
         
         zip_path = Path(zip_path).resolve()
 
-        # 2. Clean/Create directories for extraction
-        if output_dir.exists():
-            shutil.rmtree(output_dir)
-        output_dir.mkdir(parents=True)
-        
-        if not final_dir.exists():
-            final_dir.mkdir(parents=True)
-            
-        # otaripper <zip> -p <partitions> -o <output>
-        cmd_extract = [str(otaripper), str(zip_path), "-p", "xbl_config", "-o", str(output_dir), "-n"]
-        logger.info("Attempting extraction with otaripper...")
-        
-        if not run_command(cmd_extract):
-            logger.warning("otaripper failed, attempting fallback with payload-dumper-go...")
-            
-            # Fallback to payload-dumper-go
-            # payload-dumper-go -p <partitions> -o <output> <zip>
-            pdg = tools_dir / "payload-dumper-go"
-            cmd_fallback = [str(pdg), "-p", "xbl_config", "-o", str(output_dir), str(zip_path)]
-            
-            if not run_command(cmd_fallback):
-                logger.error("Both otaripper and payload-dumper-go failed to extract firmware.")
-                return None
-            
-        # 3. Find extracted image recursively
-        img_files = list(output_dir.rglob("*xbl_config*.img"))
-        if not img_files:
-            logger.error("xbl_config image not found in extraction output")
+        # 2. Extract in-process, fall back to external tools
+        if not extract_local(zip_path, final_img, cache=cache) and \
+                not extract_with_tools(zip_path, tools_dir, output_dir, final_dir, final_img):
             return None
-        
-        # Move and rename
-        src_img = img_files[0]
-        logger.info(f"Found image: {src_img}")
-        logger.info(f"Moving to: {final_img}")
-        shutil.move(src_img, final_img)
-        
-        # Cleanup temp extraction
-        shutil.rmtree(output_dir)
     
-    # 3. Run arbextract on the FINAL file
-    cmd_arb = [str(arbextract), str(final_img)]
-    output = run_command(cmd_arb)
-    if not output:
-        return None
+    # 3. Read ARB in-process, fall back to arbextract on the FINAL file
+    #    (memoized per image hash when a blob cache is in use)
+    digest = cache.put_blob(final_img) if cache else None
+    result = cache.get_result(digest) if cache else None
+    if result:
+        logger.info(f"Using memoized ARB result for blob {digest[:12]}")
+        result = dict(result)
+    else:
+        result = read_arb_info(final_img, arbextract)
+        if result is None:
+            return None
         
-    # 4. Parse Output
-    # Expected output format from arbextract:
-    # ARB (Anti-Rollback): 1
-    # Major Version: 3
-    # Minor Version: 0
-    
-    result = {}
-    for line in output.splitlines():
-        if "ARB (Anti-Rollback)" in line:
-            result['arb_index'] = line.split(':')[-1].strip()
-        elif "Major Version" in line:
-            result['major'] = line.split(':')[-1].strip()
-        elif "Minor Version" in line:
-            result['minor'] = line.split(':')[-1].strip()
-            
     if 'arb_index' not in result:
         logger.error("Could not parse ARB index from arbextract output")
         return None
+
+    if cache:
+        cache.put_result(digest, result)
+        if cache_key:
+            cache.record(*cache_key, digest)
         
     # Append metadata
     if metadata:
@@ -158,15 +314,31 @@ def analyze_firmware(zip_path, tools_dir, output_dir, final_dir=None):
 
 def main():
     parser = argparse.ArgumentParser(description="Analyze firmware ARB index.")
-    parser.add_argument("zip_path", help="Path to firmware.zip")
+    parser.add_argument("zip_path", nargs="?", help="Path to firmware.zip")
+    parser.add_argument("--url", help="Firmware URL to read remotely via HTTP Range requests instead of a local zip")
     parser.add_argument("--tools-dir", default="tools", help="Directory containing payload-dumper and arbextract")
     parser.add_argument("--output-dir", default="extracted", help="Directory for extraction")
     parser.add_argument("--final-dir", default="firmware_data", help="Directory for final xbl_config.img")
     parser.add_argument("--json", action="store_true", help="Output result as JSON")
+    parser.add_argument("--cache-dir", help="Content-addressed blob cache directory (shared across devices/regions)")
+    parser.add_argument("--device", help="Device ID, for the blob cache index")
+    parser.add_argument("--variant", help="Region variant, for the blob cache index")
+    parser.add_argument("--version", help="Firmware version, for the blob cache index")
     
     args = parser.parse_args()
+    cache_key = None
+    if args.device and args.variant and args.version:
+        cache_key = (args.device, args.variant, args.version)
+    if not args.zip_path and not args.url:
+        if not args.cache_dir:
+            parser.error("one of zip_path, --url or --cache-dir (with --device/--variant/--version) is required")
+        if not cache_key:
+            parser.error("--cache-dir without zip_path or --url requires --device, --variant and --version")
+    
+    cache = BlobCache(args.cache_dir) if args.cache_dir else None
     
-    result = analyze_firmware(args.zip_path, args.tools_dir, args.output_dir, args.final_dir)
+    result = analyze_firmware(args.zip_path, args.tools_dir, args.output_dir, args.final_dir,
+                              url=args.url, cache=cache, cache_key=cache_key)
     
     if result:
         if args.json:
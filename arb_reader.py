@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+In-process replacement for arbextract.
+Reads the anti-rollback (ARB) index and OEM metadata version from a
+Qualcomm signed xbl_config ELF image.
+
+Layout walked here:
+  ELF program headers -> hash segment (Qualcomm segment type 2 in p_flags)
+  hash segment        -> MBN hash table segment header (v3/v5/v6/v7)
+  header              -> [common metadata] [QTI metadata] [OEM metadata] [hash table] ...
+  OEM metadata        -> major/minor version + anti_rollback_version
+"""
+
+import sys
+import json
+import mmap
+import struct
+import argparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+ELF_MAGIC = b'\x7fELF'
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+
+# Qualcomm encodes the segment type in bits 24-26 of p_flags
+QCOM_SEGMENT_TYPE_SHIFT = 24
+QCOM_SEGMENT_TYPE_MASK = 0x7
+QCOM_SEGMENT_HASH = 2
+
+# Hash segment header sizes (bytes)
+MBN_V6_HEADER_SIZE = 48
+MBN_V7_HEADER_SIZE = 36
+
+# Offset of anti_rollback_version inside the OEM metadata, by metadata major version.
+# 0.x is the 120-byte legacy block (ARB is the last word); 1.x and later put it right
+# after the version fields.
+ARB_OFFSET_LEGACY = 116
+ARB_OFFSET = 8
+
+
+def _u32(buf, offset: int) -> int:
+    return struct.unpack_from('<I', buf, offset)[0]
+
+
+def _program_headers(buf):
+    """Yield (p_type, p_flags, p_offset, p_filesz) for every ELF program header."""
+    if len(buf) < 52 or buf[:4] != ELF_MAGIC:
+        raise ValueError("Not an ELF image")
+    elf_class = buf[4]
+    if elf_class == ELFCLASS64:
+        phoff = struct.unpack_from('<Q', buf, 0x20)[0]
+        phentsize, phnum = struct.unpack_from('<HH', buf, 0x36)
+        for i in range(phnum):
+            p_type, p_flags, p_offset, _, _, p_filesz = struct.unpack_from('<IIQQQQ', buf, phoff + i * phentsize)
+            yield p_type, p_flags, p_offset, p_filesz
+    elif elf_class == ELFCLASS32:
+        phoff = _u32(buf, 0x1C)
+        phentsize, phnum = struct.unpack_from('<HH', buf, 0x2A)
+        for i in range(phnum):
+            p_type, p_offset, _, _, p_filesz, _, p_flags = struct.unpack_from('<7I', buf, phoff + i * phentsize)
+            yield p_type, p_flags, p_offset, p_filesz
+    else:
+        raise ValueError(f"Unknown ELF class {elf_class}")
+
+
+def find_hash_segment(buf):
+    """Return (offset, size) of the Qualcomm hash segment."""
+    for _, p_flags, p_offset, p_filesz in _program_headers(buf):
+        if (p_flags >> QCOM_SEGMENT_TYPE_SHIFT) & QCOM_SEGMENT_TYPE_MASK == QCOM_SEGMENT_HASH:
+            if p_offset + p_filesz > len(buf):
+                raise ValueError("Hash segment extends beyond end of image")
+            return p_offset, p_filesz
+    raise ValueError("No hash segment found in ELF program headers")
+
+
+def _metadata_location(buf, seg_offset: int):
+    """Return (header_version, offset, size) of the metadata block holding the ARB value."""
+    if _u32(buf, seg_offset) == 7:
+        # v7: version, common_metadata_size, qti_metadata_size, oem_metadata_size, ...
+        common_size, qti_size, oem_size = struct.unpack_from('<III', buf, seg_offset + 4)
+        base = seg_offset + MBN_V7_HEADER_SIZE + common_size
+        if oem_size:
+            return 7, base + qti_size, oem_size
+        return 7, base, qti_size
+
+    version = _u32(buf, seg_offset + 4)
+    if version == 6:
+        # v6: image_id, version, 8 legacy size/pointer words, qti_metadata_size, oem_metadata_size
+        qti_size, oem_size = struct.unpack_from('<II', buf, seg_offset + 40)
+        base = seg_offset + MBN_V6_HEADER_SIZE
+        if oem_size:
+            return 6, base + qti_size, oem_size
+        return 6, base, qti_size
+    if version in (3, 5):
+        raise ValueError(f"MBN header v{version} carries no metadata; ARB is not available")
+    raise ValueError(f"Unsupported MBN hash segment header version {version}")
+
+
+def parse_arb(buf) -> dict:
+    """Parse an xbl_config image held in any bytes-like buffer (bytes, mmap, memoryview)."""
+    seg_offset, seg_size = find_hash_segment(buf)
+    header_version, meta_offset, meta_size = _metadata_location(buf, seg_offset)
+    if meta_size < 12 or meta_offset + meta_size > seg_offset + seg_size:
+        raise ValueError(f"Invalid metadata block (offset {meta_offset}, size {meta_size})")
+
+    major, minor = struct.unpack_from('<II', buf, meta_offset)
+    arb_offset = ARB_OFFSET_LEGACY if major == 0 else ARB_OFFSET
+    if arb_offset + 4 > meta_size:
+        raise ValueError(f"Metadata v{major}.{minor} too small ({meta_size} bytes)")
+
+    return {
+        'arb_index': _u32(buf, meta_offset + arb_offset),
+        'major': major,
+        'minor': minor,
+        'mbn_version': header_version,
+    }
+
+
+def read_arb(path) -> dict:
+    """Read ARB info from an image file via mmap."""
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError(f"{path} is empty")
+        with mapped:
+            return parse_arb(mapped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read ARB index from xbl_config images.")
+    parser.add_argument("images", nargs="+", help="Path(s) to xbl_config.img")
+    parser.add_argument("--json", action="store_true", help="Output result as JSON (arbextract-compatible keys)")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    failed = False
+    for image in args.images:
+        try:
+            info = read_arb(image)
+        except (OSError, ValueError) as e:
+            logger.error(f"{image}: {e}")
+            failed = True
+            continue
+
+        if args.json:
+            # Strings, to match what analyze_firmware.py emits from arbextract output
+            print(json.dumps({k: str(info[k]) for k in ('arb_index', 'major', 'minor')}))
+        else:
+            if len(args.images) > 1:
+                print(f"{image}:")
+            print(f"ARB (Anti-Rollback): {info['arb_index']}")
+            print(f"Major Version: {info['major']}")
+            print(f"Minor Version: {info['minor']}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
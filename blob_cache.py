@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for extracted xbl_config images.
+
+Layout under the cache root:
+  blobs/<sha256>.img   extracted partition images, keyed by SHA-256
+  index.json           {"<device>_<variant>": {"<version>": "<sha256>"}}
+  results.json         {"<sha256>": {"arb_index": ..., "major": ..., "minor": ...}}
+
+The payload manifest records the SHA-256 of every partition image
+(new_partition_info.hash), so identical xbl_config partitions shipped in
+different regions or re-published builds map to the same blob and the same
+memoized ARB result, and can be recognised before any data blob is fetched.
+
+In CI one rolling Actions cache holds the store: matrix jobs restore it and
+upload only what they added, and update-readme folds those uploads back in
+with --merge before saving a single new cache entry.
+"""
+
+import os
+import json
+import argparse
+import shutil
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "blob_cache"
+
+
+def sha256_file(path) -> str:
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path: Path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _copy_atomic(source, target: Path):
+    """Copy via a unique temp file and rename, so concurrent writers of one digest never collide."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _load_json(path: Path) -> Dict:
+    if not path.exists():
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable cache file {path}: {e}")
+        return {}
+
+
+class BlobCache:
+    """Blob store plus (device, variant, version) index and per-hash ARB results."""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.index_path = self.root / "index.json"
+        self.results_path = self.root / "results.json"
+        self.index = _load_json(self.index_path)
+        self.results = _load_json(self.results_path)
+
+    # Index: (device, variant, version) -> hash
+
+    def lookup(self, device: str, variant: str, version: str) -> Optional[str]:
+        return self.index.get(f"{device}_{variant}", {}).get(version)
+
+    def record(self, device: str, variant: str, version: str, digest: str):
+        self.index.setdefault(f"{device}_{variant}", {})[version] = digest
+        _write_json_atomic(self.index_path, self.index)
+
+    # Blobs: hash -> image
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blob_dir / f"{digest}.img"
+
+    def has_blob(self, digest: str) -> bool:
+        return bool(digest) and self.blob_path(digest).exists()
+
+    def put_blob(self, image_path) -> str:
+        """Store an image file (if not already present) and return its hex SHA-256."""
+        digest = sha256_file(image_path)
+        target = self.blob_path(digest)
+        if not target.exists():
+            _copy_atomic(image_path, target)
+            logger.info(f"Stored blob {digest[:12]}")
+        return digest
+
+    def restore_blob(self, digest: str, dest) -> bool:
+        """Copy a cached blob to dest. Returns False if the blob is unknown."""
+        if not self.has_blob(digest):
+            return False
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(self.blob_path(digest), dest)
+        logger.info(f"Restored blob {digest[:12]} to {dest}")
+        return True
+
+    # Results: hash -> memoized ARB result
+
+    def get_result(self, digest: str) -> Optional[Dict]:
+        return self.results.get(digest) if digest else None
+
+    def put_result(self, digest: str, result: Dict):
+        self.results[digest] = {k: result[k] for k in ('arb_index', 'major', 'minor') if k in result}
+        _write_json_atomic(self.results_path, self.results)
+
+    def merge(self, other_root) -> int:
+        """Fold another store (e.g. a CI job's additions) into this one. Returns the number of blobs copied."""
+        other = BlobCache(other_root)
+        copied = 0
+        for blob in sorted(other.blob_dir.glob('*.img')) if other.blob_dir.exists() else []:
+            target = self.blob_dir / blob.name
+            if not target.exists():
+                _copy_atomic(blob, target)
+                copied += 1
+        for key, versions in other.index.items():
+            self.index.setdefault(key, {}).update(versions)
+        self.results.update(other.results)
+        _write_json_atomic(self.index_path, self.index)
+        _write_json_atomic(self.results_path, self.results)
+        return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the xbl_config blob store.")
+    parser.add_argument("--root", default=DEFAULT_CACHE_DIR, help="Blob store directory")
+    parser.add_argument("--merge", metavar="ARTIFACTS_DIR", required=True,
+                        help="Fold every store (directory with an index.json) under a directory into --root")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    cache = BlobCache(args.root)
+    stores = sorted({p.parent for p in Path(args.merge).rglob('index.json')})
+    copied = sum(cache.merge(store) for store in stores)
+    logger.info(f"Merged {len(stores)} store(s) into {args.root}, {copied} new blob(s)")
+
+
+if __name__ == "__main__":
+    main()
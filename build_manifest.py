@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Content-hash manifest for incremental site builds.
+
+The manifest (<output_dir>/.build_manifest.json) maps each output artifact to
+the hash of the inputs it was rendered from. An artifact whose recorded hash
+matches and whose file still exists is skipped, so unchanged builds rewrite
+nothing and leave file mtimes alone.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".build_manifest.json"
+
+
+def hash_files(paths: Iterable[Path], extra: str = "") -> str:
+    """SHA-256 over the names and bytes of the given files (order-independent), plus an optional string."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(p) for p in paths):
+        digest.update(path.name.encode())
+        digest.update(b'\0')
+        try:
+            digest.update(path.read_bytes())
+        except FileNotFoundError:
+            digest.update(b'<missing>')
+        digest.update(b'\0')
+    digest.update(extra.encode())
+    return digest.hexdigest()
+
+
+def write_if_changed(path: Path, content) -> bool:
+    """Write text (or bytes) only if it differs from what is on disk. Returns True if the file was written."""
+    path = Path(path)
+    data = content if isinstance(content, bytes) else content.encode('utf-8')
+    if path.exists() and path.read_bytes() == data:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates 0600 files; published output must stay world-readable
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return True
+
+
+class BuildManifest:
+    """Per-artifact input hashes for one output directory."""
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / MANIFEST_NAME
+        self.entries = {}
+        self._dirty = False
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable build manifest {self.path}: {e}")
+
+    def matches(self, key: str, digest: str) -> bool:
+        return self.entries.get(key) == digest
+
+    def is_fresh(self, artifact: str, digest: str) -> bool:
+        return self.matches(artifact, digest) and (self.output_dir / artifact).exists()
+
+    def outputs_exist(self) -> bool:
+        """True if every recorded artifact (keys that are paths, not '*' markers) is still on disk."""
+        return all((self.output_dir / a).exists() for a in self.entries if not a.startswith('*'))
+
+    def forget(self, artifact: str):
+        if self.entries.pop(artifact, None) is not None:
+            self._dirty = True
+
+    def record(self, artifact: str, digest: str):
+        if self.entries.get(artifact) != digest:
+            self.entries[artifact] = digest
+            self._dirty = True
+
+    def save(self):
+        if self._dirty:
+            write_if_changed(self.path, json.dumps(self.entries, indent=2, sort_keys=True) + "\n")
+            self._dirty = False
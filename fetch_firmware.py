@@ -5,32 +5,30 @@ import html
 import sys
 import argparse
 import logging
-import time
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
-from config import BASE_URL, OOS_API_URL, USER_AGENT, SPRING_MAPPING, OOS_MAPPING
+from config import BASE_URL, OOS_API_URL, USER_AGENT, SPRING_MAPPING, OOS_MAPPING, DEVICE_METADATA
+from springer_catalog import default_catalog
+from http_client import get_client
+from firmware_version import VersionIndex
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
-def requests_get_with_retry(url, retries=3, delay=10, timeout=10):
+# Concurrency caps for --all / fetch_all(), per upstream host
+ALL_MAX_WORKERS = 16
+OOS_MAX_CONCURRENCY = 8
+SPRINGER_MAX_CONCURRENCY = 2
+
+def requests_get_with_retry(url, retries=3, timeout=10):
     """
-    Helper to perform requests.get with retries.
+    Helper to perform a GET through the shared pooled client
+    (exponential backoff with jitter, Retry-After, per-host circuit breaker).
     """
-    last_exception = None
-    for i in range(retries):
-        try:
-            response = requests.get(url, headers={'User-Agent': USER_AGENT}, timeout=timeout)
-            response.raise_for_status()
-            return response
-        except Exception as e:
-            last_exception = e
-            if i < retries - 1:
-                logger.warning(f"Request failed: {e}. Retrying in {delay} seconds... ({i+1}/{retries})")
-                time.sleep(delay)
-
-    # If we get here, all retries failed
-    raise last_exception
+    return get_client().get(url, retries=retries, timeout=timeout)
 
 def get_from_oos_api(device_id: str, region: str) -> dict:
     """
@@ -60,17 +58,17 @@ def get_from_oos_api(device_id: str, region: str) -> dict:
     logger.info(f"Checking OOS API: {url_endpoint}")
     
     try:
-        # Fetch URL
-        resp_url = requests_get_with_retry(url_endpoint)
-        download_url = resp_url.text.strip()
+        # Fetch URL and version concurrently
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            url_future = pool.submit(requests_get_with_retry, url_endpoint)
+            ver_future = pool.submit(requests_get_with_retry, ver_endpoint)
+            download_url = url_future.result().text.strip()
         
-        if not download_url or not download_url.startswith("http"):
-            logger.warning(f"OOS API returned invalid URL: {download_url}")
-            return None
+            if not download_url or not download_url.startswith("http"):
+                logger.warning(f"OOS API returned invalid URL: {download_url}")
+                return None
             
-        # Fetch Version
-        resp_ver = requests_get_with_retry(ver_endpoint)
-        version_str = resp_ver.text.strip()
+            version_str = ver_future.result().text.strip()
         
         return {
             "url": download_url,
@@ -81,16 +79,13 @@ def get_from_oos_api(device_id: str, region: str) -> dict:
         logger.warning(f"OOS API check failed: {e}")
         return None
 
-def get_springer_versions(device_id: str, region: str, session=None) -> list:
+def get_springer_versions(device_id: str, region: str, session=None, catalog=None) -> list:
     """
     Fetches available versions for a device/region from roms.danielspringer.at
+    Pass a shared SpringerCatalog to avoid re-fetching the page for every variant.
     """
-    headers = {
-        'User-Agent': USER_AGENT,
-    }
-    
-    if not session:
-        session = requests.Session()
+    if not catalog:
+        catalog = default_catalog(session)
     
     # Map input device ID to website's expected name via OOS_MAPPING (snake_case)
     key = OOS_MAPPING.get(device_id, f"oneplus_{device_id}")
@@ -99,50 +94,23 @@ def get_springer_versions(device_id: str, region: str, session=None) -> list:
     if not mapped_name:
          mapped_name = f"OP {device_id}"
 
-    if key in SPRING_MAPPING:
-        mapped_name = SPRING_MAPPING[key]
-    
-    try:
-        response = session.get(BASE_URL, headers=headers, timeout=15)
-        response.raise_for_status()
-    except Exception as e:
-        logger.error(f"Error fetching page: {e}")
-        return None
-
-    soup = BeautifulSoup(response.text, 'html.parser')
-    device_select = soup.find('select', {'id': 'device'})
-    if not device_select:
-        logger.error("Could not find device select element")
+    if catalog.load() is None:
         return None
 
-    devices_json = device_select.get('data-devices')
-    if not devices_json:
-        logger.error("Could not find data-devices attribute")
-        return None
-
-    devices_data = json.loads(html.unescape(devices_json))
-    
     # Device name resolution
-    device_name = mapped_name
-    if device_name not in devices_data:
-        # Try stricter fuzzy match
-        found = False
-        for d in devices_data:
-            if device_name.upper() == d.upper() or d.upper().startswith(device_name.upper() + " "):
-                device_name = d
-                found = True
-                break
-        if not found:
-            logger.error(f"Device {device_name} not found in available data")
-            return None
+    device_name = catalog.resolve_device(mapped_name)
+    if not device_name:
+        logger.error(f"Device {mapped_name} not found in available data")
+        return None
 
-    if region not in devices_data[device_name]:
+    versions = catalog.versions(device_name, region)
+    if versions is None:
         logger.error(f"Region {region} not found for {device_name}")
         return None
         
-    return devices_data[device_name][region], device_name
+    return versions, device_name
 
-def get_signed_url_springer(device_id: str, region: str, target_version: str = None) -> dict:
+def get_signed_url_springer(device_id: str, region: str, target_version: str = None, catalog=None) -> dict:
     """
     Fetches a signed download URL from roms.danielspringer.at
     Returns dict with 'url' and 'version' (if known).
@@ -151,9 +119,11 @@ def get_signed_url_springer(device_id: str, region: str, target_version: str = N
         'User-Agent': USER_AGENT,
     }
     
-    session = requests.Session()
+    if catalog is None:
+        catalog = default_catalog()
+    session = catalog.session
     
-    res = get_springer_versions(device_id, region, session)
+    res = get_springer_versions(device_id, region, session, catalog=catalog)
     if not res:
         return None
     versions, device_name = res
@@ -162,12 +132,7 @@ def get_signed_url_springer(device_id: str, region: str, target_version: str = N
     
     if target_version:
         # Find index for target version
-        found_idx = -1
-        for i, v in enumerate(versions):
-            if target_version in v:
-                found_idx = i
-                break
-        
+        found_idx = VersionIndex(versions).find(target_version)
         if found_idx == -1:
             logger.error(f"Version {target_version} not found for {device_name} {region}")
             return None
@@ -187,6 +152,10 @@ def get_signed_url_springer(device_id: str, region: str, target_version: str = N
         'Referer': BASE_URL,
     })
     
+    # The form POST must reuse the session that loaded the page; a catalog read from disk never loaded it
+    if not catalog.prime_session():
+        return None
+
     try:
         response = session.post(BASE_URL, data=form_data, headers=post_headers, timeout=15)
         response.raise_for_status()
@@ -207,17 +176,75 @@ def get_signed_url_springer(device_id: str, region: str, target_version: str = N
         logger.error("No download URL found in the response")
         return None
 
+def resolve_latest(device_id: str, region: str, catalog=None, oos_slots=None, springer_slots=None) -> dict:
+    """
+    Resolve the latest firmware for one variant: OOS API first, then Springer.
+    oos_slots / springer_slots are optional semaphores capping per-host concurrency.
+    """
+    with oos_slots or nullcontext():
+        result = get_from_oos_api(device_id, region)
+    if result:
+        return result
+
+    with springer_slots or nullcontext():
+        return get_signed_url_springer(device_id, region, catalog=catalog)
+
+def fetch_all(variants=None, max_workers: int = ALL_MAX_WORKERS,
+              oos_concurrency: int = OOS_MAX_CONCURRENCY,
+              springer_concurrency: int = SPRINGER_MAX_CONCURRENCY) -> dict:
+    """
+    Resolve the latest firmware for many variants concurrently.
+    variants: iterable of (device_id, region); defaults to every DEVICE_METADATA model.
+    Returns {"<device_id>_<region>": {"url": ..., "version": ...} or None}.
+    """
+    if variants is None:
+        variants = [(device_id, region) for device_id, meta in DEVICE_METADATA.items()
+                    for region in meta.get('models', {})]
+    variants = list(variants)
+
+    # OOS requests go through the shared client; Springer keeps one cookie session for page + form POST
+    catalog = default_catalog()
+    oos_slots = threading.BoundedSemaphore(oos_concurrency)
+    springer_slots = threading.BoundedSemaphore(springer_concurrency)
+
+    def resolve(variant):
+        device_id, region = variant
+        try:
+            return resolve_latest(device_id, region, catalog, oos_slots, springer_slots)
+        except Exception as e:
+            logger.error(f"Failed to resolve {device_id} {region}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(variants)))) as pool:
+        results = list(pool.map(resolve, variants))
+
+    return {f"{device_id}_{region}": result for (device_id, region), result in zip(variants, results)}
+
 def main():
     parser = argparse.ArgumentParser(description="Fetch signed firmware URL and version.")
-    parser.add_argument("device_id", help="Device ID (e.g., 15, 15R)")
-    parser.add_argument("region", help="Region code (e.g., CN, EU, GLO, IN)")
+    parser.add_argument("device_id", nargs="?", help="Device ID (e.g., 15, 15R)")
+    parser.add_argument("region", nargs="?", help="Region code (e.g., CN, EU, GLO, IN)")
     parser.add_argument("target_version", nargs="?", help="Target version string (optional)")
     parser.add_argument("--json", action="store_true", help="Output result as JSON")
     parser.add_argument("--version-only", action="store_true", help="Output only the version string")
     parser.add_argument("--url-only", action="store_true", help="Output only the URL (default behavior otherwise)")
     parser.add_argument("--output", help="Write result JSON to file instead of stdout")
+    parser.add_argument("--all", action="store_true", help="Resolve every variant in DEVICE_METADATA concurrently and output one JSON document")
+    parser.add_argument("--workers", type=int, default=ALL_MAX_WORKERS, help="Thread pool size for --all")
     
     args = parser.parse_args()
+
+    if args.all:
+        results = fetch_all(max_workers=args.workers)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        else:
+            print(json.dumps(results, indent=2))
+        return
+
+    if not args.device_id or not args.region:
+        parser.error("device_id and region are required unless --all is given")
     
     # Strip 'oneplus_' prefix
     clean_device_id = args.device_id.replace("oneplus_", "")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Structured OxygenOS/ColorOS firmware version strings.
+
+Two formats appear in the history and upstream sources:
+  CPH2747_16.0.3.503(EX01)   model, OS major, build tuple (0, 3, 503), region tag EX01
+  IN2025_11_F.67             legacy: model, OS major, build letter and number (F=6, 67)
+A bare "16.0.3.503(EX01)" (no model prefix) is also accepted.
+
+Parse results and sort keys are memoized, so sorting or matching the same
+strings repeatedly costs a dict lookup. Unparseable strings still get a
+(lowest-ranked) sort key and match by exact string.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+_MODERN_RE = re.compile(r'^(?:(?P<model>[A-Z0-9]+)_)?(?P<os>\d+)\.(?P<build>\d+(?:\.\d+)*)(?:\((?P<tag>[A-Z]+\d*)\))?$')
+_LEGACY_RE = re.compile(r'^(?P<model>[A-Z0-9]+)_(?P<os>\d+)_(?P<letter>[A-Z])\.(?P<build>\d+)$')
+
+
+class FirmwareVersion(NamedTuple):
+    raw: str
+    model: Optional[str]
+    os_major: int
+    build: Tuple[int, ...]
+    region_tag: Optional[str]
+
+    @property
+    def key(self) -> Tuple:
+        """Identity of the release, ignoring the model prefix (fixed within one variant)."""
+        return (self.os_major, self.build, self.region_tag)
+
+
+@lru_cache(maxsize=None)
+def parse_version(raw: str) -> Optional[FirmwareVersion]:
+    """Parse a version string, or None if it matches neither known format."""
+    value = (raw or '').strip()
+    match = _MODERN_RE.match(value)
+    if match:
+        build = tuple(int(part) for part in match.group('build').split('.'))
+        return FirmwareVersion(value, match.group('model'), int(match.group('os')), build, match.group('tag'))
+    match = _LEGACY_RE.match(value)
+    if match:
+        build = (ord(match.group('letter')) - ord('A') + 1, int(match.group('build')))
+        return FirmwareVersion(value, match.group('model'), int(match.group('os')), build, None)
+    return None
+
+
+@lru_cache(maxsize=None)
+def version_sort_key(raw: str) -> Tuple:
+    """Ascending release order: OS major, then build numbers; unparseable strings sort first, by text."""
+    parsed = parse_version(raw)
+    if parsed is None:
+        return (0, 0, (), '', raw or '')
+    return (1, parsed.os_major, parsed.build, parsed.region_tag or '', parsed.raw)
+
+
+def version_key(raw: str):
+    """Hashable identity for matching versions across sources (exact string if unparseable)."""
+    parsed = parse_version(raw)
+    return parsed.key if parsed else (raw or '').strip()
+
+
+def same_version(a: str, b: str) -> bool:
+    return version_key(a) == version_key(b)
+
+
+def latest_version(versions: Iterable[str]) -> Optional[str]:
+    return max(versions, key=version_sort_key, default=None)
+
+
+class VersionIndex:
+    """Position of each version in an ordered list (e.g. a Springer catalog entry), by exact string and by identity."""
+
+    def __init__(self, versions: Iterable[str]):
+        self.versions = list(versions)
+        self._exact: Dict[str, int] = {}
+        self._by_key: Dict = {}
+        for i, version in enumerate(self.versions):
+            self._exact.setdefault(version, i)
+            self._by_key.setdefault(version_key(version), i)
+
+    def find(self, target: str) -> int:
+        """Index of target, or -1. Partial targets (e.g. without the region tag) fall back to a substring scan."""
+        if target in self._exact:
+            return self._exact[target]
+        index = self._by_key.get(version_key(target))
+        if index is not None:
+            return index
+        return next((i for i, v in enumerate(self.versions) if target in v), -1)
@@ -1,54 +1,131 @@
 #!/usr/bin/env python3
+"""
+Backfill matrix: historical versions listed by Springer that are not yet in data/history.
+
+Each variant's Springer list is diffed against its history (by release identity,
+see firmware_version.version_key), so repeated backfills converge to zero jobs.
+  --depth N      consider the N newest listed versions per variant (0 = all)
+  --since V      only versions at or above V (e.g. 15.0, or a full version string);
+                 versions that cannot be parsed are kept, in catalog order
+  --max-jobs N   global job budget; variants take turns newest-first, so every
+                 variant gets its newest missing build before any gets a second
+"""
+
 import json
 import os
-import requests
-from config import DEVICE_METADATA
+import sys
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+from config import DEVICE_METADATA, HISTORY_DIR
 from fetch_firmware import get_springer_versions
+from firmware_version import parse_version, version_key, version_sort_key
+from springer_catalog import default_catalog
+from generate_matrix import group_by_firmware, load_known_versions
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s', stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEPTH = 3
+# GitHub Actions rejects matrices with more than 256 jobs
+MAX_JOBS = 256
+
+
+def missing_versions(device_id: str, region: str, versions: List[str], depth: int = DEFAULT_DEPTH,
+                     since: Optional[str] = None, history_dir=HISTORY_DIR) -> List[str]:
+    """
+    Listed versions not yet in the variant's history, newest first. If any listed
+    version cannot be parsed, the catalog's own (newest-first) order is kept instead,
+    and --since keeps the unparseable ones since they cannot be compared.
+    """
+    candidates = list(dict.fromkeys(versions))
+    unparsed = [v for v in candidates if not parse_version(v)]
+    if unparsed:
+        logger.info(f"{device_id} {region}: keeping catalog order, unparseable versions: {', '.join(unparsed)}")
+    else:
+        candidates.sort(key=version_sort_key, reverse=True)
+    if depth:
+        candidates = candidates[:depth]
+    if since:
+        floor = version_sort_key(since)
+        candidates = [v for v in candidates if not parse_version(v) or version_sort_key(v) >= floor]
+    known = {version_key(v) for v in load_known_versions(device_id, region, history_dir)}
+    return [v for v in candidates if version_key(v) not in known]
+
+
+def interleave(missing: Dict[tuple, List[str]]) -> List[tuple]:
+    """(device_id, region, version) ordered by rank within its variant, so budgets are shared fairly."""
+    ranked = [(rank, variant, version) for variant, versions in missing.items()
+              for rank, version in enumerate(versions)]
+    ranked.sort(key=lambda r: r[0])
+    return [(*variant, version) for _, variant, version in ranked]
+
 
-def generate_backfill_matrix():
-    include_list = []
-    
-    # Optional: Filter only specific devices or regions if needed
-    # For now, we'll try all that have Springer mapping
-    
-    session = requests.Session()
-    
+def generate_backfill_matrix(depth: int = DEFAULT_DEPTH, since: Optional[str] = None,
+                             max_jobs: int = MAX_JOBS, device: Optional[str] = None,
+                             variant: Optional[str] = None, history_dir=HISTORY_DIR, catalog=None):
+    if catalog is None:
+        # One catalog fetch serves every device/region below
+        catalog = default_catalog()
+
+    missing = {}
     for device_id, meta in DEVICE_METADATA.items():
-        valid_regions = meta.get('models', {}).keys()
-        
-        for region in valid_regions:
-            print(f"Checking versions for {device_id} {region}...")
-            res = get_springer_versions(device_id, region, session)
-            
+        if device and device_id != device:
+            continue
+        for region in meta.get('models', {}):
+            if variant and region != variant:
+                continue
+            res = get_springer_versions(device_id, region, catalog=catalog)
             if not res:
                 continue
-            
             versions, _ = res
-            
-            # Take top 3 versions (Springer usually lists newest first)
-            target_versions = versions[:3]
-            
-            for version in target_versions:
-                # We need to extract the version string carefully 
-                # as Springer might return "Version (Date)"
-                # But fetch_firmware.py handles substrings so it's fine
-                
-                include_list.append({
-                    "device": device_id,
-                    "variant": region,
-                    "device_short": device_id,
-                    "device_name": meta['name'],
-                    "version": version
-                })
-                
+            todo = missing_versions(device_id, region, versions, depth, since, history_dir)
+            logger.info(f"{device_id} {region}: {len(todo)} of {len(versions)} listed versions missing")
+            if todo:
+                missing[(device_id, region)] = todo
+
+    include_list = [{
+        "device": device_id,
+        "variant": region,
+        "device_short": device_id,
+        "device_name": DEVICE_METADATA[device_id]['name'],
+        "version": version,
+    } for device_id, region, version in interleave(missing)]
+
+    # Regions/devices that list the same package share one download and analysis
+    include_list = group_by_firmware(include_list)
+    if len(include_list) > max_jobs:
+        logger.info(f"Job budget: running {max_jobs} of {len(include_list)} backfill jobs, the rest next time")
+        include_list = include_list[:max_jobs]
+
     # Output for GitHub Actions
     matrix_json = json.dumps({"include": include_list})
-    
+
     if "GITHUB_OUTPUT" in os.environ:
         with open(os.environ["GITHUB_OUTPUT"], "a") as f:
             f.write(f"matrix={matrix_json}\n")
+            # An empty include list is rejected by Actions, so callers gate on this
+            f.write(f"has_jobs={'true' if include_list else 'false'}\n")
     else:
         print(matrix_json)
 
+    return include_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the historical backfill matrix.")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="Newest listed versions considered per variant (0 = all)")
+    parser.add_argument("--since", help="Only versions at or above this one (e.g. 15.0)")
+    parser.add_argument("--max-jobs", type=int, default=MAX_JOBS, help="Global job budget")
+    parser.add_argument("--device", help="Only this device (e.g. 15)")
+    parser.add_argument("--variant", help="Only this region (e.g. CN)")
+    parser.add_argument("--history-dir", default=HISTORY_DIR, help="History directory")
+    args = parser.parse_args()
+
+    generate_backfill_matrix(args.depth, args.since or None, min(args.max_jobs, MAX_JOBS),
+                             args.device or None, args.variant or None, args.history_dir)
+
+
 if __name__ == "__main__":
-    generate_backfill_matrix()
+    main()
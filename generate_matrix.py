@@ -1,36 +1,147 @@
 import json
 import os
-from config import DEVICE_METADATA
+import sys
+import argparse
+import logging
+from datetime import date
+from pathlib import Path
+from config import DEVICE_METADATA, HISTORY_DIR, get_model_number
+from firmware_version import parse_version, version_key
+from scheduler import SCHEDULE_PATH, load_schedule, save_schedule, due_entries, record_polls
+from variant_health import HEALTH_PATH, VariantHealth, available_entries
 
-def generate_matrix():
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s', stream=sys.stderr)
+logger = logging.getLogger(__name__)
+
+def load_known_versions(device_id: str, region: str, history_dir=HISTORY_DIR) -> set:
+    """Versions already recorded in data/history/<device>_<variant>.json."""
+    history_file = Path(history_dir) / f"{device_id}_{region}.json"
+    if not history_file.exists():
+        return set()
+    try:
+        with open(history_file, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable history {history_file}: {e}")
+        return set()
+    return {entry.get('version') for entry in data.get('history', [])}
+
+def is_known_version(device_id: str, region: str, version: str, history_dir=HISTORY_DIR) -> bool:
+    """True if the same release is already in the variant's history."""
+    known = {version_key(v) for v in load_known_versions(device_id, region, history_dir)}
+    return version_key(version) in known
+
+def detect_changes(include_list: list, history_dir=HISTORY_DIR, resolver=None, health=None) -> list:
+    """
+    Keep only variants whose latest upstream version is new or could not be resolved.
+    Latest versions are resolved in one concurrent pass (fetch_firmware.fetch_all)
+    and added to the kept entries as 'version'. With a VariantHealth store, failing
+    variants must also pass its cheap re-probe (see variant_health.py).
+    """
+    if resolver is None:
+        from fetch_firmware import fetch_all as resolver
+
+    latest = resolver([(item['device'], item['variant']) for item in include_list])
+
+    changed = []
+    for item in include_list:
+        info = latest.get(f"{item['device']}_{item['variant']}")
+        version = info.get('version') if info else None
+        if health is not None and not health.probe(f"{item['device']}_{item['variant']}", item['variant'], info):
+            continue
+        if version and is_known_version(item['device'], item['variant'], version, history_dir):
+            continue
+        if version:
+            logger.info(f"{item['device']} {item['variant']}: new version {version}")
+            item = {**item, 'version': version}
+        else:
+            logger.info(f"{item['device']} {item['variant']}: latest version unknown, keeping")
+        changed.append(item)
+
+    logger.info(f"Delta matrix: {len(changed)} of {len(include_list)} variants need a check")
+    return changed
+
+def firmware_key(device_id: str, region: str, version: str):
+    """Same model and release means the same package, whichever region (or device entry) lists it."""
+    parsed = parse_version(version)
+    model = parsed.model if parsed and parsed.model else get_model_number(device_id, region)
+    if model == "Unknown":
+        return None
+    return (model, version_key(version))
+
+def group_by_firmware(entries: list) -> list:
+    """
+    Collapse entries that resolve to the same firmware package into one job.
+    The first entry of each group runs; the others are listed in its 'fanout' as
+    {device_short, variant, version} and receive the same ARB result.
+    Entries without a resolved 'version' are never grouped.
+    """
+    primaries = {}
+    jobs = []
+    for entry in entries:
+        key = firmware_key(entry['device'], entry['variant'], entry['version']) if entry.get('version') else None
+        primary = primaries.get(key) if key else None
+        if primary is None:
+            primary = dict(entry)
+            jobs.append(primary)
+            if key:
+                primaries[key] = primary
+            continue
+        primary.setdefault('fanout', []).append({k: entry[k] for k in ('device_short', 'variant', 'version')})
+        logger.info(f"{entry['device']} {entry['variant']}: same package as {primary['device']} {primary['variant']}")
+
+    if len(jobs) < len(entries):
+        logger.info(f"Deduplicated {len(entries)} variants into {len(jobs)} jobs")
+    return jobs
+
+def matrix_entries() -> list:
+    """One entry per variant in DEVICE_METADATA (failing ones are filtered by variant_health)."""
     include_list = []
-    
-    # Temporary exclusions for failing devices
-    EXCLUDE = [
-        ("Find X8 Pro", "IN"), ("Find X8 Pro", "EU"), ("Find X8 Pro", "CN"),
-        ("Find X8", "CN"), ("Find X8", "IN"),
-        ("Find N3", "IN"), # Fails in check-variant
-        ("9R", "IN"),
-        ("10R", "IN"),
-        ("Ace 5 Ultimate", "CN"),
-        ("Find X5", "CN"),
-        ("Find X5 Pro", "CN")
-    ]
 
     for device_id, meta in DEVICE_METADATA.items():
         # Get all valid regions from the 'models' dictionary keys
         valid_regions = meta.get('models', {}).keys()
         
         for region in valid_regions:
-            if (device_id, region) in EXCLUDE:
-                continue
-                
             include_list.append({
                 "device": device_id,
                 "variant": region,
                 "device_short": device_id,
                 "device_name": meta['name']
             })
+
+    return include_list
+
+def generate_matrix(delta: bool = False, force: bool = False, history_dir=HISTORY_DIR,
+                    scheduled: bool = False, schedule_path=SCHEDULE_PATH,
+                    health_path=HEALTH_PATH, outcomes_path=None):
+    include_list = matrix_entries()
+    today = date.today()
+    health = VariantHealth(health_path)
+
+    if not force:
+        include_list = available_entries(include_list, health, today)
+
+    if scheduled and not force:
+        schedule = load_schedule(schedule_path)
+        include_list = due_entries(include_list, schedule, today)
+
+    polled = include_list
+    changed_keys = set()
+    if delta and not force:
+        changed = detect_changes(polled, history_dir, health=health)
+        if health.pending:
+            # Failed probes extend the backoff without spending a job
+            health.save()
+            if outcomes_path:
+                health.write_outcomes(outcomes_path)
+        changed_keys = {f"{item['device']}_{item['variant']}" for item in changed if item.get('version')}
+        include_list = group_by_firmware(changed)
+
+    if scheduled and not force:
+        # Without --delta every due variant is emitted, counted as polled with no change detected
+        record_polls(polled, changed_keys, schedule, today, history_dir)
+        save_schedule(schedule, schedule_path)
             
     # Output for GitHub Actions
     matrix_json = json.dumps({"include": include_list})
@@ -39,8 +150,28 @@ def generate_matrix():
     if "GITHUB_OUTPUT" in os.environ:
         with open(os.environ["GITHUB_OUTPUT"], "a") as f:
             f.write(f"matrix={matrix_json}\n")
+            # An empty include list is rejected by Actions, so callers gate on this
+            f.write(f"has_jobs={'true' if include_list else 'false'}\n")
     else:
         print(matrix_json)
 
+    return include_list
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the check-variant job matrix.")
+    parser.add_argument("--delta", action="store_true", help="Only emit variants whose latest version is not in history")
+    parser.add_argument("--force", action="store_true", help="Emit every variant even with --delta")
+    parser.add_argument("--history-dir", default=HISTORY_DIR, help="History directory")
+    parser.add_argument("--scheduled", action="store_true", help="Only poll variants that are due (see scheduler.py)")
+    parser.add_argument("--schedule", default=SCHEDULE_PATH, help="Poll schedule file for --scheduled")
+    parser.add_argument("--health", default=HEALTH_PATH, help="Variant health store (failure backoff)")
+    parser.add_argument("--outcomes", help="Also write failed probe outcomes to this file (uploaded by CI)")
+    args = parser.parse_args()
+
+    force = args.force or os.environ.get("FORCE_RECHECK", "").lower() == "true"
+    generate_matrix(delta=args.delta, force=force, history_dir=args.history_dir,
+                    scheduled=args.scheduled, schedule_path=args.schedule,
+                    health_path=args.health, outcomes_path=args.outcomes)
+
 if __name__ == "__main__":
-    generate_matrix()
+    main()
@@ -1,8 +1,10 @@
+import sys
 import json
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import Dict, List, Optional
-from config import DEVICE_ORDER, DEVICE_METADATA
+from view_model import get_view_model, ordered_devices
+from history_store import open_store
 
 def load_history(file_path: Path) -> Dict:
     """Load history from a JSON file."""
@@ -12,6 +14,16 @@ def load_history(file_path: Path) -> Dict:
     except FileNotFoundError:
         return {}
 
+def load_all_history(history_dir: Path) -> Dict:
+    """Load all <device>_<region>.json files in a directory, skipping unreadable ones."""
+    data = {}
+    for file_path in sorted(Path(history_dir).glob('*.json')):
+        try:
+            data[file_path.stem] = load_history(file_path)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load {file_path}: {e}")
+    return data
+
 def get_region_name(region_code: str) -> str:
     """Convert region code to human readable name."""
     names = {
@@ -24,60 +36,31 @@ def get_region_name(region_code: str) -> str:
     }
     return names.get(region_code, region_code)
 
-def generate_device_section(device_id: str, device_name: str, history_data: Dict) -> List[str]:
-    """Generate Markdown section for a specific device."""
+def generate_device_section(device_id: str, device_name: str, history_data: Dict, view: Optional[Dict] = None) -> List[str]:
+    """Generate Markdown section for a specific device. Pass a prebuilt view model to skip the lookup."""
     lines = []
+    if view is None:
+        view = get_view_model(history_data)
+    device = view.get(device_id)
+    variants = device['variants'] if device else []
     
-    # Get available variants
-    variants = set()
-    if device_id in DEVICE_METADATA:
-        variants.update(DEVICE_METADATA[device_id]['models'].keys())
-    for key in history_data:
-        if key.startswith(f"{device_id}_"):
-             variants.add(key.replace(f"{device_id}_", ""))
-    
-    preferred_order = ['GLO', 'EU', 'IN', 'NA', 'VISIBLE', 'CN']
-    def sort_key(v):
-        try:
-            return preferred_order.index(v)
-        except ValueError:
-            return len(preferred_order)
-            
-    sorted_variants = sorted(list(variants), key=sort_key)
-    
-    has_data = False
     rows = []
-    for variant in sorted_variants:
-        key = f"{device_id}_{variant}"
-        if key not in history_data:
-            continue
-            
-        data = history_data[key]
-        current_entry = None
-        for entry in data.get('history', []):
-            if entry.get('status') == 'current':
-                current_entry = entry
-                break
+    for variant in variants:
+        current_entry = variant['current']
+        version = current_entry.get('version', 'Unknown')
+        arb = current_entry.get('arb', -1)
+        date = current_entry.get('last_checked', 'Unknown')
+        major = current_entry.get('major', '?')
+        minor = current_entry.get('minor', '?')
+        region_name = get_region_name(variant['region'])
+        model = variant['model']
         
-        if not current_entry and data.get('history'):
-            current_entry = data['history'][0]
+        # Status icon
+        safe_icon = "✅" if arb == 0 else "❌" if arb > 0 else "❓"
             
-        if current_entry:
-            has_data = True
-            version = current_entry.get('version', 'Unknown')
-            arb = current_entry.get('arb', -1)
-            date = current_entry.get('last_checked', 'Unknown')
-            major = current_entry.get('major', '?')
-            minor = current_entry.get('minor', '?')
-            region_name = get_region_name(variant)
-            model = data.get('model', 'Unknown')
-            
-            # Status icon
-            safe_icon = "✅" if arb == 0 else "❌" if arb > 0 else "❓"
-                
-            rows.append(f"| {region_name} | {model} | {version} | **{arb}** | Major: {major}, Minor: {minor} | {date} | {safe_icon} |")
+        rows.append(f"| {region_name} | {model} | {version} | **{arb}** | Major: {major}, Minor: {minor} | {date} | {safe_icon} |")
 
-    if has_data:
+    if rows:
         lines.append(f"### {device_name}")
         lines.append("")
         lines.append("| Region | Model | Firmware Version | ARB Index | OEM Version | Last Checked | Safe |")
@@ -87,20 +70,12 @@ def generate_device_section(device_id: str, device_name: str, history_data: Dict
         
         # Add History Section
         history_lines = []
-        for variant in sorted_variants:
-            key = f"{device_id}_{variant}"
-            if key not in history_data:
-                continue
-            
-            data = history_data[key]
-            # Filter out 'current' version from history to avoid redundancy
-            history_entries = [e for e in data.get('history', []) if e.get('status') != 'current']
-            
-            # Sort history by date descending
-            history_entries.sort(key=lambda x: (x.get('last_checked', ''), x.get('version', '')), reverse=True)
+        for variant in variants:
+            # History excludes the 'current' version and is already sorted by date descending
+            history_entries = variant['history']
             
             if history_entries: # Only show history if there's actual old versions
-                region_name = get_region_name(variant)
+                region_name = get_region_name(variant['region'])
                 history_lines.append(f"<details>")
                 history_lines.append(f"<summary>📜 <b>{region_name} History</b> (click to expand)</summary>")
                 history_lines.append("")
@@ -137,13 +112,9 @@ def generate_readme(history_data: Dict) -> str:
         ''
     ]
 
-    for device_id in DEVICE_ORDER:
-        if device_id not in DEVICE_METADATA:
-            continue
-        meta = DEVICE_METADATA[device_id]
-        device_name = meta['name']
-        
-        device_lines = generate_device_section(device_id, device_name, history_data)
+    view = get_view_model(history_data)
+    for device in ordered_devices(view):
+        device_lines = generate_device_section(device['id'], device['name'], history_data, view)
         if device_lines:
             lines.extend(device_lines)
             lines.append('---')
@@ -180,14 +151,22 @@ def generate_readme(history_data: Dict) -> str:
     
     return "\n".join(lines)
 
-if __name__ == "__main__":
-    history_dir = Path("data/history")
-    if not history_dir.exists():
-        exit(0)
-    all_history = {}
-    for f in history_dir.glob("*.json"):
-        all_history[f.stem] = load_history(f)
+def main():
+    history_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("data/history")
+    store = open_store()
+    if store:
+        with store:
+            all_history = store.load_all()
+    else:
+        if not history_dir.exists():
+            # Nothing recorded yet (e.g. a fresh tree): not an error
+            print(f"History directory not found: {history_dir}")
+            return
+        all_history = load_all_history(history_dir)
     content = generate_readme(all_history)
     with open("README.md", "w", encoding="utf-8") as f:
         f.write(content)
     print("README.md generated successfully")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,32 @@
+import re
 import json
 from pathlib import Path
 from jinja2 import Environment, FileSystemLoader
 from datetime import datetime, timezone
 import logging
-from config import DEVICE_ORDER, DEVICE_METADATA
+from view_model import get_view_model, ordered_devices, history_digest
+from history_store import open_store
+from build_manifest import BuildManifest, hash_files
+from static_api import API_DIR, build_api
+from site_output import ASSET_DIR, compressed_suffixes, fingerprint_assets, remove_stale_siblings, write_output
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Output layout: summary index, one page per device, one history shard per variant, static API, assets
+DEVICE_PAGE_DIR = "devices"
+HISTORY_SHARD_DIR = "history"
+GENERATED_DIRS = (DEVICE_PAGE_DIR, HISTORY_SHARD_DIR, API_DIR, ASSET_DIR)
+# Manifest key for the hash of all inputs; when it matches nothing needs rebuilding
+ALL_INPUTS_KEY = "*inputs"
+
+# Code/config the rendered pages depend on, hashed alongside the data in incremental mode
+# Modules whose code shapes the rendered output (ordering, parsing, loading, writing)
+SOURCE_FILES = [Path(__file__).parent / name
+                for name in ('config.py', 'view_model.py', 'firmware_version.py', 'history_store.py',
+                             'static_api.py', 'site_output.py', 'generate_site.py')]
+
 def load_all_history(history_dir: Path):
     """Load all JSON history files."""
     data = {}
@@ -34,75 +52,37 @@ def get_region_name(region_code: str) -> str:
     }
     return names.get(region_code, region_code)
 
+def slugify(value: str) -> str:
+    """URL/file-safe name for a device id (e.g. 'Find X8 Pro' -> 'find-x8-pro')."""
+    return re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-')
+
 def process_data(history_data):
     """Process raw history data."""
     devices_list = []
 
-    # Iterate over devices in the order defined in config
-    for device_id in DEVICE_ORDER:
-        if device_id not in DEVICE_METADATA:
-            continue
-        meta = DEVICE_METADATA[device_id]
-        
+    for device in ordered_devices(get_view_model(history_data)):
         device_entry = {
-            'id': device_id,
-            'name': meta['name'],
+            'id': device['id'],
+            'name': device['name'],
+            'slug': slugify(device['id']),
             'variants': []
         }
 
-        # Determine available regions for this device
-        available_regions = set(meta.get('models', {}).keys())
-        
-        # Also check if there are history files for regions not in config
-        for key in history_data:
-            if key.startswith(f"{device_id}_"):
-                available_regions.add(key.replace(f"{device_id}_", ""))
-                
-        # Order: preferred first, then others sorted
-        preferred_order = ['GLO', 'EU', 'IN', 'NA', 'VISIBLE', 'CN']
-        
-        # Sort regions based on preferred_order, then alphabetically for others
-        def region_sort_key(r):
-            try:
-                return preferred_order.index(r)
-            except ValueError:
-                return len(preferred_order) # Put non-preferred at the end
-
-        regions = sorted(list(available_regions), key=region_sort_key)
-        
-        for variant in regions:
-            key = f'{device_id}_{variant}'
-            if key not in history_data:
-                continue
-
-            data = history_data[key]
-
-            # Find current entry
-            current_entry = None
-            for entry in data.get('history', []):
-                if entry.get('status') == 'current':
-                    current_entry = entry
-                    break
-
-            # Fallback
-            if not current_entry and data.get('history'):
-                current_entry = data['history'][0]
-
-            if not current_entry:
-                continue
-
+        for variant in device['variants']:
+            current_entry = variant['current']
             variant_entry = {
-                'region_name': get_region_name(variant),
-                'model': data.get('model', 'Unknown'),
+                'region': variant['region'],
+                'region_name': get_region_name(variant['region']),
+                'model': variant['model'],
                 'version': current_entry.get('version', 'Unknown'),
                 'arb': current_entry.get('arb', -1),
                 'major': current_entry.get('major', '?'),
                 'minor': current_entry.get('minor', '?'),
                 'last_checked': current_entry.get('last_checked', 'Unknown'),
-                'history': [e for e in data.get('history', []) if e.get('status') != 'current']
+                'history': variant['history'],
+                'history_count': len(variant['history']),
+                'shard': f"{HISTORY_SHARD_DIR}/{device_entry['slug']}_{variant['region']}.json"
             }
-            # Sort history by date descending
-            variant_entry['history'].sort(key=lambda x: (x.get('last_checked', ''), x.get('version', '')), reverse=True)
             # Add helper for status
             # ARB 0 means safe (downgrade possible), >0 means protected
             variant_entry['is_safe'] = (variant_entry['arb'] == 0)
@@ -116,12 +96,69 @@ def process_data(history_data):
 
     return devices_list
 
-def generate(history_dir: Path, output_dir: Path, template_dir: Path):
-    """Core logic to generate the site."""
-    if not history_dir.exists():
+def history_shard(device: dict, variant: dict) -> dict:
+    """Archived history of one variant, fetched by the index page when its history is expanded."""
+    return {
+        'device': device['name'],
+        'device_id': device['id'],
+        'region': variant['region'],
+        'model': variant['model'],
+        'history': variant['history'],
+    }
+
+def summary_view(devices: list) -> list:
+    """Devices without archived history: everything the index page renders."""
+    return [{**d, 'variants': [{k: v for k, v in var.items() if k != 'history'} for var in d['variants']]}
+            for d in devices]
+
+def prune_outputs(output_dir: Path, produced: set, manifest=None):
+    """Remove pages, shards and API files that are no longer generated (e.g. a device was dropped)."""
+    for subdir in GENERATED_DIRS:
+        directory = output_dir / subdir
+        if not directory.exists():
+            continue
+        for path in sorted(directory.rglob('*'), reverse=True):
+            relative = path.relative_to(output_dir).as_posix()
+            if path.is_file() and relative not in produced:
+                path.unlink()
+                if manifest:
+                    manifest.forget(relative)
+                logger.info(f"Removed stale {relative}")
+            elif path.is_dir() and not any(path.iterdir()):
+                path.rmdir()
+
+def generate(history_dir: Path, output_dir: Path, template_dir: Path, db_path=None, incremental: bool = False):
+    """
+    Core logic to generate the site. Reads the SQLite store instead of JSON when one is given (or $HISTORY_DB).
+    Emits a summary index.html, devices/<slug>.html pages, history/<slug>_<region>.json shards
+    and the static JSON API under api/v1/ (see static_api.py), all minified and pre-compressed
+    together with fingerprinted assets (see site_output.py).
+    With incremental=True, outputs whose inputs (history, templates, config) are unchanged are not rebuilt.
+    """
+    store = open_store(db_path)
+    history_files = []
+    if store:
+        with store:
+            history_data = store.load_all()
+    elif not history_dir.exists():
         logger.warning(f"History directory not found: {history_dir}. Generating empty site.")
         history_data = {}
     else:
+        history_files = sorted(history_dir.glob('*.json'))
+        history_data = None  # loaded lazily, only if something needs rendering
+
+    manifest = BuildManifest(output_dir) if incremental else None
+    template_files = [p for p in Path(template_dir).rglob('*') if p.is_file()]
+    # Which compressed siblings get written depends on the installed packages too
+    templates_hash = hash_files(template_files + SOURCE_FILES, ' '.join(compressed_suffixes()))
+    if manifest:
+        extra = history_digest(history_data) if history_data is not None else ""
+        inputs = hash_files(history_files, extra + templates_hash)
+        if manifest.matches(ALL_INPUTS_KEY, inputs) and manifest.outputs_exist():
+            logger.info(f"Site up to date, nothing to rebuild in {output_dir}")
+            return
+
+    if history_data is None:
         history_data = load_all_history(history_dir)
 
     devices = process_data(history_data)
@@ -129,23 +166,53 @@ def generate(history_dir: Path, output_dir: Path, template_dir: Path):
     # Setup Jinja2
     env = Environment(loader=FileSystemLoader(template_dir))
     try:
-        template = env.get_template('index.html')
+        index_template = env.get_template('index.html')
+        device_template = env.get_template('device.html')
     except Exception as e:
         logger.error(f"Failed to load template: {e}")
         return
 
-    # Render
-    output_html = template.render(
-        devices=devices,
-        generated_at=datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
-    )
+    generated_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
+    summary = summary_view(devices)
+    assets = fingerprint_assets(template_dir)
+    asset_urls = {name: relative for name, (relative, _) in assets.items()}
+
+    # (relative path, input digest, renderer)
+    outputs = [(relative, history_digest(content), lambda content=content: content)
+               for relative, content in assets.values()]
+    outputs.append(('index.html', history_digest([summary, templates_hash]),
+                    lambda: index_template.render(devices=summary, generated_at=generated_at,
+                                                  root='', assets=asset_urls)))
+    for device in devices:
+        outputs.append((f"{DEVICE_PAGE_DIR}/{device['slug']}.html", history_digest([device, templates_hash]),
+                        lambda device=device: device_template.render(device=device, generated_at=generated_at,
+                                                                     root='../', assets=asset_urls)))
+        for variant in device['variants']:
+            if variant['history']:
+                shard = json.dumps(history_shard(device, variant), separators=(',', ':'))
+                outputs.append((variant['shard'], history_digest(shard), lambda shard=shard: shard))
+    for relative, content in build_api(devices).items():
+        outputs.append((relative, history_digest(content), lambda content=content: content))
 
     # Write output
     try:
         output_dir.mkdir(parents=True, exist_ok=True)
-        with open(output_dir / 'index.html', 'w', encoding='utf-8') as f:
-            f.write(output_html)
-        logger.info(f"Site generated successfully at {output_dir}/index.html")
+        written = 0
+        for relative, digest, render in outputs:
+            if manifest and manifest.is_fresh(relative, digest):
+                remove_stale_siblings(output_dir / relative)
+                continue
+            if write_output(output_dir / relative, render()):
+                written += 1
+            if manifest:
+                manifest.record(relative, digest)
+        produced = {relative for relative, _, _ in outputs}
+        produced |= {relative + suffix for relative in produced for suffix in compressed_suffixes()}
+        prune_outputs(output_dir, produced, manifest)
+        if manifest:
+            manifest.record(ALL_INPUTS_KEY, inputs)
+            manifest.save()
+        logger.info(f"Site generated successfully at {output_dir}/index.html ({written} of {len(outputs)} files written)")
     except Exception as e:
         logger.error(f"Failed to write output: {e}")
 
@@ -155,6 +222,8 @@ if __name__ == "__main__":
     parser.add_argument("--history", type=Path, default="data/history")
     parser.add_argument("--output", type=Path, default="page")
     parser.add_argument("--template", type=Path, default="templates")
+    parser.add_argument("--db", help="Read history from this SQLite store instead of JSON files")
+    parser.add_argument("--incremental", action="store_true", help="Skip outputs whose inputs are unchanged (see build_manifest.py)")
     args = parser.parse_args()
     
-    generate(args.history, args.output, args.template)
+    generate(args.history, args.output, args.template, args.db, args.incremental)
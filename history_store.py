@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Optional SQLite-backed history store.
+
+The JSON files in data/history/ stay the format committed to the repository;
+this store is a single-file copy that generate_site and generate_readme load
+in one pass instead of globbing and reparsing every file.
+
+Schema:
+  variants(key, device, device_id, region, model, doc)
+  observations(variant_id, position, device_id, region, version, arb, major, minor,
+               first_seen, last_checked, status, doc)
+
+`doc` holds each JSON object as written (key order preserved; for variants the
+"history" list is stored as null) so that export reproduces the files
+byte-for-byte. The other columns are extracted from it for querying.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import HISTORY_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "data/history.db"
+HISTORY_DB_ENV = "HISTORY_DB"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS variants (
+    id        INTEGER PRIMARY KEY,
+    key       TEXT NOT NULL UNIQUE,
+    device    TEXT,
+    device_id TEXT,
+    region    TEXT,
+    model     TEXT,
+    doc       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    id           INTEGER PRIMARY KEY,
+    variant_id   INTEGER NOT NULL REFERENCES variants(id) ON DELETE CASCADE,
+    position     INTEGER NOT NULL,
+    device_id    TEXT,
+    region       TEXT,
+    version      TEXT,
+    arb          INTEGER,
+    major        INTEGER,
+    minor        INTEGER,
+    first_seen   TEXT,
+    last_checked TEXT,
+    status       TEXT,
+    doc          TEXT NOT NULL,
+    UNIQUE (variant_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_variants_device_region ON variants(device_id, region);
+CREATE INDEX IF NOT EXISTS idx_obs_device_region_version ON observations(device_id, region, version);
+CREATE INDEX IF NOT EXISTS idx_obs_arb ON observations(arb);
+CREATE INDEX IF NOT EXISTS idx_obs_first_seen ON observations(first_seen);
+CREATE INDEX IF NOT EXISTS idx_obs_last_checked ON observations(last_checked);
+"""
+
+
+def dump_history(data: Dict) -> str:
+    """Serialize a history document exactly as update_history.save_history writes it."""
+    return json.dumps(data, indent=2)
+
+
+def _split_key(key: str, data: Dict):
+    """(device_id, region) for a variant, from the document or the '<device>_<region>' key."""
+    if data.get('device_id') and data.get('region'):
+        return data['device_id'], data['region']
+    device_id, _, region = key.rpartition('_')
+    return device_id, region
+
+
+class HistoryStore:
+    """Indexed store of variants and their version observations."""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = str(path)
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Writes
+
+    def put_variant(self, key: str, data: Dict):
+        """Insert or replace one variant document and all its observations."""
+        device_id, region = _split_key(key, data)
+        head = {k: (None if k == 'history' else v) for k, v in data.items()}
+        with self.conn:
+            self.conn.execute("DELETE FROM variants WHERE key = ?", (key,))
+            cur = self.conn.execute(
+                "INSERT INTO variants (key, device, device_id, region, model, doc) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, data.get('device'), device_id, region, data.get('model'), json.dumps(head)))
+            variant_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO observations (variant_id, position, device_id, region, version, arb, major, minor,"
+                " first_seen, last_checked, status, doc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(variant_id, position, device_id, region, entry.get('version'), entry.get('arb'),
+                  entry.get('major'), entry.get('minor'), entry.get('first_seen'), entry.get('last_checked'),
+                  entry.get('status'), json.dumps(entry))
+                 for position, entry in enumerate(data.get('history') or [])])
+
+    def import_json_dir(self, history_dir=HISTORY_DIR) -> int:
+        """Migrate every <device>_<variant>.json file into the store. Returns the number imported."""
+        count = 0
+        for file_path in sorted(Path(history_dir).glob('*.json')):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load {file_path}: {e}")
+                continue
+            self.put_variant(file_path.stem, data)
+            count += 1
+        return count
+
+    # Reads
+
+    def keys(self) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT key FROM variants ORDER BY key")]
+
+    def load_all(self) -> Dict[str, Dict]:
+        """All variant documents keyed by '<device>_<variant>' (same shape as the JSON files)."""
+        data = {}
+        ids = {}
+        for variant_id, key, doc in self.conn.execute("SELECT id, key, doc FROM variants"):
+            document = json.loads(doc)
+            if 'history' in document:
+                document['history'] = []
+            data[key] = document
+            ids[variant_id] = document
+        for variant_id, doc in self.conn.execute(
+                "SELECT variant_id, doc FROM observations ORDER BY variant_id, position"):
+            document = ids[variant_id]
+            document.setdefault('history', []).append(json.loads(doc))
+        return data
+
+    def get_variant(self, key: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT id, doc FROM variants WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        document = json.loads(row[1])
+        if 'history' in document:
+            document['history'] = [json.loads(doc) for (doc,) in self.conn.execute(
+                "SELECT doc FROM observations WHERE variant_id = ? ORDER BY position", (row[0],))]
+        return document
+
+    # Export
+
+    def export_json_dir(self, history_dir=HISTORY_DIR) -> int:
+        """Write every variant back to <history_dir>/<key>.json, skipping unchanged files."""
+        history_dir = Path(history_dir)
+        history_dir.mkdir(parents=True, exist_ok=True)
+        written = 0
+        for key, data in self.load_all().items():
+            file_path = history_dir / f"{key}.json"
+            content = dump_history(data)
+            if file_path.exists() and file_path.read_text(encoding='utf-8') == content:
+                continue
+            with open(file_path, 'w') as f:
+                f.write(content)
+            written += 1
+        return written
+
+
+def open_store(db_path=None) -> Optional[HistoryStore]:
+    """Open the store given explicitly or via $HISTORY_DB, or None when neither is set."""
+    db_path = db_path or os.environ.get(HISTORY_DB_ENV)
+    return HistoryStore(db_path) if db_path else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate, export or verify the SQLite history store.")
+    parser.add_argument("command", choices=["migrate", "export", "verify"],
+                        help="migrate: JSON -> DB, export: DB -> JSON, verify: check export matches JSON byte-for-byte")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite database path")
+    parser.add_argument("--history-dir", default=HISTORY_DIR, help="JSON history directory")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    with HistoryStore(args.db) as store:
+        if args.command == "migrate":
+            logger.info(f"Imported {store.import_json_dir(args.history_dir)} history files into {args.db}")
+        elif args.command == "export":
+            logger.info(f"Wrote {store.export_json_dir(args.history_dir)} history files to {args.history_dir}")
+        else:
+            mismatched = []
+            documents = store.load_all()
+            for file_path in sorted(Path(args.history_dir).glob('*.json')):
+                data = documents.pop(file_path.stem, None)
+                if data is None or dump_history(data) != file_path.read_text(encoding='utf-8'):
+                    mismatched.append(file_path.name)
+            mismatched.extend(f"{key}.json (missing)" for key in documents)
+            for name in mismatched:
+                logger.error(f"Mismatch: {name}")
+            if mismatched:
+                sys.exit(1)
+            logger.info("Store matches JSON history byte-for-byte")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the firmware discovery scripts.
+
+- One keep-alive session per host, sized for concurrent use.
+- Retries with exponential backoff plus jitter, honoring Retry-After.
+- Per-host circuit breaker: after repeated failures a host is skipped for a
+  cooldown period so remaining variants fail fast (and fall back to Springer).
+"""
+
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import USER_AGENT
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_RETRIES = 3
+BACKOFF_BASE = 1.0    # seconds
+BACKOFF_MAX = 30.0    # seconds
+POOL_SIZE = 16
+FAILURE_THRESHOLD = 3
+COOLDOWN = 300        # seconds
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without touching the network when a host's circuit is open."""
+
+
+def parse_retry_after(value):
+    """Retry-After header (delta-seconds or HTTP-date) -> seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostCircuit:
+    """Consecutive-failure counter for one host (closed -> open -> half-open)."""
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            # After the cooldown let requests through again (half-open)
+            return time.monotonic() - self.opened_at < self.cooldown
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    """Pooled, retrying, circuit-breaking wrapper around requests."""
+
+    def __init__(self, retries=DEFAULT_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 pool_size=POOL_SIZE, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN, timeout=10):
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.timeout = timeout
+        self._sessions = {}
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, url) -> requests.Session:
+        """Keep-alive session dedicated to the host of url."""
+        host = urlsplit(url).netloc or url
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers['User-Agent'] = USER_AGENT
+                self._sessions[host] = session
+            return session
+
+    def circuit_for(self, url) -> HostCircuit:
+        host = urlsplit(url).netloc or url
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                circuit = self._circuits[host] = HostCircuit(self.failure_threshold, self.cooldown)
+            return circuit
+
+    def backoff_delay(self, attempt: int, retry_after=None) -> float:
+        """Exponential backoff with equal jitter; Retry-After wins when the server sends it."""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def request(self, method: str, url: str, retries=None, **kwargs) -> requests.Response:
+        """
+        Perform a request with retries. Returns the response for 2xx/3xx, raises for
+        other 4xx immediately and for transport errors / 429 / 5xx once retries run out.
+        """
+        circuit = self.circuit_for(url)
+        if circuit.is_open():
+            raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}, skipping {url}")
+
+        kwargs.setdefault('timeout', self.timeout)
+        send = getattr(self.session_for(url), method.lower())
+        attempts = max(1, self.retries if retries is None else retries)
+
+        last_exception = None
+        for attempt in range(attempts):
+            retry_after = None
+            try:
+                response = send(url, **kwargs)
+            except Exception as e:
+                last_exception = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    # The host answered; a 4xx is the caller's problem, not the host's
+                    circuit.record_success()
+                    response.raise_for_status()
+                    return response
+                last_exception = requests.HTTPError(f"{response.status_code} for {url}", response=response)
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+            if attempt < attempts - 1:
+                delay = self.backoff_delay(attempt, retry_after)
+                logger.warning(f"Request failed: {last_exception}. Retrying in {delay:.1f} seconds... ({attempt+1}/{attempts})")
+                time.sleep(delay)
+
+        circuit.record_failure()
+        raise last_exception
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Process-wide shared client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Persistent SQLite job queue for firmware checks.
+
+One row per (device, variant, version), so enqueueing the same check twice is a
+no-op. Jobs move through:
+
+  pending --lease--> leased --complete--> done
+                        |--fail--> pending (retry after a doubling delay) or failed (attempts used up)
+                        '--lease expires--> pending / failed (the worker died)
+
+Completed results are kept until they have been written to data/history
+(mark_recorded), so a run that dies between analysis and recording loses
+nothing. Several workers, threads or processes can drain one database
+concurrently: leasing is a single IMMEDIATE transaction.
+
+Usage:
+  python3 generate_backfill_matrix.py --depth 0 > matrix.json
+  python3 job_queue.py --enqueue matrix.json
+  python3 run_pipeline.py --queue data/jobs.db --drain     (safe to interrupt and rerun)
+  python3 job_queue.py --status
+  python3 job_queue.py --retry-failed
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config import get_display_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = "data/jobs.db"
+JOB_QUEUE_ENV = "JOB_QUEUE_DB"
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+STATES = (PENDING, LEASED, DONE, FAILED)
+
+LEASE_SECONDS = 1800
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY,
+    device        TEXT NOT NULL,
+    variant       TEXT NOT NULL,
+    version       TEXT NOT NULL,
+    payload       TEXT NOT NULL,
+    state         TEXT NOT NULL DEFAULT 'pending',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL,
+    not_before    REAL NOT NULL DEFAULT 0,
+    lease_owner   TEXT,
+    lease_expires REAL,
+    last_error    TEXT,
+    result        TEXT,
+    recorded      INTEGER NOT NULL DEFAULT 0,
+    created       REAL NOT NULL,
+    updated       REAL NOT NULL,
+    UNIQUE (device, variant, version)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, not_before);
+"""
+
+
+def job_entries(entries: Iterable[Dict]) -> List[Dict]:
+    """Matrix entries as queue jobs: fan-out targets (see generate_matrix.group_by_firmware) become jobs of their own."""
+    jobs = []
+    for entry in entries:
+        jobs.append({k: v for k, v in entry.items() if k != 'fanout'})
+        for target in entry.get('fanout') or []:
+            jobs.append({'device': target['device_short'], 'variant': target['variant'],
+                         'device_short': target['device_short'], 'device_name': get_display_name(target['device_short']),
+                         'version': target['version']})
+    return jobs
+
+
+class JobQueue:
+    """Queue of checks keyed by (device, variant, version)."""
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_attempts: int = MAX_ATTEMPTS, retry_delay: float = RETRY_DELAY):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        # Shared by worker threads; transactions are explicit and serialized by the lock
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self, func, *args):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = func(*args)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return value
+
+    @staticmethod
+    def _job(row) -> Optional[Dict]:
+        if row is None:
+            return None
+        return {**json.loads(row['payload']), 'id': row['id'], 'state': row['state'], 'attempts': row['attempts']}
+
+    def enqueue(self, entries: Iterable[Dict]) -> int:
+        """Add jobs (dicts with device, variant, version); existing keys are left untouched. Returns the number added."""
+        now = time.time()
+        rows = [(e['device'], e['variant'], e['version'], json.dumps(e), self.max_attempts, now, now)
+                for e in entries]
+
+        def insert():
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (device, variant, version, payload, max_attempts, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            return self.conn.total_changes - before
+        return self._transaction(insert)
+
+    def _expire_leases(self, now: float):
+        self.conn.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,"
+            " last_error = 'lease expired', lease_owner = NULL, lease_expires = NULL, updated = ?"
+            " WHERE state = 'leased' AND lease_expires < ?", (now, now))
+
+    def _take(self, where: str, args: tuple, owner: str, lease_seconds: float) -> Optional[Dict]:
+        now = time.time()
+        self._expire_leases(now)
+        row = self.conn.execute(
+            f"SELECT * FROM jobs WHERE state = 'pending' AND not_before <= ? AND {where} ORDER BY id LIMIT 1",
+            (now, *args)).fetchone()
+        if row is None:
+            return None
+        self.conn.execute(
+            "UPDATE jobs SET state = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?,"
+            " updated = ? WHERE id = ?", (owner, now + lease_seconds, now, row['id']))
+        return self._job(self.conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone())
+
+    def lease(self, owner: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Dict]:
+        """Claim the oldest runnable job, or None if nothing is runnable right now."""
+        return self._transaction(self._take, "1", (), owner, lease_seconds)
+
+    def claim(self, entry: Dict, owner: str, lease_seconds: float = LEASE_SECONDS) -> Optional[Dict]:
+        """Enqueue one job if new and lease it. None if it is done, failed for good, waiting to retry or held by another worker."""
+        self.enqueue([entry])
+        return self._transaction(self._take, "device = ? AND variant = ? AND version = ?",
+                                 (entry['device'], entry['variant'], entry['version']), owner, lease_seconds)
+
+    def renew(self, job_id: int, owner: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Extend a lease held by owner; False if it was lost."""
+        def update():
+            return self.conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (time.time() + lease_seconds, time.time(), job_id, owner)).rowcount == 1
+        return self._transaction(update)
+
+    def complete(self, job_id: int, owner: str, result: Dict) -> bool:
+        def update():
+            return self.conn.execute(
+                "UPDATE jobs SET state = 'done', result = ?, last_error = NULL, lease_owner = NULL,"
+                " lease_expires = NULL, updated = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (json.dumps(result), time.time(), job_id, owner)).rowcount == 1
+        return self._transaction(update)
+
+    def fail(self, job_id: int, owner: str, error: str) -> bool:
+        """Give a leased job back: retried after retry_delay * 2^(attempts-1) seconds, or failed once attempts are used up."""
+        def update():
+            now = time.time()
+            return self.conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,"
+                " not_before = ? + ? * (1 << (attempts - 1)), last_error = ?, lease_owner = NULL,"
+                " lease_expires = NULL, updated = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (now, self.retry_delay, str(error), now, job_id, owner)).rowcount == 1
+        return self._transaction(update)
+
+    def retry_failed(self) -> int:
+        """Give failed jobs a fresh set of attempts. Returns the number requeued."""
+        def update():
+            return self.conn.execute(
+                "UPDATE jobs SET state = 'pending', attempts = 0, not_before = 0, updated = ? WHERE state = 'failed'",
+                (time.time(),)).rowcount
+        return self._transaction(update)
+
+    def unrecorded_results(self) -> List[Dict]:
+        """Results of done jobs not yet written to history, each with its job 'id'."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, result FROM jobs WHERE state = 'done' AND recorded = 0 ORDER BY id").fetchall()
+        return [{**json.loads(row['result']), 'id': row['id']} for row in rows]
+
+    def mark_recorded(self, job_ids: Iterable[int]):
+        ids = [(job_id,) for job_id in job_ids]
+        self._transaction(lambda: self.conn.executemany("UPDATE jobs SET recorded = 1 WHERE id = ?", ids))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            self._expire_leases(time.time())
+            rows = self.conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        return {**{state: 0 for state in STATES}, **{row['state']: row['n'] for row in rows}}
+
+    def failures(self) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM jobs WHERE state = 'failed' ORDER BY id").fetchall()
+        return [{**self._job(row), 'last_error': row['last_error']} for row in rows]
+
+
+def drain(queue: JobQueue, handler: Callable[[Dict], Dict], workers: int = 4,
+          lease_seconds: float = LEASE_SECONDS) -> Dict[str, int]:
+    """
+    Run handler(job) on worker threads until no job is runnable. A job whose
+    handler raises or returns None is failed (and retried later). Returns
+    counts of jobs completed and failed by this call.
+    """
+    owner = f"{os.uname().nodename}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    totals = {DONE: 0, FAILED: 0}
+    totals_lock = threading.Lock()
+
+    def work():
+        while True:
+            job = queue.lease(owner, lease_seconds)
+            if job is None:
+                return
+            name = f"{job['device']} {job['variant']} {job['version']}"
+            try:
+                result = handler(job)
+                error = None if result else "no result"
+            except Exception as e:
+                result, error = None, str(e) or type(e).__name__
+            if error is None:
+                queue.complete(job['id'], owner, result)
+                logger.info(f"{name}: done")
+            else:
+                queue.fail(job['id'], owner, error)
+                logger.warning(f"{name}: attempt {job['attempts']} failed: {error}")
+            with totals_lock:
+                totals[FAILED if error else DONE] += 1
+
+    threads = [threading.Thread(target=work, name=f"queue-worker-{i}") for i in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return totals
+
+
+def load_matrix(path: str) -> List[Dict]:
+    """Entries of a {"include": [...]} matrix (as printed by generate_matrix / generate_backfill_matrix)."""
+    content = sys.stdin.read() if path == '-' else Path(path).read_text()
+    data = json.loads(content)
+    return data.get('include', []) if isinstance(data, dict) else data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and fill the persistent check queue.")
+    parser.add_argument("--db", default=os.environ.get(JOB_QUEUE_ENV, DEFAULT_QUEUE_PATH), help="Queue database")
+    parser.add_argument("--enqueue", metavar="MATRIX_JSON", help="Add the entries of a matrix file ('-' for stdin)")
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue jobs that used up their attempts")
+    parser.add_argument("--status", action="store_true", help="Show job counts and failures")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    with JobQueue(args.db) as queue:
+        if args.enqueue:
+            entries = job_entries(e for e in load_matrix(args.enqueue) if e.get('version'))
+            logger.info(f"Enqueued {queue.enqueue(entries)} new of {len(entries)} jobs")
+        if args.retry_failed:
+            logger.info(f"Requeued {queue.retry_failed()} failed jobs")
+        if args.status or not (args.enqueue or args.retry_failed):
+            print(json.dumps(queue.counts()))
+            for job in queue.failures():
+                print(f"failed: {job['device']} {job['variant']} {job['version']} "
+                      f"after {job['attempts']} attempts: {job['last_error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Minimal reader for Android A/B OTA payloads (payload.bin, "CrAU" format).
+Parses the header and DeltaArchiveManifest with a tiny protobuf decoder,
+so only the bytes belonging to the requested partition have to be read.
+In-process replacement for otaripper/payload-dumper-go on full OTAs.
+"""
+
+import os
+import bz2
+import sys
+import lzma
+import zlib
+import struct
+import hashlib
+import zipfile
+import argparse
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_MAGIC = b'CrAU'
+PAYLOAD_NAME = 'payload.bin'
+ZIP_LOCAL_HEADER_SIZE = 30
+ZIP_LOCAL_MAGIC = b'PK\x03\x04'
+ZIP_FLAG_DATA_DESCRIPTOR = 0x08
+ZIP64_EXTRA_ID = 0x0001
+
+# InstallOperation.Type values from update_metadata.proto
+OP_REPLACE = 0
+OP_REPLACE_BZ = 1
+OP_ZERO = 6
+OP_DISCARD = 7
+OP_REPLACE_XZ = 8
+OP_REPLACE_ZSTD = 14
+
+# lzma, bz2, zstandard and hashlib release the GIL, so operations decode in parallel
+DEFAULT_WORKERS = min(os.cpu_count() or 1, 8)
+
+OP_NAMES = {
+    0: 'REPLACE', 1: 'REPLACE_BZ', 2: 'MOVE', 3: 'BSDIFF', 4: 'SOURCE_COPY',
+    5: 'SOURCE_BSDIFF', 6: 'ZERO', 7: 'DISCARD', 8: 'REPLACE_XZ', 9: 'PUFFDIFF',
+    10: 'BROTLI_BSDIFF', 11: 'ZUCCHINI', 12: 'LZ4DIFF_BSDIFF', 13: 'LZ4DIFF_PUFFDIFF',
+    14: 'REPLACE_ZSTD',
+}
+
+
+def _read_varint(buf, pos: int):
+    """Decode a protobuf base-128 varint starting at pos. Returns (value, new_pos)."""
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ValueError("Truncated varint")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("Varint too long")
+
+
+def _iter_fields(buf):
+    """Yield (field_number, value) for every field of a serialized protobuf message."""
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == 1:
+            value = struct.unpack_from('<Q', buf, pos)[0]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            if pos + length > end:
+                raise ValueError("Truncated length-delimited field")
+            value = bytes(buf[pos:pos + length])
+            pos += length
+        elif wire_type == 5:
+            value = struct.unpack_from('<I', buf, pos)[0]
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        yield field, value
+
+
+def _parse_extent(buf) -> dict:
+    extent = {'start_block': 0, 'num_blocks': 0}
+    for field, value in _iter_fields(buf):
+        if field == 1:
+            extent['start_block'] = value
+        elif field == 2:
+            extent['num_blocks'] = value
+    return extent
+
+
+def _parse_operation(buf) -> dict:
+    op = {'type': OP_REPLACE, 'data_offset': 0, 'data_length': 0, 'dst_extents': []}
+    for field, value in _iter_fields(buf):
+        if field == 1:
+            op['type'] = value
+        elif field == 2:
+            op['data_offset'] = value
+        elif field == 3:
+            op['data_length'] = value
+        elif field == 6:
+            op['dst_extents'].append(_parse_extent(value))
+        elif field == 8:
+            op['data_sha256_hash'] = value
+    return op
+
+
+def _parse_partition(buf) -> dict:
+    partition = {'name': '', 'size': 0, 'hash': None, 'operations': []}
+    for field, value in _iter_fields(buf):
+        if field == 1:
+            partition['name'] = value.decode('utf-8')
+        elif field == 7:
+            # new_partition_info: PartitionInfo { size = 1; hash = 2; }
+            for info_field, info_value in _iter_fields(value):
+                if info_field == 1:
+                    partition['size'] = info_value
+                elif info_field == 2:
+                    partition['hash'] = info_value
+        elif field == 8:
+            partition['operations'].append(_parse_operation(value))
+    return partition
+
+
+def parse_manifest(buf) -> dict:
+    """Parse the fields of DeltaArchiveManifest needed to extract full-OTA partitions."""
+    manifest = {'block_size': 4096, 'minor_version': 0, 'partitions': []}
+    for field, value in _iter_fields(buf):
+        if field == 3:
+            manifest['block_size'] = value
+        elif field == 12:
+            manifest['minor_version'] = value
+        elif field == 13:
+            manifest['partitions'].append(_parse_partition(value))
+    return manifest
+
+
+def _read_exact(f, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError(f"Unexpected end of payload (wanted {size} bytes, got {len(data)})")
+    return data
+
+
+def read_header(f, base: int = 0) -> dict:
+    """Read the CrAU header of a payload starting at offset base of file object f."""
+    f.seek(base)
+    fixed = _read_exact(f, 20)
+    magic, version, manifest_size = struct.unpack('>4sQQ', fixed)
+    if magic != PAYLOAD_MAGIC:
+        raise ValueError(f"Not a payload.bin (magic {magic!r})")
+
+    metadata_signature_size = 0
+    header_size = 20
+    if version >= 2:
+        metadata_signature_size = struct.unpack('>I', _read_exact(f, 4))[0]
+        header_size = 24
+
+    return {
+        'version': version,
+        'manifest_size': manifest_size,
+        'metadata_signature_size': metadata_signature_size,
+        'manifest_offset': base + header_size,
+        'data_offset': base + header_size + manifest_size + metadata_signature_size,
+    }
+
+
+def read_manifest(f, base: int = 0):
+    """Read header and manifest. Returns (header, manifest)."""
+    header = read_header(f, base)
+    f.seek(header['manifest_offset'])
+    manifest = parse_manifest(_read_exact(f, header['manifest_size']))
+    return header, manifest
+
+
+def find_partition(manifest: dict, name: str) -> dict:
+    for partition in manifest['partitions']:
+        if partition['name'] == name:
+            return partition
+    return None
+
+
+def locate_payload(f) -> int:
+    """Return the absolute offset of payload.bin's data inside an OTA zip file object."""
+    with zipfile.ZipFile(f) as z:
+        info = z.getinfo(PAYLOAD_NAME)
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError("payload.bin is compressed inside the zip; random access is not possible")
+
+    # The central directory does not record the local header's extra field length,
+    # so read the local header itself to find where the data starts.
+    f.seek(info.header_offset)
+    local_header = _read_exact(f, ZIP_LOCAL_HEADER_SIZE)
+    if local_header[:4] != ZIP_LOCAL_MAGIC:
+        raise ValueError("Bad zip local file header for payload.bin")
+    name_len, extra_len = struct.unpack('<HH', local_header[26:30])
+    return info.header_offset + ZIP_LOCAL_HEADER_SIZE + name_len + extra_len
+
+
+def _zip64_compressed_size(extra: bytes, uncompressed_size: int) -> int:
+    """Compressed size from a local header's zip64 extra field (uncompressed size comes first if also 0xFFFFFFFF)."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        field_id, length = struct.unpack('<HH', extra[pos:pos + 4])
+        if field_id == ZIP64_EXTRA_ID:
+            offset = pos + 4 + (8 if uncompressed_size == 0xFFFFFFFF else 0)
+            return struct.unpack('<Q', extra[offset:offset + 8])[0]
+        pos += 4 + length
+    raise ValueError("zip64 entry without a zip64 extra field")
+
+
+def scan_zip_stream(f, keep=()) -> tuple:
+    """
+    Walk an OTA zip's local headers front to back until payload.bin, for forward-only
+    streams where the central directory (at the end) is out of reach.
+    Returns (payload offset, {name: content} for entries named in keep that precede it).
+    """
+    kept = {}
+    while True:
+        local_header = _read_exact(f, ZIP_LOCAL_HEADER_SIZE)
+        if local_header[:4] != ZIP_LOCAL_MAGIC:
+            raise ValueError("payload.bin not found before the end of the zip entries")
+        flags, method = struct.unpack('<HH', local_header[6:10])
+        compressed_size, uncompressed_size, name_len, extra_len = struct.unpack('<IIHH', local_header[18:30])
+        name = _read_exact(f, name_len).decode('utf-8', 'replace')
+        extra = _read_exact(f, extra_len)
+        data_offset = f.tell()
+        if name == PAYLOAD_NAME:
+            if method != zipfile.ZIP_STORED:
+                raise ValueError("payload.bin is compressed inside the zip; streaming extraction is not possible")
+            return data_offset, kept
+        if compressed_size == 0xFFFFFFFF:
+            compressed_size = _zip64_compressed_size(extra, uncompressed_size)
+        elif flags & ZIP_FLAG_DATA_DESCRIPTOR and not compressed_size:
+            raise ValueError(f"Size of {name} is only in its data descriptor; cannot skip it in a stream")
+        if name in keep:
+            data = _read_exact(f, compressed_size)
+            kept[name] = zlib.decompress(data, -15) if method == zipfile.ZIP_DEFLATED else data
+        else:
+            f.seek(data_offset + compressed_size)
+
+
+def _extent_bytes(op: dict, block_size: int) -> int:
+    return sum(extent['num_blocks'] for extent in op['dst_extents']) * block_size
+
+
+def _decode_operation(op: dict, blob: bytes, block_size: int) -> bytes:
+    op_type = op['type']
+    if op_type == OP_REPLACE:
+        return blob
+    if op_type == OP_REPLACE_BZ:
+        return bz2.decompress(blob)
+    if op_type == OP_REPLACE_XZ:
+        return lzma.decompress(blob)
+    if op_type == OP_REPLACE_ZSTD:
+        if zstandard is None:
+            raise ValueError("REPLACE_ZSTD operation requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(blob, max_output_size=_extent_bytes(op, block_size))
+    if op_type in (OP_ZERO, OP_DISCARD):
+        return bytes(_extent_bytes(op, block_size))
+    raise ValueError(f"Unsupported operation {OP_NAMES.get(op_type, op_type)} (only full OTAs are supported)")
+
+
+def _read_blob(f, header: dict, op: dict) -> bytes:
+    if not op['data_length']:
+        return b''
+    f.seek(header['data_offset'] + op['data_offset'])
+    return _read_exact(f, op['data_length'])
+
+
+def _apply_operation(op: dict, blob: bytes, image: bytearray, block_size: int, verify: bool) -> int:
+    """Verify and decode one operation's blob into its destination extents of image. Returns the end offset written."""
+    expected = op.get('data_sha256_hash')
+    if verify and expected and hashlib.sha256(blob).digest() != expected:
+        raise ValueError(f"Data hash mismatch for operation at offset {op['data_offset']}")
+    data = _decode_operation(op, blob, block_size)
+
+    pos = end = 0
+    for extent in op['dst_extents']:
+        start = extent['start_block'] * block_size
+        length = min(extent['num_blocks'] * block_size, len(data) - pos)
+        image[start:start + length] = data[pos:pos + length]
+        pos += length
+        end = max(end, start + length)
+    return end
+
+
+def extract_partition(f, name: str, base: int = 0, header: dict = None, manifest: dict = None,
+                      out_path=None, verify: bool = True, workers: int = None):
+    """
+    Extract a partition image from a payload in file object f (payload starts at base).
+    Blobs are read in order on the calling thread; operations are verified, decoded and
+    written into the preallocated image by up to `workers` threads.
+    Returns the image bytes, or writes them to out_path and returns the path.
+    """
+    if header is None or manifest is None:
+        header, manifest = read_manifest(f, base)
+
+    partition = find_partition(manifest, name)
+    if not partition:
+        raise ValueError(f"Partition {name} not found in payload")
+
+    block_size = manifest['block_size']
+    # Preallocated once, so worker threads only ever assign to disjoint slices
+    end = max([(e['start_block'] + e['num_blocks']) * block_size
+               for op in partition['operations'] for e in op['dst_extents']], default=0)
+    image = bytearray(max(partition['size'], end))
+    # Blobs are read in payload order, so forward-only streams (see scan_zip_stream) work too
+    operations = sorted(partition['operations'], key=lambda op: op['data_offset'] if op['data_length'] else 0)
+    workers = min(workers or DEFAULT_WORKERS, len(operations))
+
+    written = 0
+    if workers <= 1:
+        for op in operations:
+            written = max(written, _apply_operation(op, _read_blob(f, header, op), image, block_size, verify))
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='payload') as pool:
+            pending = deque()
+            for op in operations:
+                # Bound the blobs held in memory to a couple per worker
+                if len(pending) >= 2 * workers:
+                    written = max(written, pending.popleft().result())
+                pending.append(pool.submit(_apply_operation, op, _read_blob(f, header, op), image, block_size, verify))
+            for future in pending:
+                written = max(written, future.result())
+
+    # Extents may run past the declared size; keep only what was actually written there
+    del image[max(partition['size'], written):]
+    if verify and partition['hash'] and hashlib.sha256(image).digest() != partition['hash']:
+        raise ValueError(f"Partition hash mismatch for {name}")
+
+    if out_path is None:
+        return bytes(image)
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_bytes(image)
+    return out_path
+
+
+def extract_from_zip(zip_path, names, output_dir, verify: bool = True, workers: int = None) -> dict:
+    """Extract the named partitions from an OTA zip into output_dir/<name>.img. Returns {name: path}."""
+    output_dir = Path(output_dir)
+    results = {}
+    with open(zip_path, 'rb') as f:
+        base = locate_payload(f)
+        header, manifest = read_manifest(f, base)
+        for name in names:
+            results[name] = extract_partition(f, name, base, header, manifest,
+                                              out_path=output_dir / f"{name}.img", verify=verify, workers=workers)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract partitions from an OTA zip's payload.bin.")
+    parser.add_argument("zip_path", help="Path to firmware.zip")
+    parser.add_argument("-p", "--partitions", default="xbl_config", help="Comma-separated partition names")
+    parser.add_argument("-o", "--output", default="extracted", help="Output directory")
+    parser.add_argument("--list", action="store_true", help="List partitions and exit")
+    parser.add_argument("--no-verify", action="store_true", help="Skip SHA-256 verification")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="Decompression threads")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    try:
+        if args.list:
+            with open(args.zip_path, 'rb') as f:
+                _, manifest = read_manifest(f, locate_payload(f))
+            for partition in manifest['partitions']:
+                print(f"{partition['name']}\t{partition['size']}")
+            return
+
+        names = [n.strip() for n in args.partitions.split(',') if n.strip()]
+        for name, path in extract_from_zip(args.zip_path, names, args.output, not args.no_verify, args.workers).items():
+            logger.info(f"Extracted {name} -> {path}")
+    except Exception as e:
+        logger.error(f"Extraction failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
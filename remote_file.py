@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Seekable read-only file object backed by HTTP Range requests.
+Lets zipfile and the payload reader pull only the bytes they need from a remote OTA.
+
+RemoteFile reads whole blocks through an LRU cache: sequential reads pull a few
+blocks ahead, nearby missing blocks are coalesced into one Range request, and
+prefetch() fetches many scattered ranges (e.g. a partition's operation blobs)
+in as few requests as possible. Opening probes the size with a suffix range, so
+the zip end-of-central-directory record, zip64 locator and (for OTAs, small)
+central directory are usually already cached: reading OTA metadata from a URL
+takes about two round trips. Expired signed URLs (HTTP 401/403/410) are
+replaced through an optional refresh callback, e.g. signed_url_refresher().
+
+StreamingFile is the forward-only counterpart for servers that ignore Range.
+"""
+
+import io
+import logging
+import re
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import USER_AGENT
+from http_client import get_client
+
+logger = logging.getLogger(__name__)
+
+CONTENT_RANGE_RE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+)')
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+BLOCK_SIZE = 64 * 1024
+CACHE_BYTES = 32 * 1024 * 1024
+READ_AHEAD_BLOCKS = 2
+# Missing blocks separated by at most this many cached/unneeded blocks are fetched in one request
+COALESCE_GAP_BLOCKS = 4
+# Fetched when opening: covers the end-of-central-directory record and an OTA's central directory
+TAIL_BYTES = 64 * 1024
+EXPIRED_STATUSES = {401, 403, 410}
+
+
+class URLExpiredError(OSError):
+    pass
+
+
+def signed_url_refresher(device_id: str, region: str, version: str) -> Callable[[], Optional[str]]:
+    """Refresh callback for RemoteFile that re-signs a Springer download URL for the same version."""
+    def refresh():
+        from fetch_firmware import get_signed_url_springer
+        info = get_signed_url_springer(device_id, region, version)
+        return info.get('url') if info else None
+    return refresh
+
+
+def _session(url: str):
+    """Pooled keep-alive session for the URL's host (see http_client)."""
+    return get_client().session_for(url)
+
+
+def _coalesce(blocks: List[int], gap: int) -> List[Tuple[int, int]]:
+    """Sorted block indices -> inclusive (first, last) runs, merging runs at most gap blocks apart."""
+    runs = []
+    for block in blocks:
+        if runs and block - runs[-1][1] <= gap + 1:
+            runs[-1][1] = block
+        else:
+            runs.append([block, block])
+    return [tuple(run) for run in runs]
+
+
+class RemoteFile(io.RawIOBase):
+    """File-like view of a remote URL over HTTP Range requests, with an LRU block cache."""
+
+    def __init__(self, url: str, session=None, timeout: int = 30, block_size: int = None,
+                 cache_bytes: int = CACHE_BYTES, read_ahead: int = READ_AHEAD_BLOCKS,
+                 coalesce_gap: int = COALESCE_GAP_BLOCKS, refresh: Optional[Callable[[], Optional[str]]] = None):
+        super().__init__()
+        self.url = url
+        self.session = session or _session(url)
+        self.timeout = timeout
+        self.block_size = block_size or BLOCK_SIZE
+        self.max_blocks = max(1, cache_bytes // self.block_size)
+        self.read_ahead = read_ahead
+        self.coalesce_gap = coalesce_gap
+        self.refresh = refresh
+        self.pos = 0
+        self.bytes_fetched = 0
+        self.requests_made = 0
+        self.cache_hits = 0
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._last_end = None
+        self.size = self._probe_size()
+
+    # HTTP
+
+    def _get(self, range_header: str, stream: bool = False):
+        """Range GET; on an expired signed URL, refresh it once and retry."""
+        for attempt in (0, 1):
+            response = self.session.get(
+                self.url,
+                headers={'User-Agent': USER_AGENT, 'Range': range_header},
+                timeout=self.timeout,
+                stream=stream,
+            )
+            if response.status_code in EXPIRED_STATUSES and attempt == 0 and self.refresh:
+                response.close()
+                new_url = self.refresh()
+                if not new_url:
+                    raise URLExpiredError(f"URL expired (HTTP {response.status_code}) and could not be refreshed")
+                logger.info("Signed URL expired, continuing with a refreshed one")
+                self.url = new_url
+                continue
+            response.raise_for_status()
+            self.requests_made += 1
+            return response
+
+    def _probe_size(self) -> int:
+        """
+        Determine the remote size with a suffix Range GET, caching the tail it returns;
+        falls back to a one-byte range (HEAD is avoided: signed URLs often reject it).
+        """
+        for range_header in (f'bytes=-{TAIL_BYTES}', 'bytes=0-0'):
+            # Streamed: a server that ignores Range would otherwise send the whole OTA before the check
+            response = self._get(range_header, stream=True)
+            try:
+                if response.status_code != 206:
+                    raise OSError(f"Server does not support range requests (HTTP {response.status_code})")
+                match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+                if not match:
+                    if range_header.startswith('bytes=-'):
+                        continue
+                    raise OSError("Missing or invalid Content-Range header")
+                start, size = int(match.group(1)), int(match.group(3))
+                if range_header.startswith('bytes=-'):
+                    data = response.content
+                    self.bytes_fetched += len(data)
+                    self._store_range(start, data, size)
+                return size
+            finally:
+                response.close()
+        raise OSError("Could not determine remote size")
+
+    # Block cache
+
+    def _block_count(self) -> int:
+        return (self.size + self.block_size - 1) // self.block_size
+
+    def _cache_put(self, index: int, data: bytes):
+        self._blocks[index] = data
+        self._blocks.move_to_end(index)
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+    def _store_range(self, start: int, data: bytes, size: int) -> Dict[int, bytes]:
+        """Cache every whole block (or the file's final partial block) covered by data at offset start."""
+        stored = {}
+        first = (start + self.block_size - 1) // self.block_size
+        end = start + len(data)
+        for index in range(first, (end + self.block_size - 1) // self.block_size):
+            block_start = index * self.block_size
+            block_end = min(block_start + self.block_size, size)
+            if block_end > end:
+                break
+            stored[index] = data[block_start - start:block_end - start]
+            self._cache_put(index, stored[index])
+        return stored
+
+    def _fetch_blocks(self, blocks: Iterable[int]) -> Dict[int, bytes]:
+        """Fetch missing blocks, coalescing nearby ones into single Range requests. Returns {index: data} fetched."""
+        fetched = {}
+        missing = sorted(b for b in set(blocks) if b not in self._blocks)
+        for first, last in _coalesce(missing, self.coalesce_gap):
+            start = first * self.block_size
+            end = min((last + 1) * self.block_size, self.size) - 1
+            response = self._get(f'bytes={start}-{end}')
+            if response.status_code != 206:
+                raise OSError(f"Expected partial content, got HTTP {response.status_code}")
+            match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+            if match and int(match.group(3)) != self.size:
+                # e.g. a refreshed URL that now points at a different build
+                raise OSError(f"Remote size changed from {self.size} to {match.group(3)}")
+            data = response.content
+            if len(data) != end - start + 1:
+                raise OSError(f"Short range response ({len(data)} of {end - start + 1} bytes)")
+            self.bytes_fetched += len(data)
+            fetched.update(self._store_range(start, data, self.size))
+        return fetched
+
+    def prefetch(self, ranges: Iterable[Tuple[int, int]]):
+        """Fetch many (offset, length) ranges ahead of reading them, in as few requests as possible."""
+        blocks = set()
+        for offset, length in ranges:
+            if length > 0 and offset < self.size:
+                last = min(offset + length, self.size) - 1
+                blocks.update(range(offset // self.block_size, last // self.block_size + 1))
+        self._fetch_blocks(blocks)
+
+    # File object
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            new_pos = offset
+        elif whence == io.SEEK_CUR:
+            new_pos = self.pos + offset
+        elif whence == io.SEEK_END:
+            new_pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if new_pos < 0:
+            raise ValueError("Negative seek position")
+        self.pos = new_pos
+        return self.pos
+
+    def readinto(self, b) -> int:
+        if self.pos >= self.size or len(b) == 0:
+            return 0
+        end = min(self.pos + len(b), self.size)
+        first, last = self.pos // self.block_size, (end - 1) // self.block_size
+        needed = range(first, last + 1)
+        wanted = list(needed)
+        if self._last_end == self.pos:
+            # Sequential access: pull the next blocks in the same request
+            wanted += range(last + 1, min(last + 1 + self.read_ahead, self._block_count()))
+        # Blocks are held for the duration of this read even if a large read evicts them from the cache
+        blocks = {index: self._blocks[index] for index in needed if index in self._blocks}
+        self.cache_hits += len(blocks)
+        for index in blocks:
+            self._blocks.move_to_end(index)
+        blocks.update(self._fetch_blocks(wanted))
+
+        view = memoryview(b)
+        n = 0
+        for index in needed:
+            block = blocks[index]
+            block_start = index * self.block_size
+            lo = max(self.pos, block_start) - block_start
+            hi = min(end, block_start + len(block)) - block_start
+            view[n:n + hi - lo] = block[lo:hi]
+            n += hi - lo
+        self.pos += n
+        self._last_end = self.pos
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.size - self.pos
+        buf = bytearray(max(0, min(size, self.size - self.pos)))
+        n = self.readinto(buf)
+        return bytes(buf[:n])
+
+
+class StreamingFile(io.RawIOBase):
+    """
+    Forward-only file object over one plain GET, for servers without Range support.
+    Bytes are consumed as they arrive; seeking ahead discards data, seeking back fails.
+    close() aborts the transfer, so a reader that stops early never downloads the rest.
+    """
+
+    def __init__(self, url: str, session=None, timeout: int = 30, chunk_size: int = None):
+        super().__init__()
+        self.url = url
+        self.session = session or _session(url)
+        self.response = self.session.get(url, headers={'User-Agent': USER_AGENT}, timeout=timeout, stream=True)
+        try:
+            self.response.raise_for_status()
+        except Exception:
+            self.response.close()
+            raise
+        length = self.response.headers.get('Content-Length')
+        self.size = int(length) if length and length.isdigit() else None
+        self._chunks = self.response.iter_content(chunk_size or STREAM_CHUNK_SIZE)
+        self._buffer = bytearray()
+        self.pos = 0
+        self.bytes_received = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self.pos
+
+    def _fill(self, size: int):
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if not chunk:
+                break
+            self.bytes_received += len(chunk)
+            self._buffer += chunk
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence != io.SEEK_SET:
+            raise OSError("Streaming file only supports forward seeks from the start or current position")
+        if offset < self.pos:
+            raise OSError(f"Cannot seek back to {offset} in a stream already at {self.pos}")
+        while self.pos < offset:
+            self._fill(1)
+            if not self._buffer:
+                break
+            skipped = min(len(self._buffer), offset - self.pos)
+            del self._buffer[:skipped]
+            self.pos += skipped
+        return self.pos
+
+    def readinto(self, b) -> int:
+        self._fill(len(b))
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        del self._buffer[:n]
+        self.pos += n
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            for chunk in self._chunks:
+                self.bytes_received += len(chunk)
+                self._buffer += chunk
+            data, self._buffer = bytes(self._buffer), bytearray()
+            self.pos += len(data)
+            return data
+        buf = bytearray(size)
+        n = self.readinto(buf)
+        return bytes(buf[:n])
+
+    def close(self):
+        if not self.closed:
+            self.response.close()
+        super().close()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Run the whole daily ARB check on one machine.
+
+Per variant:
+  resolve   fetch_firmware.resolve_latest (network; asyncio + threads, per-host limits)
+  probe     variants in failure backoff are skipped; failing ones must pass variant_health's cheap probe
+  skip      if the release is already in data/history (unless --force)
+  share     variants resolving to the same package (generate_matrix.firmware_key) await one analysis
+  analyze   analyze_firmware over HTTP Range requests, or a download stream cut off after xbl_config (process pool)
+  download  full zip, only if remote analysis failed (network; bounded by --downloads and --disk-budget)
+  analyze   analyze_firmware on the local zip (process pool)
+
+All results are then merged into data/history in one pass (update_history.merge_documents),
+outcomes are recorded in data/variant_health.json, and README.md and the site are regenerated once.
+
+With --queue, every check is a job in a persistent job_queue.JobQueue keyed by
+(device, variant, version): an interrupted run resumes where it stopped, finished
+checks are never redone, and results are recorded even if the previous run died
+before writing history. --drain instead works through jobs enqueued with
+job_queue.py --enqueue (e.g. a deep backfill matrix).
+"""
+
+import os
+import sys
+import json
+import shutil
+import asyncio
+import argparse
+import logging
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import HISTORY_DIR
+from analyze_firmware import analyze_firmware
+from blob_cache import BlobCache, DEFAULT_CACHE_DIR
+from fetch_firmware import resolve_latest, get_signed_url_springer, OOS_MAX_CONCURRENCY, SPRINGER_MAX_CONCURRENCY
+from firmware_version import same_version
+from springer_catalog import default_catalog
+from http_client import get_client
+from generate_matrix import matrix_entries, is_known_version, firmware_key
+from update_history import result_to_history, merge_documents
+from generate_readme import generate_readme
+from generate_site import generate as generate_site, load_all_history
+from history_store import open_store
+from job_queue import JobQueue, DEFAULT_QUEUE_PATH, JOB_QUEUE_ENV, LEASE_SECONDS, drain
+from variant_health import (HEALTH_PATH, VariantHealth, available_entries, is_direct_url,
+                            OK, FETCH_FAILED, NON_ZIP_URL, EXTRACTION_FAILED)
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+NETWORK_CONCURRENCY = 8
+DOWNLOAD_CONCURRENCY = 2
+DISK_BUDGET_GB = 20
+DEFAULT_WORK_DIR = "pipeline_work"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class DiskBudget:
+    """Bytes of scratch space that concurrent downloads may hold at once."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, size: int):
+        # A file larger than the whole budget may still run, but only alone
+        size = min(size, self.limit)
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.used -= size
+                self._condition.notify_all()
+
+
+def remote_size(url: str) -> Optional[int]:
+    """Content-Length of url via HEAD, or None if the server does not say."""
+    try:
+        response = get_client().request('HEAD', url, allow_redirects=True)
+        length = response.headers.get('Content-Length')
+        return int(length) if length else None
+    except Exception as e:
+        logger.warning(f"HEAD failed for {url}: {e}")
+        return None
+
+
+def download(url: str, dest: Path):
+    """Stream url to dest."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with get_client().session_for(url).get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        with open(dest, 'wb') as f:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+
+
+def analyze_job(job: Dict) -> Optional[Dict]:
+    """Process-pool entry point: analyze one firmware (remote URL or local zip) into job['work_dir']."""
+    work_dir = Path(job['work_dir'])
+    return analyze_firmware(job.get('zip_path'), job['tools_dir'], work_dir / "extracted",
+                            final_dir=work_dir, url=None if job.get('zip_path') else job['url'])
+
+
+class Pipeline:
+    """Schedules all variants: network stages on the event loop, extraction/parsing on a process pool."""
+
+    def __init__(self, history_dir=HISTORY_DIR, work_dir=DEFAULT_WORK_DIR, tools_dir="tools",
+                 cache_dir=DEFAULT_CACHE_DIR, workers: int = None, network: int = NETWORK_CONCURRENCY,
+                 downloads: int = DOWNLOAD_CONCURRENCY, disk_budget: int = DISK_BUDGET_GB * 1024 ** 3,
+                 force: bool = False, executor=None, health: Optional[VariantHealth] = None,
+                 queue: Optional[JobQueue] = None):
+        self.history_dir = Path(history_dir)
+        self.work_dir = Path(work_dir)
+        self.tools_dir = str(tools_dir)
+        self.cache = BlobCache(cache_dir) if cache_dir else None
+        self.force = force
+        self.health = health
+        self.queue = queue
+        self.owner = f"pipeline-{os.getpid()}"
+        self.network = network
+        self.downloads = downloads
+        self.disk_budget = disk_budget
+        self.executor = executor or ProcessPoolExecutor(max_workers=workers)
+        self.catalog = default_catalog()
+        self.oos_slots = threading.BoundedSemaphore(OOS_MAX_CONCURRENCY)
+        self.springer_slots = threading.BoundedSemaphore(SPRINGER_MAX_CONCURRENCY)
+
+    async def _in_thread(self, func, *args):
+        async with self._network_slots:
+            return await asyncio.get_running_loop().run_in_executor(self._threads, func, *args)
+
+    async def _analyze(self, job: Dict) -> Optional[Dict]:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, analyze_job, job)
+
+    def _memoized(self, item: Dict, version: str) -> Optional[Dict]:
+        if not self.cache:
+            return None
+        result = self.cache.get_result(self.cache.lookup(item['device'], item['variant'], version))
+        return dict(result) if result else None
+
+    def _remember(self, item: Dict, version: str, result: Dict, image: Optional[Path] = None):
+        # The blob cache is single-writer, so only the scheduler process records into it
+        if not self.cache:
+            return
+        if image is not None and image.exists():
+            result['_digest'] = self.cache.put_blob(image)
+            self.cache.put_result(result['_digest'], result)
+        if result.get('_digest'):
+            self.cache.record(item['device'], item['variant'], version, result['_digest'])
+
+    async def _analyze_package(self, item: Dict, info: Dict) -> Optional[Dict]:
+        """Remote analysis with full-download fallback, in a scratch directory named after the first variant."""
+        name = f"{item['device']} {item['variant']}"
+        work_dir = self.work_dir / f"{item['device']}_{item['variant']}"
+        try:
+            job = {'url': info['url'], 'tools_dir': self.tools_dir, 'work_dir': str(work_dir)}
+            result = await self._analyze(job)
+            if result is None and '.zip' in info['url']:
+                logger.info(f"{name}: remote analysis failed, downloading full package")
+                result = await self._download_and_analyze(job, work_dir)
+            if result is None:
+                logger.error(f"{name}: analysis failed")
+                return None
+            result.pop('ota_metadata', None)
+            self._remember(item, info['version'], result, work_dir / "xbl_config.img")
+            return result
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _outcome(self, item: Dict, outcome: str, version: Optional[str] = None, detail: Optional[str] = None):
+        if self.health is not None:
+            self.health.record(f"{item['device']}_{item['variant']}", outcome, version, detail)
+
+    async def run_variant(self, item: Dict) -> Optional[Dict]:
+        """Resolve, skip-or-analyze one variant. Returns a self-describing result (as uploaded by CI) or None."""
+        name = f"{item['device']} {item['variant']}"
+        info = await self._in_thread(resolve_latest, item['device'], item['variant'], self.catalog,
+                                     self.oos_slots, self.springer_slots)
+        if self.health is not None and not self.health.probe(f"{item['device']}_{item['variant']}", item['variant'], info):
+            return None
+        if not info or not info.get('url'):
+            logger.error(f"{name}: could not resolve latest firmware")
+            self._outcome(item, FETCH_FAILED, detail="latest firmware could not be resolved")
+            return None
+        version = info['version']
+        if not self.force and is_known_version(item['device_short'], item['variant'], version, self.history_dir):
+            logger.info(f"{name}: {version} already recorded, skipping")
+            return None
+        if self.queue is None:
+            return await self._check(item, info)
+
+        job = self.queue.claim({**item, 'version': version}, self.owner)
+        if job is None:
+            logger.info(f"{name}: {version} already done, waiting to retry or running elsewhere")
+            return None
+        result = await self._check(item, info)
+        if result:
+            self.queue.complete(job['id'], self.owner, result)
+        else:
+            self.queue.fail(job['id'], self.owner, "analysis failed")
+        return result
+
+    async def _check(self, item: Dict, info: Dict) -> Optional[Dict]:
+        """Analyze one resolved variant (memoized, shared with variants listing the same package)."""
+        name = f"{item['device']} {item['variant']}"
+        version = info['version']
+        result = self._memoized(item, version)
+        if result is None:
+            # Variants listing the same package share a single analysis
+            key = firmware_key(item['device'], item['variant'], version) or (item['device'], item['variant'])
+            task = self._packages.get(key)
+            if task is None:
+                task = self._packages[key] = asyncio.ensure_future(self._analyze_package(item, info))
+            else:
+                logger.info(f"{name}: same package as another variant, reusing its analysis")
+            shared = await task
+            if shared is None:
+                if not is_direct_url(info['url'], item['variant']):
+                    self._outcome(item, NON_ZIP_URL, version, "remote analysis failed and no direct download link")
+                else:
+                    self._outcome(item, EXTRACTION_FAILED, version, "analysis failed")
+                return None
+            result = dict(shared)
+            self._remember(item, version, result)
+
+        result.pop('_digest', None)
+        self._outcome(item, OK, version)
+        logger.info(f"{name}: {version} ARB {result.get('arb_index')}")
+        return {**result, 'device_short': item['device_short'], 'variant': item['variant'], 'version': version}
+
+    async def _download_and_analyze(self, job: Dict, work_dir: Path) -> Optional[Dict]:
+        zip_path = work_dir / "firmware.zip"
+        size = await self._in_thread(remote_size, job['url'])
+        async with self._download_slots, self._budget.reserve(size or self.disk_budget):
+            try:
+                await self._in_thread(download, job['url'], zip_path)
+            except Exception as e:
+                logger.error(f"Download failed for {job['url']}: {e}")
+                return None
+            try:
+                return await self._analyze({**job, 'zip_path': str(zip_path)})
+            finally:
+                zip_path.unlink(missing_ok=True)
+
+    def _resolve_version(self, item: Dict) -> Optional[Dict]:
+        """URL for a specific version: the latest release via resolve_latest, older ones via Springer."""
+        latest = resolve_latest(item['device'], item['variant'], self.catalog, self.oos_slots, self.springer_slots)
+        if latest and same_version(latest['version'], item['version']):
+            return latest
+        with self.springer_slots:
+            info = get_signed_url_springer(item['device'], item['variant'], item['version'], catalog=self.catalog)
+        return {**info, 'historical': True} if info else None
+
+    async def run_job(self, job: Dict) -> Optional[Dict]:
+        """Check one queued (device, variant, version) job."""
+        item = {k: job[k] for k in ('device', 'variant', 'device_short', 'device_name') if k in job}
+        info = await self._in_thread(self._resolve_version, job)
+        if not info or not info.get('url'):
+            logger.error(f"{job['device']} {job['variant']}: could not resolve {job['version']}")
+            return None
+        result = await self._check(item, info)
+        if result and info.get('historical'):
+            result['historical'] = True
+        return result
+
+    def _start(self):
+        self._network_slots = asyncio.Semaphore(self.network)
+        self._download_slots = asyncio.Semaphore(self.downloads)
+        self._budget = DiskBudget(self.disk_budget)
+        self._packages = {}
+        self._threads = ThreadPoolExecutor(max_workers=self.network)
+
+    async def drain(self, workers: int = NETWORK_CONCURRENCY, lease_seconds: float = LEASE_SECONDS) -> Dict[str, int]:
+        """Work through the queue's runnable jobs; returns counts completed/failed by this call."""
+        loop = asyncio.get_running_loop()
+        self._start()
+
+        def handler(job):
+            # Queue workers are threads; the check itself runs on this event loop
+            return asyncio.run_coroutine_threadsafe(self.run_job(job), loop).result()
+
+        try:
+            with ThreadPoolExecutor(max_workers=1) as runner:
+                return await loop.run_in_executor(runner, drain, self.queue, handler, workers, lease_seconds)
+        finally:
+            self._threads.shutdown(wait=False)
+
+    async def run(self, items: List[Dict]) -> List[Dict]:
+        """Run every variant concurrently; returns the successful results."""
+        self._start()
+        try:
+            outcomes = await asyncio.gather(*(self.run_variant(item) for item in items), return_exceptions=True)
+        finally:
+            self._threads.shutdown(wait=False)
+        results = []
+        for item, outcome in zip(items, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"{item['device']} {item['variant']}: {outcome}")
+            elif outcome:
+                results.append(outcome)
+        return results
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def record_results(results: List[Dict], history_dir, store=None) -> List[str]:
+    """Merge pipeline results into the history files in one pass."""
+    today = datetime.now().strftime("%Y-%m-%d")
+    incoming = {}
+    for data in results:
+        try:
+            doc = result_to_history(data, today)
+        except ValueError as e:
+            logger.warning(f"Not recording {data.get('device_short')}_{data.get('variant')}: {e}")
+            continue
+        if doc:
+            incoming.setdefault(f"{data['device_short']}_{data['variant']}", []).append(doc)
+    return merge_documents(incoming, Path(history_dir), store)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the full ARB check pipeline locally.")
+    parser.add_argument("--only", nargs="+", metavar="DEVICE_REGION", help="Limit to these variants (e.g. 15_EU 13_GLO)")
+    parser.add_argument("--force", action="store_true", help="Re-check variants whose latest version is already recorded")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size for extraction/parsing (default: CPU count)")
+    parser.add_argument("--network", type=int, default=NETWORK_CONCURRENCY, help="Concurrent network requests")
+    parser.add_argument("--downloads", type=int, default=DOWNLOAD_CONCURRENCY, help="Concurrent full-package downloads")
+    parser.add_argument("--disk-budget", type=float, default=DISK_BUDGET_GB, help="Scratch space for downloads, in GB")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Scratch directory")
+    parser.add_argument("--tools-dir", default="tools", help="Directory containing fallback tools")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Blob cache directory")
+    parser.add_argument("--history-dir", default=HISTORY_DIR, help="History directory")
+    parser.add_argument("--health", default=HEALTH_PATH, help="Variant health store (failure backoff)")
+    parser.add_argument("--queue", nargs="?", const=os.environ.get(JOB_QUEUE_ENV, DEFAULT_QUEUE_PATH),
+                        help=f"Track checks in a persistent job queue (default {DEFAULT_QUEUE_PATH}) so reruns resume")
+    parser.add_argument("--drain", action="store_true", help="Only work through jobs already in --queue (e.g. a backfill)")
+    parser.add_argument("--db", help="Also keep this SQLite history store in sync (defaults to $HISTORY_DB)")
+    parser.add_argument("--output", default="page", help="Site output directory")
+    parser.add_argument("--template", default="templates", help="Site template directory")
+    parser.add_argument("--no-publish", action="store_true", help="Only update history, skip README/site generation")
+    args = parser.parse_args()
+    if args.drain and not args.queue:
+        parser.error("--drain requires --queue")
+
+    # Backfill jobs are old releases: their failures say nothing about a variant's health
+    health = None if args.drain else VariantHealth(args.health)
+    items = []
+    if not args.drain:
+        items = matrix_entries()
+        if args.only:
+            items = [item for item in items if f"{item['device']}_{item['variant']}" in set(args.only)]
+        elif not args.force:
+            items = available_entries(items, health, datetime.now().date())
+        if not items:
+            logger.error("No variants selected")
+            sys.exit(1)
+
+    queue = JobQueue(args.queue) if args.queue else None
+    pipeline = Pipeline(args.history_dir, args.work_dir, args.tools_dir, args.cache_dir, args.workers,
+                        args.network, args.downloads, int(args.disk_budget * 1024 ** 3), args.force,
+                        health=health, queue=queue)
+    try:
+        if args.drain:
+            logger.info(f"Queue drained: {asyncio.run(pipeline.drain(args.network))}")
+        else:
+            results = asyncio.run(pipeline.run(items))
+    finally:
+        pipeline.close()
+    if health and health.pending:
+        health.save()
+    if queue:
+        # Includes results a previous, interrupted run completed but never recorded
+        results = queue.unrecorded_results()
+        job_ids = [result.pop('id') for result in results]
+
+    store = open_store(args.db)
+    written = record_results(results, args.history_dir, store)
+    if store:
+        store.close()
+    if queue:
+        queue.mark_recorded(job_ids)
+        queue.close()
+    logger.info(f"{len(results)} new result(s), {len(written)} history file(s) updated")
+    print(json.dumps({'results': results, 'updated': written}, indent=2))
+
+    if args.no_publish:
+        return
+    history_dir = Path(args.history_dir)
+    with open("README.md", "w", encoding="utf-8") as f:
+        f.write(generate_readme(load_all_history(history_dir)))
+    generate_site(history_dir, Path(args.output), Path(args.template), args.db, incremental=True)
+
+
+if __name__ == "__main__":
+    main()
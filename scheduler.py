@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Adaptive polling schedule for firmware checks.
+
+Each variant's polling interval is derived from its history: variants with a
+recent release (or still within their usual release cadence, the median gap
+between first_seen dates) are polled every run; older ones weekly or monthly.
+Next-due dates are persisted in data/poll_schedule.json (in CI, restored from
+the Actions cache and passed in via $POLL_SCHEDULE), and generate_matrix.py
+--scheduled only resolves variants that are due.
+"""
+
+import os
+import json
+import argparse
+import logging
+import statistics
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import HISTORY_DIR
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_PATH = "data/poll_schedule.json"
+SCHEDULE_ENV = "POLL_SCHEDULE"
+
+# (max days since the variant's last release, polling interval in days)
+POLL_TIERS = [(60, 1), (180, 3), (365, 7)]
+LEGACY_INTERVAL = 30
+ACTIVE_INTERVAL = POLL_TIERS[0][1]
+# Cadence is the median gap over this many most recent releases
+CADENCE_WINDOW = 6
+
+
+def _parse_date(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def release_dates(doc: Dict) -> List[date]:
+    """Distinct first_seen dates of a history document, oldest first."""
+    dates = {_parse_date(entry.get('first_seen')) for entry in doc.get('history', [])}
+    return sorted(d for d in dates if d)
+
+
+def cadence_days(dates: List[date]) -> Optional[float]:
+    """Median days between recent releases, or None with fewer than two."""
+    recent = dates[-CADENCE_WINDOW:]
+    gaps = [(b - a).days for a, b in zip(recent, recent[1:])]
+    return statistics.median(gaps) if gaps else None
+
+
+def poll_interval(doc: Dict, today: date) -> int:
+    """Days between polls for one variant."""
+    dates = release_dates(doc)
+    if not dates:
+        return ACTIVE_INTERVAL
+    age = (today - dates[-1]).days
+    cadence = cadence_days(dates)
+    if cadence is not None and age <= 2 * cadence:
+        # Still within its usual release rhythm
+        return ACTIVE_INTERVAL
+    for max_age, interval in POLL_TIERS:
+        if age <= max_age:
+            return interval
+    return LEGACY_INTERVAL
+
+
+def load_variant_history(device_id: str, region: str, history_dir=HISTORY_DIR) -> Dict:
+    history_file = Path(history_dir) / f"{device_id}_{region}.json"
+    try:
+        with open(history_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"history": []}
+
+
+def load_schedule(path=SCHEDULE_PATH) -> Dict[str, Dict]:
+    """{"<device>_<region>": {"last_polled", "next_due", "interval_days"}} from $POLL_SCHEDULE or path."""
+    content = os.environ.get(SCHEDULE_ENV)
+    try:
+        if content:
+            return json.loads(content)
+        if Path(path).exists():
+            with open(path, 'r') as f:
+                return json.load(f)
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable poll schedule: {e}")
+    return {}
+
+
+def save_schedule(schedule: Dict[str, Dict], path=SCHEDULE_PATH):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(schedule, f, indent=2, sort_keys=True)
+
+
+def is_due(schedule: Dict[str, Dict], key: str, today: date) -> bool:
+    next_due = _parse_date(schedule.get(key, {}).get('next_due'))
+    return next_due is None or next_due <= today
+
+
+def mark_polled(schedule: Dict[str, Dict], key: str, interval_days: int, today: date):
+    schedule[key] = {
+        'last_polled': today.isoformat(),
+        'next_due': (today + timedelta(days=interval_days)).isoformat(),
+        'interval_days': interval_days,
+    }
+
+
+def due_entries(entries: List[Dict], schedule: Dict[str, Dict], today: date) -> List[Dict]:
+    """Matrix entries whose variant is due for polling."""
+    due = [e for e in entries if is_due(schedule, f"{e['device']}_{e['variant']}", today)]
+    logger.info(f"Poll schedule: {len(due)} of {len(entries)} variants due")
+    return due
+
+
+def record_polls(polled: List[Dict], changed_keys, schedule: Dict[str, Dict], today: date,
+                 history_dir=HISTORY_DIR):
+    """Set next-due dates for polled entries; variants that just had a release stay on the active interval."""
+    for entry in polled:
+        key = f"{entry['device']}_{entry['variant']}"
+        if key in changed_keys:
+            interval = ACTIVE_INTERVAL
+        else:
+            interval = poll_interval(load_variant_history(entry['device_short'], entry['variant'], history_dir), today)
+        mark_polled(schedule, key, interval, today)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the adaptive polling schedule.")
+    parser.add_argument("--history-dir", default=HISTORY_DIR, help="History directory")
+    parser.add_argument("--schedule", default=SCHEDULE_PATH, help="Poll schedule file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    from generate_matrix import matrix_entries
+    today = date.today()
+    schedule = load_schedule(args.schedule)
+    for entry in matrix_entries():
+        key = f"{entry['device']}_{entry['variant']}"
+        doc = load_variant_history(entry['device_short'], entry['variant'], args.history_dir)
+        dates = release_dates(doc)
+        cadence = cadence_days(dates)
+        print(f"{key:24} last release {str(dates[-1]) if dates else '-':10}  "
+              f"cadence {f'{cadence:.0f}d' if cadence is not None else '-':>5}  "
+              f"every {poll_interval(doc, today):>2}d  next due {schedule.get(key, {}).get('next_due', 'now')}")
+
+
+if __name__ == "__main__":
+    main()
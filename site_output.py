@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Output stage for generate_site.py: minification, pre-compression and
+fingerprinted static assets.
+
+- HTML, CSS and JS are minified conservatively (comments and indentation
+  removed; nothing that could change rendering or script semantics).
+- Every artifact gets .gz (and .br when the optional `brotli` package is
+  installed) siblings at maximum compression, so static hosts can serve
+  pre-compressed bytes.
+- Files in templates/static/ are published as assets/<name>.<hash>.<ext>;
+  the hash changes with the content, so they can be cached indefinitely.
+"""
+
+import re
+import gzip
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict
+
+from build_manifest import write_if_changed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ASSET_DIR = "assets"
+STATIC_DIR_NAME = "static"
+FINGERPRINT_LENGTH = 10
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+
+_STYLE_RE = re.compile(r'(<style[^>]*>)(.*?)(</style>)', re.S | re.I)
+_SCRIPT_RE = re.compile(r'(<script[^>]*>)(.*?)(</script>)', re.S | re.I)
+
+
+def minify_css(text: str) -> str:
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text: str) -> str:
+    """Drop indentation, blank lines and whole-line // comments (line structure is kept for ASI)."""
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def minify_html(text: str) -> str:
+    """Strip comments and collapse whitespace around newlines; inline <style>/<script> are minified too."""
+    text = re.sub(r'<!--(?!\[if).*?-->', '', text, flags=re.S)
+    text = _STYLE_RE.sub(lambda m: m.group(1) + minify_css(m.group(2)) + m.group(3), text)
+    text = _SCRIPT_RE.sub(lambda m: m.group(1) + minify_js(m.group(2)) + m.group(3), text)
+    return re.sub(r'\s*\n\s*', '\n', text).strip() + '\n'
+
+
+MINIFIERS = {'.html': minify_html, '.css': minify_css, '.js': minify_js}
+
+
+def minify(name: str, content: str) -> str:
+    """Minify by file extension; other types (e.g. JSON, already compact) pass through."""
+    minifier = MINIFIERS.get(Path(name).suffix)
+    return minifier(content) if minifier else content
+
+
+def compressed_variants(data: bytes) -> Dict[str, bytes]:
+    """{'.gz': ..., '.br': ...} at maximum compression; .br only if brotli is available."""
+    # mtime=0 keeps the gzip bytes deterministic across builds
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return variants
+
+
+def compressed_suffixes() -> tuple:
+    """Suffixes of the compressed siblings this build writes (.br only if brotli is available)."""
+    return tuple(suffix for suffix in COMPRESSED_SUFFIXES if suffix != '.br' or brotli is not None)
+
+
+def remove_stale_siblings(path: Path) -> bool:
+    """Delete compressed siblings this build cannot write (e.g. .br from a build that had brotli)."""
+    removed = False
+    for suffix in set(COMPRESSED_SUFFIXES) - set(compressed_suffixes()):
+        sibling = Path(path).with_name(Path(path).name + suffix)
+        if sibling.exists():
+            sibling.unlink()
+            removed = True
+    return removed
+
+
+def write_output(path: Path, content: str) -> bool:
+    """Minify and write an artifact plus its compressed siblings. Returns True if anything was written."""
+    path = Path(path)
+    data = minify(path.name, content).encode('utf-8')
+    written = write_if_changed(path, data)
+    for suffix, compressed in compressed_variants(data).items():
+        sibling = path.with_name(path.name + suffix)
+        if written or not sibling.exists():
+            written = write_if_changed(sibling, compressed) or written
+    return remove_stale_siblings(path) or written
+
+
+def fingerprint_assets(template_dir: Path) -> Dict[str, tuple]:
+    """
+    Minify every file in <template_dir>/static/.
+    Returns {name: (output path relative to the site root, content)}.
+    """
+    assets = {}
+    static_dir = Path(template_dir) / STATIC_DIR_NAME
+    if not static_dir.exists():
+        return assets
+    for path in sorted(static_dir.iterdir()):
+        if not path.is_file():
+            continue
+        content = minify(path.name, path.read_text(encoding='utf-8'))
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:FINGERPRINT_LENGTH]
+        assets[path.name] = (f"{ASSET_DIR}/{path.stem}.{digest}{path.suffix}", content)
+    return assets
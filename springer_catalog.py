@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Cached view of the roms.danielspringer.at OTA catalog.
+
+The catalog page embeds every device/region/version in a single
+`data-devices` JSON attribute. It is fetched and parsed once per
+SpringerCatalog instance, optionally persisted to disk with a TTL and
+revalidated with ETag / Last-Modified when it goes stale.
+"""
+
+import html
+import json
+import os
+import time
+import logging
+import threading
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+from bs4 import BeautifulSoup
+
+from config import BASE_URL, USER_AGENT
+from http_client import get_client
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TTL = 3600  # seconds
+CATALOG_CACHE_ENV = "SPRINGER_CATALOG_CACHE"
+
+
+def parse_catalog(page_html: str) -> Optional[Dict]:
+    """Extract the device -> region -> [versions] mapping from the catalog page."""
+    soup = BeautifulSoup(page_html, 'html.parser')
+    device_select = soup.find('select', {'id': 'device'})
+    if not device_select:
+        logger.error("Could not find device select element")
+        return None
+
+    devices_json = device_select.get('data-devices')
+    if not devices_json:
+        logger.error("Could not find data-devices attribute")
+        return None
+
+    return json.loads(html.unescape(devices_json))
+
+
+class SpringerCatalog:
+    """Fetch-once catalog with optional on-disk persistence and conditional revalidation."""
+
+    def __init__(self, session=None, cache_path=None, ttl: int = CATALOG_TTL):
+        self.session = session or requests.Session()
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.ttl = ttl
+        self.devices = None
+        # True once the page was fetched on self.session (a disk-cached catalog never touches it)
+        self.page_loaded = False
+        self._upper_names = {}
+        self._lock = threading.Lock()
+
+    def _read_disk(self) -> Optional[Dict]:
+        if not self.cache_path or not self.cache_path.exists():
+            return None
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable catalog cache {self.cache_path}: {e}")
+            return None
+
+    def _write_disk(self, entry: Dict):
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_path.parent, prefix=f".{self.cache_path.name}.")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, self.cache_path)
+
+    def _set_devices(self, devices: Dict):
+        self.devices = devices
+        self._upper_names = {name.upper(): name for name in devices}
+
+    def load(self) -> Optional[Dict]:
+        """Return the parsed catalog, fetching it at most once per instance (thread-safe)."""
+        if self.devices is not None:
+            return self.devices
+        with self._lock:
+            if self.devices is not None:
+                return self.devices
+            return self._load()
+
+    def _load(self) -> Optional[Dict]:
+        cached = self._read_disk()
+        if cached and time.time() - cached.get('fetched_at', 0) < self.ttl:
+            logger.info(f"Using cached Springer catalog from {self.cache_path}")
+            self._set_devices(cached['devices'])
+            return self.devices
+
+        headers = {'User-Agent': USER_AGENT}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        try:
+            response = self.session.get(BASE_URL, headers=headers, timeout=15)
+            if cached and response.status_code == 304:
+                self.page_loaded = True
+                logger.info("Springer catalog not modified, refreshing cache timestamp")
+                cached['fetched_at'] = time.time()
+                self._write_disk(cached)
+                self._set_devices(cached['devices'])
+                return self.devices
+            response.raise_for_status()
+        except Exception as e:
+            logger.error(f"Error fetching page: {e}")
+            return None
+        self.page_loaded = True
+
+        devices = parse_catalog(response.text)
+        if devices is None:
+            return None
+
+        self._set_devices(devices)
+        self._write_disk({
+            'fetched_at': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'devices': devices,
+        })
+        return self.devices
+
+    def prime_session(self) -> bool:
+        """Load the page on self.session if the catalog did not (the download form needs that session)."""
+        with self._lock:
+            if self.page_loaded:
+                return True
+            try:
+                response = self.session.get(BASE_URL, headers={'User-Agent': USER_AGENT}, timeout=15)
+                response.raise_for_status()
+            except Exception as e:
+                logger.error(f"Error fetching page: {e}")
+                return False
+            self.page_loaded = True
+            return True
+
+    def resolve_device(self, name: str) -> Optional[str]:
+        """Resolve a SPRING_MAPPING name to the catalog's device key (exact, case-insensitive, then prefix)."""
+        if self.load() is None:
+            return None
+        if name in self.devices:
+            return name
+        upper = name.upper()
+        if upper in self._upper_names:
+            return self._upper_names[upper]
+        for candidate_upper, candidate in self._upper_names.items():
+            if candidate_upper.startswith(upper + " "):
+                return candidate
+        return None
+
+    def versions(self, device_name: str, region: str) -> Optional[List[str]]:
+        """Versions for an already-resolved device name and region, newest first."""
+        if self.load() is None:
+            return None
+        return self.devices.get(device_name, {}).get(region)
+
+
+def springer_session():
+    """Pooled, retrying keep-alive session for the Springer host (see http_client)."""
+    return get_client().session_for(BASE_URL)
+
+
+def default_catalog(session=None) -> SpringerCatalog:
+    """Catalog on the pooled Springer session, persisted at $SPRINGER_CATALOG_CACHE when set."""
+    return SpringerCatalog(session or springer_session(), cache_path=os.environ.get(CATALOG_CACHE_ENV))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Static JSON API generated alongside the site (page/api/v1/).
+
+  api/v1/index.json                 devices, their regions and per-resource hashes
+  api/v1/<device>/<region>.json     current firmware and full history of one variant
+  api/v1/latest.json                compact {"<device>_<region>": current firmware} map
+
+Output contains no timestamps and is serialized deterministically, so unchanged
+data produces byte-identical files (stable ETags for conditional requests).
+Clients can poll index.json or latest.json and only fetch a variant file when
+its sha256 in index.json changes.
+"""
+
+import json
+import hashlib
+from typing import Dict, List
+
+API_VERSION = "v1"
+API_DIR = f"api/{API_VERSION}"
+
+# Current-firmware fields exposed per variant
+CURRENT_FIELDS = ('version', 'arb', 'major', 'minor', 'last_checked')
+
+
+def dump_json(data) -> str:
+    """Deterministic compact serialization used for every API file."""
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False) + "\n"
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def variant_path(device: Dict, variant: Dict) -> str:
+    return f"{API_DIR}/{device['slug']}/{variant['region']}.json"
+
+
+def current_firmware(variant: Dict) -> Dict:
+    return {field: variant[field] for field in CURRENT_FIELDS}
+
+
+def variant_document(device: Dict, variant: Dict) -> Dict:
+    """Full record of one variant: current firmware plus archived history (newest first)."""
+    return {
+        'device': device['name'],
+        'device_id': device['id'],
+        'region': variant['region'],
+        'region_name': variant['region_name'],
+        'model': variant['model'],
+        'current': current_firmware(variant),
+        'history': variant['history'],
+    }
+
+
+def build_api(devices: List[Dict]) -> Dict[str, str]:
+    """
+    Render the API tree from generate_site.process_data() output.
+    Returns {relative path: file content}.
+    """
+    files = {}
+    index_devices = []
+    latest = {}
+    for device in devices:
+        regions = []
+        for variant in device['variants']:
+            path = variant_path(device, variant)
+            content = dump_json(variant_document(device, variant))
+            files[path] = content
+            regions.append({
+                'region': variant['region'],
+                'model': variant['model'],
+                'path': path[len(API_DIR) + 1:],
+                'sha256': content_hash(content),
+            })
+            latest[f"{device['id']}_{variant['region']}"] = current_firmware(variant)
+        index_devices.append({'id': device['id'], 'name': device['name'], 'regions': regions})
+
+    latest_content = dump_json(latest)
+    files[f"{API_DIR}/latest.json"] = latest_content
+    files[f"{API_DIR}/index.json"] = dump_json({
+        'api_version': API_VERSION,
+        'latest': {'path': 'latest.json', 'sha256': content_hash(latest_content)},
+        'devices': index_devices,
+    })
+    return files
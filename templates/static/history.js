@@ -0,0 +1,55 @@
+// History tables are loaded from per-variant JSON shards on first expand
+function escapeHtml(value) {
+    return String(value).replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' })[c]);
+}
+
+function statusBadge(arb) {
+    if (arb === 0) return '<span class="badge badge-safe">Safe</span>';
+    if (arb > 0) return '<span class="badge badge-danger">Protected</span>';
+    return '<span class="badge badge-warning">Unknown</span>';
+}
+
+// Same markup as the history_table macro on the device pages
+async function loadHistory(id, shard, btn) {
+    const response = await fetch(shard);
+    if (!response.ok) throw new Error(response.status);
+    const data = await response.json();
+    const rows = data.history.map(e =>
+        '<tr><td>' + escapeHtml(e.version) + '</td><td>' + escapeHtml(e.arb) + '</td><td>' + statusBadge(e.arb) +
+        '</td><td>Major: ' + escapeHtml(e.major) + ', Minor: ' + escapeHtml(e.minor) + '</td><td>' +
+        escapeHtml(e.last_checked) + '</td></tr>').join('');
+    const row = document.createElement('tr');
+    row.id = 'history-' + id;
+    row.className = 'history-row';
+    row.innerHTML = '<td colspan="6"><div class="history-container">' +
+        '<h4 style="margin: 0 0 10px 0; font-size: 0.9rem;">📜 Version History - ' + escapeHtml(btn.dataset.title || data.region) + '</h4>' +
+        '<table class="history-table"><thead><tr><th>Firmware Version</th><th>ARB</th><th>Status</th>' +
+        '<th>OEM Version</th><th>Last Seen</th></tr></thead><tbody>' + rows + '</tbody></table></div></td>';
+    btn.closest('tr').after(row);
+    return row;
+}
+
+async function toggleHistory(id, shard, btn) {
+    let row = document.getElementById('history-' + id);
+    if (row && row.classList.contains('active')) {
+        row.classList.remove('active');
+        btn.classList.remove('active');
+        btn.textContent = 'History';
+        return;
+    }
+    if (!row) {
+        btn.disabled = true;
+        btn.textContent = 'Loading...';
+        try {
+            row = await loadHistory(id, shard, btn);
+        } catch (e) {
+            btn.textContent = 'Retry';
+            return;
+        } finally {
+            btn.disabled = false;
+        }
+    }
+    row.classList.add('active');
+    btn.classList.add('active');
+    btn.textContent = 'Close';
+}
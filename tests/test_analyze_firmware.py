@@ -374,6 +374,22 @@ class TestAnalyzeFirmwareMain(unittest.TestCase):
         except (ImportError, NameError) as e:
             self.skipTest(f"Cannot import main: {e}")
 
+    @patch('analyze_firmware.analyze_firmware')
+    def test_main_cache_dir_requires_cache_key(self, mock_analyze):
+        """--cache-dir alone needs --device/--variant/--version to look anything up."""
+        from analyze_firmware import main
+
+        with patch('sys.argv', ['analyze_firmware.py', '--cache-dir', self.temp_dir]), \
+                patch('sys.stderr'), self.assertRaises(SystemExit):
+            main()
+        mock_analyze.assert_not_called()
+
+        mock_analyze.return_value = {'arb_index': '0', 'major': '3', 'minor': '0'}
+        argv = ['analyze_firmware.py', '--cache-dir', self.temp_dir, '--device', '15', '--variant', 'EU', '--version', 'V1']
+        with patch('sys.argv', argv), patch('builtins.print'):
+            main()
+        self.assertEqual(mock_analyze.call_args.kwargs['cache_key'], ('15', 'EU', 'V1'))
+
 
 class TestAnalyzeFirmwareEdgeCases(unittest.TestCase):
     """Test edge cases and boundary conditions."""
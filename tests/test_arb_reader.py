@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for arb_reader.py
+Builds synthetic signed xbl_config ELF images with MBN v6 and v7 hash segments.
+"""
+
+import json
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from arb_reader import parse_arb, read_arb, find_hash_segment, main
+
+HASH_SEGMENT_FLAGS = 2 << 24
+
+
+def _oem_metadata(major, minor, arb):
+    if major == 0:
+        words = [0] * 30
+        words[29] = arb
+    else:
+        words = [0] * 30
+        words[2] = arb
+    words[0], words[1] = major, minor
+    return struct.pack('<30I', *words)
+
+
+def _hash_segment_v6(arb, major=0, minor=0, qti_metadata=b''):
+    oem = _oem_metadata(major, minor, arb)
+    header = struct.pack('<12I', 0, 6, 0, 0, 0, 0, 0, 0, 0, 0, len(qti_metadata), len(oem))
+    return header + qti_metadata + oem + b'\xAA' * 64
+
+
+def _hash_segment_v7(arb, major=3, minor=0):
+    common = struct.pack('<6I', 0, 0, 0, 0, 0, 0)
+    qti = _oem_metadata(3, 0, 99)
+    oem = _oem_metadata(major, minor, arb)
+    header = struct.pack('<9I', 7, len(common), len(qti), len(oem), 64, 0, 0, 0, 0)
+    return header + common + qti + oem + b'\xBB' * 64
+
+
+def build_elf64(hash_segment):
+    phoff, phnum = 64, 2
+    seg_offset = phoff + phnum * 56
+    code = b'\x00' * 32
+    elf_header = bytearray(64)
+    elf_header[:6] = b'\x7fELF\x02\x01'
+    struct.pack_into('<Q', elf_header, 0x20, phoff)
+    struct.pack_into('<HH', elf_header, 0x36, 56, phnum)
+    phdrs = struct.pack('<IIQQQQQQ', 0, HASH_SEGMENT_FLAGS, seg_offset, 0, 0, len(hash_segment), 0, 0)
+    phdrs += struct.pack('<IIQQQQQQ', 1, 5, seg_offset + len(hash_segment), 0, 0, len(code), len(code), 0)
+    return bytes(elf_header) + phdrs + hash_segment + code
+
+
+def build_elf32(hash_segment):
+    phoff, phnum = 52, 1
+    seg_offset = phoff + phnum * 32
+    elf_header = bytearray(52)
+    elf_header[:6] = b'\x7fELF\x01\x01'
+    struct.pack_into('<I', elf_header, 0x1C, phoff)
+    struct.pack_into('<HH', elf_header, 0x2A, 32, phnum)
+    phdrs = struct.pack('<8I', 0, seg_offset, 0, 0, len(hash_segment), 0, HASH_SEGMENT_FLAGS, 0)
+    return bytes(elf_header) + phdrs + hash_segment
+
+
+class TestParseArb(unittest.TestCase):
+    """Tests for parsing ARB info from in-memory buffers."""
+
+    def test_v7_header_oem_metadata_v3(self):
+        info = parse_arb(build_elf64(_hash_segment_v7(arb=1)))
+        self.assertEqual(info['arb_index'], 1)
+        self.assertEqual((info['major'], info['minor']), (3, 0))
+        self.assertEqual(info['mbn_version'], 7)
+
+    def test_v6_header_metadata_v2(self):
+        info = parse_arb(build_elf64(_hash_segment_v6(arb=2, major=2, minor=0, qti_metadata=b'\x00' * 120)))
+        self.assertEqual(info['arb_index'], 2)
+        self.assertEqual(info['major'], 2)
+        self.assertEqual(info['mbn_version'], 6)
+
+    def test_v6_header_legacy_metadata(self):
+        info = parse_arb(build_elf64(_hash_segment_v6(arb=0)))
+        self.assertEqual(info['arb_index'], 0)
+        self.assertEqual(info['major'], 0)
+
+    def test_elf32(self):
+        info = parse_arb(build_elf32(_hash_segment_v6(arb=4, major=1)))
+        self.assertEqual(info['arb_index'], 4)
+
+    def test_accepts_memoryview(self):
+        info = parse_arb(memoryview(build_elf64(_hash_segment_v7(arb=5))))
+        self.assertEqual(info['arb_index'], 5)
+
+    def test_not_elf(self):
+        with self.assertRaises(ValueError):
+            parse_arb(b'\x00' * 128)
+
+    def test_no_hash_segment(self):
+        image = bytearray(build_elf64(_hash_segment_v7(arb=1)))
+        struct.pack_into('<I', image, 64 + 4, 0)  # clear segment type in p_flags
+        with self.assertRaises(ValueError):
+            find_hash_segment(bytes(image))
+
+    def test_legacy_header_without_metadata(self):
+        segment = struct.pack('<10I', 0, 5, 0, 0, 0, 0, 0, 0, 0, 0) + b'\x00' * 64
+        with self.assertRaises(ValueError):
+            parse_arb(build_elf64(segment))
+
+
+class TestReadArbFile(unittest.TestCase):
+    """Tests for mmap-based file reading and the CLI."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.image = Path(self.temp_dir) / 'xbl_config.img'
+        self.image.write_bytes(build_elf64(_hash_segment_v7(arb=1)))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_read_arb(self):
+        self.assertEqual(read_arb(self.image)['arb_index'], 1)
+
+    def test_read_arb_empty_file(self):
+        empty = Path(self.temp_dir) / 'empty.img'
+        empty.touch()
+        with self.assertRaises(ValueError):
+            read_arb(empty)
+
+    def test_cli_arbextract_format(self):
+        with patch('sys.argv', ['arb_reader.py', str(self.image)]), patch('sys.stdout', new_callable=StringIO) as out:
+            main()
+        self.assertIn('ARB (Anti-Rollback): 1', out.getvalue())
+        self.assertIn('Major Version: 3', out.getvalue())
+        self.assertIn('Minor Version: 0', out.getvalue())
+
+    def test_cli_json(self):
+        with patch('sys.argv', ['arb_reader.py', str(self.image), '--json']), \
+                patch('sys.stdout', new_callable=StringIO) as out:
+            main()
+        self.assertEqual(json.loads(out.getvalue()), {'arb_index': '1', 'major': '3', 'minor': '0'})
+
+    @patch('subprocess.run')
+    def test_analyze_firmware_skips_arbextract(self, mock_run):
+        from analyze_firmware import analyze_firmware
+
+        result = analyze_firmware(None, self.temp_dir, Path(self.temp_dir) / 'extracted', self.temp_dir)
+
+        self.assertEqual(result, {'arb_index': '1', 'major': '3', 'minor': '0'})
+        mock_run.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for blob_cache.py and its use by analyze_firmware.py
+"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from blob_cache import BlobCache, sha256_file
+from payload import OP_REPLACE_XZ, OP_REPLACE
+from tests.test_payload import build_payload, build_ota_zip, RangeServer
+from tests.test_arb_reader import build_elf64, _hash_segment_v7
+
+
+class TestBlobCache(unittest.TestCase):
+    """Test suite for the blob store, index and result memo."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = BlobCache(Path(self.temp_dir) / 'cache')
+        self.image = Path(self.temp_dir) / 'xbl_config.img'
+        self.image.write_bytes(b'image-bytes')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_put_blob_is_content_addressed(self):
+        digest = self.cache.put_blob(self.image)
+        self.assertEqual(digest, sha256_file(self.image))
+        self.assertTrue(self.cache.has_blob(digest))
+        # Storing the same content again is a no-op
+        self.assertEqual(self.cache.put_blob(self.image), digest)
+        self.assertEqual(len(list(self.cache.blob_dir.iterdir())), 1)
+
+    def test_concurrent_put_blob_same_digest(self):
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(8) as pool:
+            digests = set(pool.map(lambda _: self.cache.put_blob(self.image), range(32)))
+        self.assertEqual(len(digests), 1)
+        # No temp files left behind next to the blob
+        self.assertEqual([p.name for p in self.cache.blob_dir.iterdir()], [f"{digests.pop()}.img"])
+
+    def test_restore_blob(self):
+        digest = self.cache.put_blob(self.image)
+        dest = Path(self.temp_dir) / 'out' / 'xbl_config.img'
+        self.assertTrue(self.cache.restore_blob(digest, dest))
+        self.assertEqual(dest.read_bytes(), b'image-bytes')
+        self.assertFalse(self.cache.restore_blob('0' * 64, dest))
+
+    def test_index_and_results_persist(self):
+        digest = self.cache.put_blob(self.image)
+        self.cache.record('15', 'EU', 'CPH2747_16.0.3.503(EX01)', digest)
+        self.cache.put_result(digest, {'arb_index': '0', 'major': '3', 'minor': '0', 'ota_metadata': {}})
+
+        reloaded = BlobCache(self.cache.root)
+        self.assertEqual(reloaded.lookup('15', 'EU', 'CPH2747_16.0.3.503(EX01)'), digest)
+        self.assertIsNone(reloaded.lookup('15', 'GLO', 'CPH2747_16.0.3.503(EX01)'))
+        self.assertEqual(reloaded.get_result(digest), {'arb_index': '0', 'major': '3', 'minor': '0'})
+
+    def test_merge_job_additions(self):
+        old = self.cache.put_blob(self.image)
+        self.cache.record('15', 'EU', 'V1', old)
+        job = BlobCache(Path(self.temp_dir) / 'artifacts' / 'blobs-15-GLO' / 'blob_cache')
+        other_image = Path(self.temp_dir) / 'other.img'
+        other_image.write_bytes(b'other-bytes')
+        new = job.put_blob(other_image)
+        job.record('15', 'GLO', 'V2', new)
+        job.put_result(new, {'arb_index': '1', 'major': '3', 'minor': '0'})
+
+        self.assertEqual(self.cache.merge(job.root), 1)
+        self.assertEqual(self.cache.merge(job.root), 0)
+
+        reloaded = BlobCache(self.cache.root)
+        self.assertEqual(reloaded.lookup('15', 'EU', 'V1'), old)
+        self.assertEqual(reloaded.lookup('15', 'GLO', 'V2'), new)
+        self.assertTrue(reloaded.has_blob(new))
+        self.assertEqual(reloaded.get_result(new)['arb_index'], '1')
+
+    def test_corrupt_index_is_ignored(self):
+        self.cache.root.mkdir(parents=True, exist_ok=True)
+        self.cache.index_path.write_text('{not json')
+        self.assertEqual(BlobCache(self.cache.root).index, {})
+
+
+class TestAnalyzeFirmwareWithCache(unittest.TestCase):
+    """Identical partitions across variants are fetched and parsed only once."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.cache = BlobCache(self.temp_dir / 'cache')
+        self.xbl = build_elf64(_hash_segment_v7(arb=1))
+        payload, _ = build_payload([
+            ('system', [(OP_REPLACE, b'S' * 100000, 0)]),
+            ('xbl_config', [(OP_REPLACE_XZ, self.xbl, 0)]),
+        ])
+        self.ota = build_ota_zip(payload)
+        self.zip_path = self.temp_dir / 'firmware.zip'
+        self.zip_path.write_bytes(self.ota)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _analyze(self, final_name, **kwargs):
+        from analyze_firmware import analyze_firmware
+        return analyze_firmware(kwargs.pop('zip_path', None), self.temp_dir / 'tools', self.temp_dir / 'extracted',
+                                self.temp_dir / final_name, cache=self.cache, **kwargs)
+
+    @patch('remote_file.TAIL_BYTES', 1024)
+    @patch('remote_file.BLOCK_SIZE', 1024)
+    @patch('remote_file._session')
+    @patch('analyze_firmware.read_arb', wraps=__import__('arb_reader').read_arb)
+    def test_second_region_reuses_blob_and_result(self, mock_read_arb, mock_session):
+        first = self._analyze('eu', zip_path=self.zip_path, cache_key=('15', 'EU', 'V1'))
+        self.assertEqual(first['arb_index'], '1')
+        self.assertEqual(mock_read_arb.call_count, 1)
+
+        # GLO ships the identical partition: manifest hash matches, no data blob is fetched
+        server = RangeServer(self.ota)
+        mock_session.return_value = server
+        second = self._analyze('glo', url='https://example.com/glo.zip', cache_key=('15', 'GLO', 'V1'))
+
+        self.assertEqual(second['arb_index'], '1')
+        self.assertEqual(mock_read_arb.call_count, 1)
+        self.assertEqual((self.temp_dir / 'glo' / 'xbl_config.img').read_bytes(), self.xbl)
+        fetched = sum(end - start + 1 for start, end in server.ranges)
+        self.assertLess(fetched, len(self.ota) // 10)
+        self.assertEqual(self.cache.lookup('15', 'GLO', 'V1'), self.cache.lookup('15', 'EU', 'V1'))
+
+    def test_known_version_needs_no_input(self):
+        self._analyze('eu', zip_path=self.zip_path, cache_key=('15', 'EU', 'V1'))
+
+        result = self._analyze('again', cache_key=('15', 'EU', 'V1'))
+
+        self.assertEqual(result, {'arb_index': '1', 'major': '3', 'minor': '0'})
+        self.assertEqual((self.temp_dir / 'again' / 'xbl_config.img').read_bytes(), self.xbl)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,8 @@ import sys
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
 import tempfile
+import threading
+import time
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -17,14 +19,30 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from fetch_firmware import (
     get_from_oos_api,
     get_signed_url_springer,
+    fetch_all,
     main
 )
+from http_client import HttpClient
 
 
-class TestGetFromOOSAPI(unittest.TestCase):
+def _by_endpoint(url_response, ver_response):
+    """URL and version are requested concurrently, so answer by endpoint rather than call order."""
+    return lambda url, **kwargs: ver_response if url.endswith('/version') else url_response
+
+
+class FreshClientMixin:
+    """Give each test its own HTTP client (no shared circuit state, no backoff sleeps)."""
+
+    def setUp(self):
+        patcher = patch('fetch_firmware.get_client', return_value=HttpClient(backoff_base=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestGetFromOOSAPI(FreshClientMixin, unittest.TestCase):
     """Test suite for get_from_oos_api function."""
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_success(self, mock_get):
         """Test successful firmware fetch from OOS API."""
         # Mock URL response
@@ -39,7 +57,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
         mock_ver_response.text = 'CPH2747_16.0.3.501(EX01)'
         mock_ver_response.raise_for_status = Mock()
 
-        mock_get.side_effect = [mock_url_response, mock_ver_response]
+        mock_get.side_effect = _by_endpoint(mock_url_response, mock_ver_response)
 
         result = get_from_oos_api('15', 'GLO')
 
@@ -47,7 +65,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
         self.assertEqual(result['url'], 'https://example.com/firmware.zip')
         self.assertEqual(result['version'], 'CPH2747_16.0.3.501(EX01)')
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_oneplus_device(self, mock_get):
         """Test OOS API call for OnePlus device."""
         mock_url_response = Mock()
@@ -60,7 +78,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
         mock_ver_response.text = 'Version_1.0'
         mock_ver_response.raise_for_status = Mock()
 
-        mock_get.side_effect = [mock_url_response, mock_ver_response]
+        mock_get.side_effect = _by_endpoint(mock_url_response, mock_ver_response)
 
         result = get_from_oos_api('15', 'EU')
 
@@ -69,7 +87,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
         first_call = mock_get.call_args_list[0]
         self.assertIn('oneplus', first_call[0][0])
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_oppo_device(self, mock_get):
         """Test OOS API call for Oppo device."""
         mock_url_response = Mock()
@@ -82,7 +100,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
         mock_ver_response.text = 'Version_1.0'
         mock_ver_response.raise_for_status = Mock()
 
-        mock_get.side_effect = [mock_url_response, mock_ver_response]
+        mock_get.side_effect = _by_endpoint(mock_url_response, mock_ver_response)
 
         result = get_from_oos_api('Find X8', 'CN')
 
@@ -91,7 +109,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
         first_call = mock_get.call_args_list[0]
         self.assertIn('oppo', first_call[0][0])
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_invalid_url_response(self, mock_get):
         """Test OOS API with invalid URL response."""
         mock_url_response = Mock()
@@ -105,7 +123,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_empty_url(self, mock_get):
         """Test OOS API with empty URL response."""
         mock_url_response = Mock()
@@ -119,7 +137,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_network_error(self, mock_get):
         """Test OOS API with network error."""
         mock_get.side_effect = Exception('Network error')
@@ -128,7 +146,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_timeout(self, mock_get):
         """Test OOS API with timeout."""
         import requests
@@ -138,7 +156,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_http_error(self, mock_get):
         """Test OOS API with HTTP error."""
         mock_response = Mock()
@@ -154,7 +172,7 @@ class TestGetFromOOSAPI(unittest.TestCase):
 class TestGetSignedURLSpringer(unittest.TestCase):
     """Test suite for get_signed_url_springer function."""
 
-    @patch('fetch_firmware.requests.Session')
+    @patch('springer_catalog.springer_session')
     def test_get_signed_url_springer_success(self, mock_session_class):
         """Test successful firmware fetch from Springer."""
         mock_session = MagicMock()
@@ -190,7 +208,7 @@ class TestGetSignedURLSpringer(unittest.TestCase):
         self.assertEqual(result['url'], 'https://example.com/firmware.zip')
         self.assertEqual(result['version'], 'Version1')
 
-    @patch('fetch_firmware.requests.Session')
+    @patch('springer_catalog.springer_session')
     def test_get_signed_url_springer_with_target_version(self, mock_session_class):
         """Test Springer fetch with specific target version."""
         mock_session = MagicMock()
@@ -224,7 +242,7 @@ class TestGetSignedURLSpringer(unittest.TestCase):
         self.assertEqual(result['url'], 'https://example.com/firmware_v2.zip')
         self.assertEqual(result['version'], 'Version2')
 
-    @patch('fetch_firmware.requests.Session')
+    @patch('springer_catalog.springer_session')
     def test_get_signed_url_springer_device_not_found(self, mock_session_class):
         """Test Springer fetch when device is not found."""
         mock_session = MagicMock()
@@ -246,7 +264,7 @@ class TestGetSignedURLSpringer(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch('fetch_firmware.requests.Session')
+    @patch('springer_catalog.springer_session')
     def test_get_signed_url_springer_region_not_found(self, mock_session_class):
         """Test Springer fetch when region is not found."""
         mock_session = MagicMock()
@@ -268,7 +286,7 @@ class TestGetSignedURLSpringer(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch('fetch_firmware.requests.Session')
+    @patch('springer_catalog.springer_session')
     def test_get_signed_url_springer_version_not_found(self, mock_session_class):
         """Test Springer fetch when target version is not found."""
         mock_session = MagicMock()
@@ -290,7 +308,7 @@ class TestGetSignedURLSpringer(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch('fetch_firmware.requests.Session')
+    @patch('springer_catalog.springer_session')
     def test_get_signed_url_springer_no_result_box(self, mock_session_class):
         """Test Springer fetch when result box is missing."""
         mock_session = MagicMock()
@@ -318,7 +336,7 @@ class TestGetSignedURLSpringer(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch('fetch_firmware.requests.Session')
+    @patch('springer_catalog.springer_session')
     def test_get_signed_url_springer_network_error(self, mock_session_class):
         """Test Springer fetch with network error."""
         mock_session = MagicMock()
@@ -329,7 +347,7 @@ class TestGetSignedURLSpringer(unittest.TestCase):
 
         self.assertIsNone(result)
 
-    @patch('fetch_firmware.requests.Session')
+    @patch('springer_catalog.springer_session')
     def test_get_signed_url_springer_invalid_json(self, mock_session_class):
         """Test Springer fetch with invalid JSON in data-devices."""
         mock_session = MagicMock()
@@ -510,10 +528,10 @@ class TestMain(unittest.TestCase):
         mock_exit.assert_called_once_with(1)
 
 
-class TestEdgeCases(unittest.TestCase):
+class TestEdgeCases(FreshClientMixin, unittest.TestCase):
     """Test edge cases and boundary conditions."""
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_whitespace_in_response(self, mock_get):
         """Test OOS API handles whitespace in responses."""
         mock_url_response = Mock()
@@ -526,7 +544,7 @@ class TestEdgeCases(unittest.TestCase):
         mock_ver_response.text = '  Version1  '
         mock_ver_response.raise_for_status = Mock()
 
-        mock_get.side_effect = [mock_url_response, mock_ver_response]
+        mock_get.side_effect = _by_endpoint(mock_url_response, mock_ver_response)
 
         result = get_from_oos_api('15', 'GLO')
 
@@ -534,7 +552,7 @@ class TestEdgeCases(unittest.TestCase):
         self.assertEqual(result['url'], 'https://example.com/firmware.zip')
         self.assertEqual(result['version'], 'Version1')
 
-    @patch('fetch_firmware.requests.Session')
+    @patch('springer_catalog.springer_session')
     def test_get_signed_url_springer_html_entities(self, mock_session_class):
         """Test Springer handles HTML entities in URLs."""
         mock_session = MagicMock()
@@ -568,7 +586,7 @@ class TestEdgeCases(unittest.TestCase):
         self.assertIn('&', result['url'])
         self.assertNotIn('&amp;', result['url'])
 
-    @patch('fetch_firmware.requests.get')
+    @patch('http_client.requests.Session.get')
     def test_get_from_oos_api_unmapped_device(self, mock_get):
         """Test OOS API with unmapped device ID (uses fallback)."""
         mock_url_response = Mock()
@@ -581,7 +599,7 @@ class TestEdgeCases(unittest.TestCase):
         mock_ver_response.text = 'Version1'
         mock_ver_response.raise_for_status = Mock()
 
-        mock_get.side_effect = [mock_url_response, mock_ver_response]
+        mock_get.side_effect = _by_endpoint(mock_url_response, mock_ver_response)
 
         # Device not in OOS_MAPPING should use fallback
         result = get_from_oos_api('Unknown_Device', 'GLO')
@@ -590,5 +608,78 @@ class TestEdgeCases(unittest.TestCase):
         self.assertIsNotNone(result)
 
 
+
+class TestFetchAll(unittest.TestCase):
+    """Test suite for concurrent all-variants resolution."""
+
+    def _tracking(self, result, delay=0.2):
+        """Return a side_effect that sleeps and records peak concurrency."""
+        state = {'active': 0, 'peak': 0}
+        lock = threading.Lock()
+
+        def side_effect(*args, **kwargs):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(delay)
+            with lock:
+                state['active'] -= 1
+            return result(*args) if callable(result) else result
+        return side_effect, state
+
+    @patch('fetch_firmware.get_signed_url_springer')
+    @patch('fetch_firmware.get_from_oos_api')
+    def test_resolves_concurrently_within_oos_cap(self, mock_oos_api, mock_springer):
+        side_effect, state = self._tracking(lambda d, r: {'url': f'https://x/{d}_{r}.zip', 'version': 'V1'})
+        mock_oos_api.side_effect = side_effect
+        variants = [(str(i), 'GLO') for i in range(8)]
+
+        start = time.monotonic()
+        results = fetch_all(variants, max_workers=8, oos_concurrency=4)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual(results['3_GLO']['url'], 'https://x/3_GLO.zip')
+        self.assertEqual(state['peak'], 4)
+        self.assertLess(elapsed, 8 * 0.2)
+        mock_springer.assert_not_called()
+
+    @patch('fetch_firmware.get_signed_url_springer')
+    @patch('fetch_firmware.get_from_oos_api')
+    def test_springer_fallback_uses_own_cap(self, mock_oos_api, mock_springer):
+        mock_oos_api.return_value = None
+        side_effect, state = self._tracking({'url': 'https://springer/x.zip', 'version': 'V1'}, delay=0.1)
+        mock_springer.side_effect = side_effect
+
+        results = fetch_all([(str(i), 'CN') for i in range(6)], max_workers=6, springer_concurrency=2)
+
+        self.assertEqual(state['peak'], 2)
+        self.assertTrue(all(r['url'] == 'https://springer/x.zip' for r in results.values()))
+        # All Springer lookups share one catalog
+        catalogs = {id(c.kwargs['catalog']) for c in mock_springer.call_args_list}
+        self.assertEqual(len(catalogs), 1)
+
+    @patch('fetch_firmware.get_signed_url_springer')
+    @patch('fetch_firmware.get_from_oos_api')
+    def test_failures_recorded_as_none(self, mock_oos_api, mock_springer):
+        mock_oos_api.side_effect = Exception('boom')
+        mock_springer.return_value = None
+
+        results = fetch_all([('15', 'GLO'), ('13', 'EU')])
+
+        self.assertEqual(results, {'15_GLO': None, '13_EU': None})
+
+    @patch('sys.argv', ['fetch_firmware.py', '--all'])
+    @patch('fetch_firmware.fetch_all')
+    def test_main_all_prints_single_document(self, mock_fetch_all):
+        mock_fetch_all.return_value = {'15_GLO': {'url': 'https://x.zip', 'version': 'V1'}, '15_CN': None}
+
+        with patch('builtins.print') as mock_print:
+            main()
+
+        mock_print.assert_called_once()
+        self.assertEqual(json.loads(mock_print.call_args[0][0]), mock_fetch_all.return_value)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for firmware_version.py
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from firmware_version import (parse_version, version_sort_key, version_key, same_version,
+                              latest_version, VersionIndex)
+
+
+class TestParseVersion(unittest.TestCase):
+    """Test suite for version parsing."""
+
+    def test_modern(self):
+        parsed = parse_version('CPH2747_16.0.3.503(EX01)')
+        self.assertEqual(parsed.model, 'CPH2747')
+        self.assertEqual(parsed.os_major, 16)
+        self.assertEqual(parsed.build, (0, 3, 503))
+        self.assertEqual(parsed.region_tag, 'EX01')
+
+    def test_without_model(self):
+        parsed = parse_version('16.0.3.503(EX01)')
+        self.assertIsNone(parsed.model)
+        self.assertEqual(parsed.key, parse_version('CPH2747_16.0.3.503(EX01)').key)
+
+    def test_legacy(self):
+        parsed = parse_version('IN2025_11_F.67')
+        self.assertEqual((parsed.model, parsed.os_major, parsed.build, parsed.region_tag), ('IN2025', 11, (6, 67), None))
+
+    def test_unparseable(self):
+        self.assertIsNone(parse_version('not a version'))
+        self.assertIsNone(parse_version(''))
+
+    def test_memoized(self):
+        self.assertIs(parse_version('CPH2747_16.0.3.503(EX01)'), parse_version('CPH2747_16.0.3.503(EX01)'))
+
+
+class TestOrdering(unittest.TestCase):
+    """Test suite for sort keys and matching."""
+
+    def test_numeric_build_order(self):
+        versions = ['NE2211_15.0.0.700(EX01)', 'NE2211_16.0.3.500(EX01)', 'NE2211_15.0.0.1302(EX01)', 'NE2211_11_F.67']
+        self.assertEqual(sorted(versions, key=version_sort_key, reverse=True), [
+            'NE2211_16.0.3.500(EX01)', 'NE2211_15.0.0.1302(EX01)', 'NE2211_15.0.0.700(EX01)', 'NE2211_11_F.67'])
+        self.assertEqual(latest_version(versions), 'NE2211_16.0.3.500(EX01)')
+
+    def test_unparseable_sorts_first(self):
+        self.assertLess(version_sort_key('garbage'), version_sort_key('IN2025_11_A.1'))
+
+    def test_same_version(self):
+        self.assertTrue(same_version('CPH2747_16.0.3.503(EX01)', ' 16.0.3.503(EX01)'))
+        self.assertFalse(same_version('CPH2747_16.0.3.503(EX01)', 'CPH2747_16.0.3.503(CN01)'))
+        self.assertEqual(version_key('garbage'), 'garbage')
+
+
+class TestVersionIndex(unittest.TestCase):
+    """Test suite for catalog lookups."""
+
+    def setUp(self):
+        self.index = VersionIndex(['CPH2747_16.0.3.503(EX01)', 'CPH2747_16.0.3.501(EX01)', 'CPH2747_16.0.2.401(EX01)'])
+
+    def test_exact_and_identity(self):
+        self.assertEqual(self.index.find('CPH2747_16.0.3.501(EX01)'), 1)
+        self.assertEqual(self.index.find('16.0.2.401(EX01)'), 2)
+
+    def test_partial_target_falls_back_to_substring(self):
+        self.assertEqual(self.index.find('16.0.3.501'), 1)
+
+    def test_missing(self):
+        self.assertEqual(self.index.find('CPH2747_16.0.9.999(EX01)'), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for generate_backfill_matrix.py
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate_backfill_matrix import generate_backfill_matrix, missing_versions, interleave
+
+LISTED = ["CPH2747_16.0.1.300(EX01)", "CPH2747_16.0.3.503(EX01)", "CPH2747_15.0.0.700(EX01)",
+          "CPH2747_16.0.2.401(EX01)", "CPH2747_15.0.0.1302(EX01)"]
+
+
+class TestBackfillMatrix(unittest.TestCase):
+    """Test suite for missing-version backfill selection."""
+
+    def setUp(self):
+        self.history_dir = Path(tempfile.mkdtemp())
+        self._write_history("15_EU", ["CPH2747_16.0.3.503(EX01)", "16.0.2.401(EX01)"])
+
+    def tearDown(self):
+        shutil.rmtree(self.history_dir)
+
+    def _write_history(self, name, versions):
+        with open(self.history_dir / f"{name}.json", 'w') as f:
+            json.dump({"history": [{"version": v, "arb": 0} for v in versions]}, f)
+
+    def test_only_unknown_versions_newest_first(self):
+        self.assertEqual(missing_versions("15", "EU", LISTED, depth=3, history_dir=self.history_dir),
+                         ["CPH2747_16.0.1.300(EX01)"])
+        self.assertEqual(missing_versions("15", "EU", LISTED, depth=0, history_dir=self.history_dir),
+                         ["CPH2747_16.0.1.300(EX01)", "CPH2747_15.0.0.1302(EX01)", "CPH2747_15.0.0.700(EX01)"])
+
+    def test_since_sets_a_version_floor(self):
+        self.assertEqual(missing_versions("15", "EU", LISTED, depth=0, since="15.0.0.1000",
+                                          history_dir=self.history_dir),
+                         ["CPH2747_16.0.1.300(EX01)", "CPH2747_15.0.0.1302(EX01)"])
+
+    def test_unparseable_versions_keep_catalog_order(self):
+        listed = ["CPH2747_16.0.3.600(EX01)", "OnePlus15Oxygen_beta_2", "CPH2747_16.0.1.300(EX01)",
+                  "CPH2747_15.0.0.700(EX01)"]
+        self.assertEqual(missing_versions("15", "EU", listed, depth=3, history_dir=self.history_dir),
+                         ["CPH2747_16.0.3.600(EX01)", "OnePlus15Oxygen_beta_2", "CPH2747_16.0.1.300(EX01)"])
+        self.assertEqual(missing_versions("15", "EU", listed, depth=0, since="16.0", history_dir=self.history_dir),
+                         ["CPH2747_16.0.3.600(EX01)", "OnePlus15Oxygen_beta_2", "CPH2747_16.0.1.300(EX01)"])
+
+    def test_interleave_gives_every_variant_its_newest_first(self):
+        order = interleave({("15", "EU"): ["a1", "a2", "a3"], ("13", "CN"): ["b1"]})
+        self.assertEqual(order, [("15", "EU", "a1"), ("13", "CN", "b1"), ("15", "EU", "a2"), ("15", "EU", "a3")])
+
+    @patch('generate_backfill_matrix.get_springer_versions', return_value=(LISTED, None))
+    def test_repeated_backfill_converges(self, mock_versions):
+        def run(**kwargs):
+            with patch.dict(os.environ, {}, clear=False), patch('sys.stdout', new_callable=StringIO):
+                os.environ.pop('GITHUB_OUTPUT', None)
+                return generate_backfill_matrix(device="15", variant="EU", history_dir=self.history_dir,
+                                                catalog=object(), **kwargs)
+
+        jobs = run(depth=0, max_jobs=2)
+        self.assertEqual([j["version"] for j in jobs], ["CPH2747_16.0.1.300(EX01)", "CPH2747_15.0.0.1302(EX01)"])
+
+        # Once those land in history, only the remainder is queued, then nothing
+        self._write_history("15_EU", [v for v in LISTED if v != "CPH2747_15.0.0.700(EX01)"])
+        self.assertEqual([j["version"] for j in run(depth=0)], ["CPH2747_15.0.0.700(EX01)"])
+        self._write_history("15_EU", LISTED)
+        self.assertEqual(run(depth=0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
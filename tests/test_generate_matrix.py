@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Tests for generate_matrix.py delta (change-detection) mode.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate_matrix import generate_matrix, detect_changes, load_known_versions, group_by_firmware
+
+VARIANTS = [
+    {"device": "15", "variant": "GLO", "device_short": "15", "device_name": "OnePlus 15"},
+    {"device": "15", "variant": "EU", "device_short": "15", "device_name": "OnePlus 15"},
+    {"device": "13", "variant": "CN", "device_short": "13", "device_name": "OnePlus 13"},
+]
+
+
+class TestDeltaMatrix(unittest.TestCase):
+    """Test suite for change detection against history files."""
+
+    def setUp(self):
+        self.history_dir = Path(tempfile.mkdtemp())
+        for name, version in (("15_GLO", "V2"), ("15_EU", "V1")):
+            with open(self.history_dir / f"{name}.json", 'w') as f:
+                json.dump({"history": [{"version": version, "arb": 0}]}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.history_dir)
+
+    def test_load_known_versions(self):
+        self.assertEqual(load_known_versions("15", "GLO", self.history_dir), {"V2"})
+        self.assertEqual(load_known_versions("13", "CN", self.history_dir), set())
+
+    def test_only_new_or_unknown_versions_kept(self):
+        resolver_calls = []
+
+        def resolver(variants):
+            resolver_calls.append(variants)
+            return {"15_GLO": {"version": "V2"}, "15_EU": {"version": "V2"}, "13_CN": None}
+
+        changed = detect_changes(VARIANTS, self.history_dir, resolver=resolver)
+
+        self.assertEqual([(c["device"], c["variant"]) for c in changed], [("15", "EU"), ("13", "CN")])
+        # One bulk resolution for all variants
+        self.assertEqual(len(resolver_calls), 1)
+        self.assertEqual(len(resolver_calls[0]), 3)
+
+    @patch('generate_matrix.detect_changes')
+    def test_force_skips_detection(self, mock_detect):
+        with patch.dict(os.environ, {}, clear=False), patch('sys.stdout', new_callable=StringIO):
+            os.environ.pop('GITHUB_OUTPUT', None)
+            full = generate_matrix(delta=True, force=True)
+        mock_detect.assert_not_called()
+        self.assertGreater(len(full), 10)
+
+    @patch('generate_matrix.detect_changes', return_value=[])
+    def test_empty_delta_reports_no_jobs(self, mock_detect):
+        output = self.history_dir / 'github_output'
+        with patch.dict(os.environ, {'GITHUB_OUTPUT': str(output)}):
+            generate_matrix(delta=True)
+        lines = output.read_text().splitlines()
+        self.assertIn('matrix={"include": []}', lines)
+        self.assertIn('has_jobs=false', lines)
+
+    @patch('generate_matrix.matrix_entries', return_value=[dict(v) for v in VARIANTS])
+    def test_scheduled_polls_only_due_variants(self, mock_entries):
+        schedule_path = self.history_dir / 'poll_schedule.json'
+        schedule_path.write_text(json.dumps({"15_GLO": {"next_due": "2999-01-01"}}))
+        polled = []
+
+        def detect(items, history_dir, health=None):
+            polled.extend(f"{i['device']}_{i['variant']}" for i in items)
+            return [dict(items[0], version="V9")]
+
+        with patch('generate_matrix.detect_changes', side_effect=detect), \
+                patch.dict(os.environ, {}, clear=False), patch('sys.stdout', new_callable=StringIO):
+            os.environ.pop('GITHUB_OUTPUT', None)
+            os.environ.pop('POLL_SCHEDULE', None)
+            jobs = generate_matrix(delta=True, history_dir=self.history_dir, scheduled=True, schedule_path=schedule_path,
+                                   health_path=self.history_dir / 'variant_health.json')
+
+        self.assertEqual(polled, ["15_EU", "13_CN"])
+        self.assertEqual([(j["device"], j["variant"]) for j in jobs], [("15", "EU")])
+        schedule = json.loads(schedule_path.read_text())
+        self.assertEqual(schedule["15_GLO"], {"next_due": "2999-01-01"})
+        self.assertEqual(schedule["15_EU"]["interval_days"], 1)
+        self.assertIn("next_due", schedule["13_CN"])
+
+    @patch('generate_matrix.matrix_entries', return_value=[dict(v) for v in VARIANTS])
+    def test_scheduled_without_delta_advances_schedule(self, mock_entries):
+        schedule_path = self.history_dir / 'poll_schedule.json'
+        schedule_path.write_text(json.dumps({"15_GLO": {"next_due": "2999-01-01"}}))
+
+        with patch('generate_matrix.detect_changes') as mock_detect, \
+                patch.dict(os.environ, {}, clear=False), patch('sys.stdout', new_callable=StringIO):
+            os.environ.pop('GITHUB_OUTPUT', None)
+            os.environ.pop('POLL_SCHEDULE', None)
+            jobs = generate_matrix(history_dir=self.history_dir, scheduled=True, schedule_path=schedule_path,
+                                   health_path=self.history_dir / 'variant_health.json')
+
+        mock_detect.assert_not_called()
+        self.assertEqual([(j["device"], j["variant"]) for j in jobs], [("15", "EU"), ("13", "CN")])
+        schedule = json.loads(schedule_path.read_text())
+        self.assertGreater(schedule["15_EU"]["next_due"], date.today().isoformat())
+        self.assertGreater(schedule["13_CN"]["next_due"], date.today().isoformat())
+
+
+    @patch('generate_matrix.matrix_entries', return_value=[dict(v) for v in VARIANTS])
+    def test_failing_variants_backed_off_and_probed(self, mock_entries):
+        health_path = self.history_dir / 'variant_health.json'
+        health_path.write_text(json.dumps({
+            # Still in backoff: not even resolved
+            "15_GLO": {"failures": 3, "last_outcome": "fetch_failed", "next_probe": "2999-01-01"},
+            # Probe due, but upstream still lists the package that failed extraction
+            "15_EU": {"failures": 1, "last_outcome": "extraction_failed", "version": "V2", "next_probe": "2000-01-01"},
+        }))
+        resolved = []
+
+        def resolver(variants):
+            resolved.extend(variants)
+            return {"15_EU": {"url": "https://x/fw.zip", "version": "V2"}, "13_CN": {"url": "https://x/cn.zip", "version": "V5"}}
+
+        outcomes_path = self.history_dir / 'outcome.json'
+        with patch('fetch_firmware.fetch_all', side_effect=resolver), \
+                patch.dict(os.environ, {}, clear=False), patch('sys.stdout', new_callable=StringIO):
+            os.environ.pop('GITHUB_OUTPUT', None)
+            jobs = generate_matrix(delta=True, history_dir=self.history_dir,
+                                   health_path=health_path, outcomes_path=outcomes_path)
+
+        self.assertEqual(resolved, [("15", "EU"), ("13", "CN")])
+        self.assertEqual([(j["device"], j["variant"]) for j in jobs], [("13", "CN")])
+        health = json.loads(health_path.read_text())
+        self.assertEqual(health["15_EU"]["failures"], 2)
+        self.assertEqual([r["key"] for r in json.loads(outcomes_path.read_text())], ["15_EU"])
+
+
+class TestGroupByFirmware(unittest.TestCase):
+    """Test suite for cross-variant deduplication."""
+
+    def test_same_model_and_release_grouped(self):
+        entries = [dict(VARIANTS[0], version="CPH2747_16.0.3.503(EX01)"),
+                   dict(VARIANTS[1], version="CPH2747_16.0.3.503(EX01)"),
+                   dict(VARIANTS[2], version="PJZ110_16.0.3.503(CN01)")]
+        jobs = group_by_firmware(entries)
+        self.assertEqual([(j["device"], j["variant"]) for j in jobs], [("15", "GLO"), ("13", "CN")])
+        self.assertEqual(jobs[0]["fanout"], [{"device_short": "15", "variant": "EU", "version": "CPH2747_16.0.3.503(EX01)"}])
+        self.assertNotIn("fanout", jobs[1])
+        self.assertNotIn("fanout", entries[0])
+
+    def test_different_releases_or_unresolved_not_grouped(self):
+        entries = [dict(VARIANTS[0], version="CPH2747_16.0.3.503(EX01)"),
+                   dict(VARIANTS[1], version="CPH2747_16.0.3.501(EX01)"),
+                   dict(VARIANTS[0]), dict(VARIANTS[1])]
+        self.assertEqual(len(group_by_firmware(entries)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
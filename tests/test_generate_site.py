@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests for generate_site.py incremental builds.
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate_site import generate
+from build_manifest import BuildManifest, MANIFEST_NAME
+
+TEMPLATE_DIR = Path(__file__).parent.parent / 'templates'
+
+
+class TestIncrementalBuild(unittest.TestCase):
+    """Test suite for manifest-driven rebuilds."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.history_dir = self.temp_dir / 'history'
+        self.output_dir = self.temp_dir / 'page'
+        self.template_dir = self.temp_dir / 'templates'
+        shutil.copytree(TEMPLATE_DIR, self.template_dir)
+        self._write_history('V1')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write_history(self, version):
+        self.history_dir.mkdir(exist_ok=True)
+        data = {"history": [{"version": version, "arb": 0, "major": 3, "minor": 0,
+                             "first_seen": "2026-01-01", "last_checked": "2026-01-01", "status": "current"}],
+                "device": "OnePlus 15", "device_id": "15", "region": "EU", "model": "CPH2747"}
+        (self.history_dir / '15_EU.json').write_text(json.dumps(data, indent=2))
+
+    def _build(self):
+        generate(self.history_dir, self.output_dir, self.template_dir, incremental=True)
+        return self.output_dir / 'index.html'
+
+    def test_unchanged_inputs_skip_render_and_keep_mtime(self):
+        index = self._build()
+        self.assertIn('V1', index.read_text())
+        self.assertTrue((self.output_dir / MANIFEST_NAME).exists())
+        mtime = index.stat().st_mtime_ns
+
+        with patch('generate_site.load_all_history') as mock_load, patch('generate_site.Environment') as mock_env:
+            self._build()
+        mock_load.assert_not_called()
+        mock_env.assert_not_called()
+        self.assertEqual(index.stat().st_mtime_ns, mtime)
+
+    def test_history_change_rebuilds(self):
+        self._build()
+        self._write_history('V2')
+        self.assertIn('V2', self._build().read_text())
+
+    def test_template_change_rebuilds(self):
+        self._build()
+        template = self.template_dir / 'base.html'
+        template.write_text(template.read_text().replace('</body>', '<p>changed</p></body>'))
+        self.assertIn('<p>changed</p>', self._build().read_text())
+
+    def test_source_module_change_rebuilds(self):
+        import generate_site
+        self.assertIn('firmware_version.py', [p.name for p in generate_site.SOURCE_FILES])
+        module = self.temp_dir / 'firmware_version.py'
+        module.write_text('# v1\n')
+        with patch('generate_site.SOURCE_FILES', [module]):
+            self._build()
+            module.write_text('# v2: different ordering\n')
+            with patch('generate_site.load_all_history', wraps=generate_site.load_all_history) as mock_load:
+                self._build()
+        mock_load.assert_called_once()
+
+    def test_deleted_output_is_rebuilt(self):
+        index = self._build()
+        index.unlink()
+        self.assertTrue(self._build().exists())
+
+    def test_non_incremental_always_renders(self):
+        generate(self.history_dir, self.output_dir, self.template_dir)
+        self.assertFalse((self.output_dir / MANIFEST_NAME).exists())
+        self.assertEqual(BuildManifest(self.output_dir).entries, {})
+
+
+class TestSiteLayout(unittest.TestCase):
+    """Test suite for the summary index, device pages and history shards."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.history_dir = self.temp_dir / 'history'
+        self.output_dir = self.temp_dir / 'page'
+        self.history_dir.mkdir()
+        entries = [
+            {"version": "NEW", "arb": 0, "major": 3, "minor": 0,
+             "first_seen": "2026-02-01", "last_checked": "2026-02-01", "status": "current"},
+            {"version": "OLD", "arb": 0, "major": 3, "minor": 0,
+             "first_seen": "2026-01-01", "last_checked": "2026-01-01", "status": "archived"},
+        ]
+        data = {"history": entries, "device": "OnePlus 15", "device_id": "15", "region": "EU", "model": "CPH2747"}
+        (self.history_dir / '15_EU.json').write_text(json.dumps(data, indent=2))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _build(self):
+        generate(self.history_dir, self.output_dir, TEMPLATE_DIR, incremental=True)
+
+    def test_index_links_shards_instead_of_inlining_history(self):
+        self._build()
+        index = (self.output_dir / 'index.html').read_text()
+        self.assertIn('NEW', index)
+        self.assertNotIn('OLD', index)
+        self.assertIn('history/15_EU.json', index)
+        self.assertIn('devices/15.html', index)
+        # history.js builds the table once the shard is loaded
+        self.assertNotIn('history-row', index)
+        self.assertNotIn('history-table', index)
+
+        shard = json.loads((self.output_dir / 'history' / '15_EU.json').read_text())
+        self.assertEqual(shard['region'], 'EU')
+        self.assertEqual([e['version'] for e in shard['history']], ['OLD'])
+
+    def test_device_page_has_full_history(self):
+        self._build()
+        page = (self.output_dir / 'devices' / '15.html').read_text()
+        self.assertIn('NEW', page)
+        self.assertIn('OLD', page)
+
+    def test_stale_outputs_are_pruned(self):
+        self._build()
+        stale_page = self.output_dir / 'devices' / 'gone.html'
+        stale_shard = self.output_dir / 'history' / 'gone_EU.json'
+        stale_page.write_text('old')
+        stale_shard.write_text('{}')
+        (self.history_dir / '15_EU.json').unlink()
+
+        self._build()
+        self.assertFalse(stale_page.exists())
+        self.assertFalse(stale_shard.exists())
+        self.assertFalse((self.output_dir / 'history' / '15_EU.json').exists())
+        self.assertNotIn('history/15_EU.json', BuildManifest(self.output_dir).entries)
+
+
+if __name__ == '__main__':
+    unittest.main()
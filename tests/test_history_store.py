@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for history_store.py
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from history_store import HistoryStore, dump_history
+from update_history import update_history_entry, load_history, save_history
+
+REPO_HISTORY = Path(__file__).parent.parent / 'data' / 'history'
+
+
+def _variant(versions):
+    return {
+        "history": [
+            {"version": v, "arb": 0, "major": 3, "minor": 0, "first_seen": "2026-01-01",
+             "last_checked": "2026-01-02", "status": "current" if i == 0 else "archived"}
+            for i, v in enumerate(versions)
+        ],
+        "device": "OnePlus 15",
+        "device_id": "15",
+        "region": "EU",
+        "model": "CPH2747",
+    }
+
+
+class TestHistoryStore(unittest.TestCase):
+    """Test suite for the SQLite history store."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.store = HistoryStore(self.temp_dir / 'history.db')
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_repository_history_round_trips_byte_for_byte(self):
+        count = self.store.import_json_dir(REPO_HISTORY)
+        self.assertEqual(count, len(list(REPO_HISTORY.glob('*.json'))))
+
+        out_dir = self.temp_dir / 'export'
+        self.assertEqual(self.store.export_json_dir(out_dir), count)
+        for original in REPO_HISTORY.glob('*.json'):
+            self.assertEqual((out_dir / original.name).read_bytes(), original.read_bytes(), original.name)
+
+        # A second export leaves unchanged files alone
+        self.assertEqual(self.store.export_json_dir(out_dir), 0)
+
+    def test_put_variant_replaces_observations(self):
+        self.store.put_variant('15_EU', _variant(['V1']))
+        data = _variant(['V1'])
+        update_history_entry(data, 'V2', 1, 3, 0)
+        self.store.put_variant('15_EU', data)
+
+        stored = self.store.get_variant('15_EU')
+        self.assertEqual(dump_history(stored), dump_history(data))
+        self.assertEqual([e['version'] for e in stored['history']], ['V2', 'V1'])
+
+    def test_key_fallback_when_document_lacks_ids(self):
+        self.store.put_variant('Find X8_EU', {"history": [{"version": "V1", "arb": 0}]})
+        row = self.store.conn.execute("SELECT device_id, region, version FROM observations").fetchone()
+        self.assertEqual(row, ('Find X8', 'EU', 'V1'))
+
+    def test_update_reads_json_not_stale_store(self):
+        import update_history
+        # The store was synced before V2 landed in the committed JSON
+        self.store.put_variant('15_EU', _variant(['V1']))
+        self.store.close()
+        history_file = self.temp_dir / 'data' / 'history' / '15_EU.json'
+        save_history(history_file, _variant(['V2', 'V1']))
+
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        try:
+            argv = ['update_history.py', '15', 'EU', 'V3', '2', '3', '0', '--db', str(self.temp_dir / 'history.db')]
+            with patch('sys.argv', argv), patch('builtins.print'):
+                update_history.main()
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual([e['version'] for e in load_history(history_file)['history']], ['V3', 'V2', 'V1'])
+        self.store = HistoryStore(self.temp_dir / 'history.db')
+        self.assertEqual([e['version'] for e in self.store.get_variant('15_EU')['history']], ['V3', 'V2', 'V1'])
+
+    def test_generate_site_reads_store(self):
+        from generate_site import generate
+        self.store.put_variant('15_EU', _variant(['CPH2747_16.0.3.503(EX01)']))
+        template_dir = Path(__file__).parent.parent / 'templates'
+
+        generate(self.temp_dir / 'missing', self.temp_dir / 'site', template_dir, self.store.path)
+
+        self.assertIn('CPH2747_16.0.3.503(EX01)', (self.temp_dir / 'site' / 'index.html').read_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
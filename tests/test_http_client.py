@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for http_client.py
+"""
+
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from http_client import HttpClient, CircuitOpenError, parse_retry_after
+
+
+def _response(status=200, text='ok', headers=None):
+    response = Mock()
+    response.status_code = status
+    response.text = text
+    response.headers = headers or {}
+    if status >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f'{status}')
+    return response
+
+
+@patch('http_client.time.sleep')
+@patch('http_client.requests.Session.get')
+class TestHttpClient(unittest.TestCase):
+    """Test suite for retries, backoff and the circuit breaker."""
+
+    def test_retries_then_succeeds(self, mock_get, mock_sleep):
+        mock_get.side_effect = [requests.ConnectionError('reset'), _response(503), _response(text='done')]
+        client = HttpClient(retries=3, backoff_base=1.0)
+
+        self.assertEqual(client.get('https://api.example.com/x').text, 'done')
+        self.assertEqual(mock_get.call_count, 3)
+        # Exponential backoff with jitter: attempt 0 in [0.5, 1], attempt 1 in [1, 2]
+        first, second = (c[0][0] for c in mock_sleep.call_args_list)
+        self.assertTrue(0.5 <= first <= 1.0)
+        self.assertTrue(1.0 <= second <= 2.0)
+
+    def test_honors_retry_after(self, mock_get, mock_sleep):
+        mock_get.side_effect = [_response(429, headers={'Retry-After': '7'}), _response()]
+
+        HttpClient(backoff_max=30).get('https://api.example.com/x')
+
+        mock_sleep.assert_called_once_with(7.0)
+
+    def test_client_error_not_retried(self, mock_get, mock_sleep):
+        mock_get.return_value = _response(404)
+        client = HttpClient()
+
+        with self.assertRaises(requests.HTTPError):
+            client.get('https://api.example.com/missing')
+        self.assertEqual(mock_get.call_count, 1)
+        mock_sleep.assert_not_called()
+        self.assertFalse(client.circuit_for('https://api.example.com/').is_open())
+
+    def test_circuit_opens_and_fails_fast(self, mock_get, mock_sleep):
+        mock_get.side_effect = requests.ConnectionError('down')
+        client = HttpClient(retries=2, failure_threshold=2)
+
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                client.get('https://api.example.com/a')
+        calls = mock_get.call_count
+
+        with self.assertRaises(CircuitOpenError):
+            client.get('https://api.example.com/b')
+        self.assertEqual(mock_get.call_count, calls)
+
+        # Other hosts are unaffected
+        mock_get.side_effect = None
+        mock_get.return_value = _response()
+        client.get('https://other.example.com/')
+
+    def test_sessions_pooled_per_host(self, mock_get, mock_sleep):
+        client = HttpClient()
+        self.assertIs(client.session_for('https://a.com/x'), client.session_for('https://a.com/y'))
+        self.assertIsNot(client.session_for('https://a.com/x'), client.session_for('https://b.com/x'))
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    def test_seconds_and_dates(self):
+        self.assertEqual(parse_retry_after('12'), 12.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for job_queue.py
+"""
+
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from job_queue import JobQueue, drain, job_entries
+
+JOBS = [{"device": "15", "variant": "EU", "device_short": "15", "version": f"V{i}"} for i in range(1, 4)]
+
+
+class TestJobQueue(unittest.TestCase):
+    """Test suite for job states, leases and retries."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.path = self.temp_dir / 'jobs.db'
+        self.queue = JobQueue(self.path, retry_delay=0)
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_enqueue_is_idempotent(self):
+        self.assertEqual(self.queue.enqueue(JOBS), 3)
+        self.assertEqual(self.queue.enqueue(JOBS + [dict(JOBS[0], variant="GLO")]), 1)
+        self.assertEqual(self.queue.counts()['pending'], 4)
+
+    def test_lease_complete_and_record(self):
+        self.queue.enqueue(JOBS[:1])
+        job = self.queue.lease("a")
+        self.assertEqual((job['version'], job['attempts']), ("V1", 1))
+        self.assertIsNone(self.queue.lease("b"))
+
+        self.assertTrue(self.queue.complete(job['id'], "a", {"arb_index": "1"}))
+        self.assertEqual(self.queue.unrecorded_results(), [{"arb_index": "1", "id": job['id']}])
+        self.queue.mark_recorded([job['id']])
+        self.assertEqual(self.queue.unrecorded_results(), [])
+
+        # A finished job is never handed out again, even if re-enqueued
+        self.queue.enqueue(JOBS[:1])
+        self.assertIsNone(self.queue.claim(JOBS[0], "a"))
+
+    def test_failures_retry_until_attempts_used_up(self):
+        self.queue.enqueue(JOBS[:1])
+        for attempt in range(1, 4):
+            job = self.queue.lease("a")
+            self.assertEqual(job['attempts'], attempt)
+            self.queue.fail(job['id'], "a", "boom")
+        self.assertIsNone(self.queue.lease("a"))
+        self.assertEqual(self.queue.counts()['failed'], 1)
+        self.assertEqual(self.queue.failures()[0]['last_error'], "boom")
+
+        self.assertEqual(self.queue.retry_failed(), 1)
+        self.assertEqual(self.queue.lease("a")['attempts'], 1)
+
+    def test_retry_waits_for_delay(self):
+        queue = JobQueue(self.temp_dir / 'delayed.db', retry_delay=3600)
+        queue.enqueue(JOBS[:1])
+        queue.fail(queue.lease("a")['id'], "a", "rate limited")
+        self.assertIsNone(queue.lease("a"))
+        self.assertEqual(queue.counts()['pending'], 1)
+        queue.close()
+
+    def test_expired_lease_is_taken_over(self):
+        self.queue.enqueue(JOBS[:1])
+        stale = self.queue.lease("dead-worker", lease_seconds=0.01)
+        time.sleep(0.02)
+        job = self.queue.lease("b")
+        self.assertEqual((job['id'], job['attempts']), (stale['id'], 2))
+        # The dead worker's late completion is ignored
+        self.assertFalse(self.queue.complete(stale['id'], "dead-worker", {}))
+        self.assertTrue(self.queue.complete(job['id'], "b", {"arb_index": "0"}))
+
+    def test_state_survives_reopen(self):
+        self.queue.enqueue(JOBS)
+        self.queue.complete(self.queue.lease("a")['id'], "a", {"arb_index": "1"})
+        self.queue.close()
+        self.queue = JobQueue(self.path)
+        self.assertEqual(self.queue.counts(), {'pending': 2, 'leased': 0, 'done': 1, 'failed': 0})
+
+    def test_drain_runs_each_job_once_across_workers(self):
+        self.queue.enqueue(JOBS + [dict(JOBS[0], version="BAD")])
+        seen, lock = [], threading.Lock()
+
+        def handler(job):
+            with lock:
+                seen.append(job['version'])
+            if job['version'] == "BAD":
+                raise RuntimeError("extraction failed")
+            return {"arb_index": "0"}
+
+        totals = drain(self.queue, handler, workers=3)
+        self.assertEqual(sorted(v for v in seen if v != "BAD"), ["V1", "V2", "V3"])
+        # retry_delay=0: the failing job is retried within the same drain until attempts are used up
+        self.assertEqual(seen.count("BAD"), 3)
+        self.assertEqual(totals, {'done': 3, 'failed': 3})
+        self.assertEqual(self.queue.counts(), {'pending': 0, 'leased': 0, 'done': 3, 'failed': 1})
+
+    def test_fanout_targets_become_jobs(self):
+        entries = job_entries([dict(JOBS[0], fanout=[{"device_short": "15", "variant": "GLO", "version": "V1b"}])])
+        self.assertEqual([(e['variant'], e['version']) for e in entries], [("EU", "V1"), ("GLO", "V1b")])
+        self.assertNotIn('fanout', entries[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Tests for payload.py and remote (HTTP Range) extraction.
+Builds small synthetic OTA zips with a hand-encoded DeltaArchiveManifest.
+"""
+
+import io
+import hashlib
+import lzma
+import bz2
+import re
+import struct
+import sys
+import tempfile
+import shutil
+import unittest
+import zipfile
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from payload import (
+    read_manifest,
+    find_partition,
+    locate_payload,
+    extract_partition,
+    extract_from_zip,
+    scan_zip_stream,
+    zstandard,
+    OP_REPLACE,
+    OP_REPLACE_BZ,
+    OP_REPLACE_XZ,
+    OP_REPLACE_ZSTD,
+    OP_ZERO,
+)
+
+BLOCK_SIZE = 4096
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field_varint(field, value):
+    return _varint(field << 3) + _varint(value)
+
+
+def _field_bytes(field, value):
+    return _varint((field << 3) | 2) + _varint(len(value)) + value
+
+
+def build_payload(partitions):
+    """
+    Build a payload.bin. partitions: list of (name, [(op_type, raw_bytes, start_block)]).
+    Returns (payload_bytes, {name: expected_image}).
+    """
+    blobs = bytearray()
+    manifest = _field_varint(3, BLOCK_SIZE)
+    expected = {}
+    for name, ops in partitions:
+        image = bytearray()
+        part = _field_bytes(1, name.encode())
+        for op_type, raw, start_block in ops:
+            if op_type == OP_REPLACE_XZ:
+                blob = lzma.compress(raw)
+            elif op_type == OP_REPLACE_BZ:
+                blob = bz2.compress(raw)
+            elif op_type == OP_REPLACE_ZSTD:
+                blob = zstandard.ZstdCompressor().compress(raw)
+            elif op_type == OP_ZERO:
+                blob = b''
+            else:
+                blob = raw
+            num_blocks = (len(raw) + BLOCK_SIZE - 1) // BLOCK_SIZE
+            extent = _field_varint(1, start_block) + _field_varint(2, num_blocks)
+            op = (_field_varint(1, op_type) + _field_varint(2, len(blobs)) +
+                  _field_varint(3, len(blob)) + _field_bytes(6, extent))
+            if blob:
+                op += _field_bytes(8, hashlib.sha256(blob).digest())
+            blobs += blob
+            part += _field_bytes(8, op)
+            end = start_block * BLOCK_SIZE + len(raw)
+            if len(image) < end:
+                image.extend(b'\x00' * (end - len(image)))
+            image[start_block * BLOCK_SIZE:end] = raw
+        info = _field_varint(1, len(image)) + _field_bytes(2, hashlib.sha256(image).digest())
+        part += _field_bytes(7, info)
+        manifest += _field_bytes(13, part)
+        expected[name] = bytes(image)
+
+    header = b'CrAU' + struct.pack('>QQI', 2, len(manifest), 0)
+    return header + manifest + bytes(blobs), expected
+
+
+def build_ota_zip(payload_bytes):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as z:
+        z.writestr('META-INF/com/android/metadata', 'ota-type=AB\npost-build=Test/1.0\n')
+        z.writestr('payload_properties.txt', 'FILE_SIZE=123\n')
+        z.writestr(zipfile.ZipInfo('payload.bin'), payload_bytes, compress_type=zipfile.ZIP_STORED)
+    return buf.getvalue()
+
+
+class RangeServer:
+    """Fake requests.Session serving a bytes object with Range support."""
+
+    def __init__(self, data):
+        self.data = data
+        self.ranges = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        match = re.match(r'bytes=(\d*)-(\d+)', headers['Range'])
+        if match.group(1):
+            start, end = int(match.group(1)), min(int(match.group(2)), len(self.data) - 1)
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(0, len(self.data) - int(match.group(2))), len(self.data) - 1
+        self.ranges.append((start, end))
+        response = Mock()
+        response.status_code = 206
+        response.headers = {'Content-Range': f'bytes {start}-{end}/{len(self.data)}'}
+        response.content = self.data[start:end + 1]
+        response.raise_for_status = Mock()
+        return response
+
+
+class TestPayloadReader(unittest.TestCase):
+    """Tests for header/manifest parsing and partition extraction."""
+
+    def setUp(self):
+        self.xbl = bytes(range(256)) * 40
+        self.payload, self.expected = build_payload([
+            ('boot', [(OP_REPLACE, b'B' * 5000, 0)]),
+            ('xbl_config', [(OP_REPLACE_XZ, self.xbl[:8192], 0),
+                            (OP_REPLACE_BZ, self.xbl[8192:], 2)]),
+        ])
+
+    def test_read_manifest(self):
+        header, manifest = read_manifest(io.BytesIO(self.payload))
+        self.assertEqual(header['version'], 2)
+        self.assertEqual(manifest['block_size'], BLOCK_SIZE)
+        self.assertEqual([p['name'] for p in manifest['partitions']], ['boot', 'xbl_config'])
+        self.assertEqual(len(find_partition(manifest, 'xbl_config')['operations']), 2)
+        self.assertIsNone(find_partition(manifest, 'missing'))
+
+    def test_extract_partition(self):
+        image = extract_partition(io.BytesIO(self.payload), 'xbl_config')
+        self.assertEqual(image, self.expected['xbl_config'])
+        self.assertEqual(image, self.xbl)
+
+    def test_extract_missing_partition(self):
+        with self.assertRaises(ValueError):
+            extract_partition(io.BytesIO(self.payload), 'vendor_boot')
+
+    def test_bad_magic(self):
+        with self.assertRaises(ValueError):
+            read_manifest(io.BytesIO(b'PK\x03\x04' + b'\x00' * 40))
+
+    def test_extract_zero_operation(self):
+        payload, expected = build_payload([
+            ('xbl_config', [(OP_REPLACE, b'X' * BLOCK_SIZE, 0), (OP_ZERO, bytes(BLOCK_SIZE * 2), 1)]),
+        ])
+        image = extract_partition(io.BytesIO(payload), 'xbl_config')
+        self.assertEqual(image, expected['xbl_config'])
+        self.assertEqual(len(image), BLOCK_SIZE * 3)
+
+    @unittest.skipIf(zstandard is None, "zstandard not installed")
+    def test_extract_zstd_operation(self):
+        payload, expected = build_payload([('xbl_config', [(OP_REPLACE_ZSTD, self.xbl, 0)])])
+        self.assertEqual(extract_partition(io.BytesIO(payload), 'xbl_config'), expected['xbl_config'])
+
+    def test_data_hash_mismatch(self):
+        corrupted = bytearray(self.payload)
+        corrupted[-1] ^= 0xFF
+        with self.assertRaises(ValueError):
+            extract_partition(io.BytesIO(bytes(corrupted)), 'xbl_config')
+        # Verification can be disabled explicitly
+        image = extract_partition(io.BytesIO(bytes(corrupted)), 'boot', verify=False)
+        self.assertEqual(image, self.expected['boot'])
+
+    def test_parallel_extraction_matches_serial(self):
+        ops = []
+        for i in range(24):
+            chunk = bytes([i]) * BLOCK_SIZE
+            op_type = (OP_REPLACE_XZ, OP_REPLACE_BZ, OP_REPLACE)[i % 3]
+            ops.append((op_type, chunk, i))
+        payload, expected = build_payload([('system', ops)])
+
+        serial = extract_partition(io.BytesIO(payload), 'system', workers=1)
+        parallel = extract_partition(io.BytesIO(payload), 'system', workers=4)
+        self.assertEqual(serial, expected['system'])
+        self.assertEqual(parallel, expected['system'])
+
+    def test_parallel_data_hash_mismatch(self):
+        corrupted = bytearray(self.payload)
+        corrupted[-1] ^= 0xFF
+        with self.assertRaises(ValueError):
+            extract_partition(io.BytesIO(bytes(corrupted)), 'xbl_config', workers=4)
+
+    def test_extract_to_path(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            out = Path(temp_dir) / 'out' / 'xbl_config.img'
+            result = extract_partition(io.BytesIO(self.payload), 'xbl_config', out_path=out)
+            self.assertEqual(result, out)
+            self.assertEqual(out.read_bytes(), self.xbl)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_extract_from_zip(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            zip_path = Path(temp_dir) / 'firmware.zip'
+            zip_path.write_bytes(build_ota_zip(self.payload))
+            results = extract_from_zip(zip_path, ['boot', 'xbl_config'], Path(temp_dir) / 'extracted')
+            self.assertEqual(results['boot'].read_bytes(), self.expected['boot'])
+            self.assertEqual(results['xbl_config'].name, 'xbl_config.img')
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_locate_payload_in_zip(self):
+        ota = io.BytesIO(build_ota_zip(self.payload))
+        offset = locate_payload(ota)
+        ota.seek(offset)
+        self.assertEqual(ota.read(4), b'CrAU')
+        self.assertEqual(extract_partition(ota, 'boot', offset), self.expected['boot'])
+
+
+class TestLocalExtraction(unittest.TestCase):
+    """Tests that analyze_firmware extracts in-process before spawning external tools."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.xbl = b'\x7fELF' + b'\x22' * 5000
+        payload, _ = build_payload([('xbl_config', [(OP_REPLACE_XZ, self.xbl, 0)])])
+        self.zip_path = Path(self.temp_dir) / 'firmware.zip'
+        self.zip_path.write_bytes(build_ota_zip(payload))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @patch('subprocess.run')
+    def test_analyze_firmware_in_process(self, mock_run):
+        from analyze_firmware import analyze_firmware
+
+        mock_run.return_value = Mock(returncode=0, stdout="ARB (Anti-Rollback): 0\nMajor Version: 3\nMinor Version: 0",
+                                     stderr="")
+        final_dir = Path(self.temp_dir) / 'firmware_data'
+
+        result = analyze_firmware(str(self.zip_path), self.temp_dir, Path(self.temp_dir) / 'extracted', final_dir)
+
+        self.assertEqual(result['arb_index'], '0')
+        self.assertEqual((final_dir / 'xbl_config.img').read_bytes(), self.xbl)
+        # Only arbextract is spawned; otaripper/payload-dumper-go are never needed
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertIn('arbextract', mock_run.call_args[0][0][0])
+        self.assertFalse((Path(self.temp_dir) / 'extracted').exists())
+
+
+class TestRemoteExtraction(unittest.TestCase):
+    """Tests for analyze_firmware.extract_remote over a fake Range server."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.xbl = b'\x7fELF' + b'\x11' * 9000
+        payload, _ = build_payload([
+            ('system', [(OP_REPLACE, b'S' * 200000, 0)]),
+            ('xbl_config', [(OP_REPLACE_XZ, self.xbl, 0)]),
+        ])
+        self.ota = build_ota_zip(payload)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @patch('remote_file.TAIL_BYTES', 4096)
+    @patch('remote_file.BLOCK_SIZE', 4096)
+    @patch('remote_file._session')
+    def test_extract_remote_reads_only_needed_ranges(self, mock_session):
+        from analyze_firmware import extract_remote
+
+        server = RangeServer(self.ota)
+        mock_session.return_value = server
+        final_img = Path(self.temp_dir) / 'firmware_data' / 'xbl_config.img'
+
+        metadata = extract_remote('https://example.com/ota.zip', final_img)
+
+        self.assertEqual(final_img.read_bytes(), self.xbl)
+        self.assertEqual(metadata['post-build'], 'Test/1.0')
+        fetched = sum(end - start + 1 for start, end in server.ranges)
+        self.assertLess(fetched, len(self.ota) // 2)
+
+    @patch('remote_file._session')
+    def test_extract_remote_failure_returns_none(self, mock_session):
+        from analyze_firmware import extract_remote
+
+        mock_session.return_value = RangeServer(b'not a zip file at all' * 10)
+        final_img = Path(self.temp_dir) / 'xbl_config.img'
+
+        self.assertIsNone(extract_remote('https://example.com/ota.zip', final_img))
+        self.assertFalse(final_img.exists())
+
+
+class StreamServer:
+    """Fake requests.Session answering every GET with the whole body (no Range support), in chunks."""
+
+    def __init__(self, data):
+        self.data = data
+        self.chunks_served = 0
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        response = Mock()
+        response.status_code = 200
+        response.headers = {'Content-Length': str(len(self.data))}
+        response.raise_for_status = Mock()
+
+        def iter_content(chunk_size):
+            for pos in range(0, len(self.data), chunk_size):
+                self.chunks_served += 1
+                yield self.data[pos:pos + chunk_size]
+        response.iter_content = iter_content
+        return response
+
+
+class TestStreamingExtraction(unittest.TestCase):
+    """Tests for analyze_firmware.extract_streaming over a server without Range support."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.xbl = b'\x7fELF' + b'\x33' * 9000
+        # xbl_config sits before a large partition, as the stream should stop well before the end
+        payload, _ = build_payload([
+            ('xbl_config', [(OP_REPLACE_XZ, self.xbl, 0)]),
+            ('system', [(OP_REPLACE, bytes(range(256)) * 4000, 0)]),
+        ])
+        self.ota = build_ota_zip(payload)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_scan_zip_stream_finds_payload_and_metadata(self):
+        ota = io.BytesIO(self.ota)
+        offset, entries = scan_zip_stream(ota, keep=('META-INF/com/android/metadata',))
+        self.assertEqual(offset, locate_payload(io.BytesIO(self.ota)))
+        self.assertIn(b'post-build=Test/1.0', entries['META-INF/com/android/metadata'])
+
+    @patch('remote_file.STREAM_CHUNK_SIZE', 16384)
+    @patch('remote_file._session')
+    def test_stream_stops_once_partition_is_complete(self, mock_session):
+        from analyze_firmware import extract_streaming
+
+        server = StreamServer(self.ota)
+        mock_session.return_value = server
+        final_img = Path(self.temp_dir) / 'firmware_data' / 'xbl_config.img'
+
+        metadata = extract_streaming('https://example.com/ota.zip', final_img)
+
+        self.assertEqual(final_img.read_bytes(), self.xbl)
+        self.assertEqual(metadata['post-build'], 'Test/1.0')
+        self.assertLess(server.chunks_served * 16384, len(self.ota) // 4)
+
+    @patch('remote_file._session')
+    def test_analyze_falls_back_to_streaming_without_range_support(self, mock_session):
+        from analyze_firmware import analyze_firmware
+
+        mock_session.return_value = StreamServer(self.ota)
+        final_dir = Path(self.temp_dir) / 'firmware_data'
+        with patch('analyze_firmware.read_arb_info', return_value={'arb_index': '0', 'major': '3', 'minor': '0'}):
+            result = analyze_firmware(None, self.temp_dir, Path(self.temp_dir) / 'extracted', final_dir,
+                                      url='https://example.com/ota.zip')
+
+        self.assertEqual(result['arb_index'], '0')
+        self.assertEqual((final_dir / 'xbl_config.img').read_bytes(), self.xbl)
+
+
+if __name__ == '__main__':
+    unittest.main()
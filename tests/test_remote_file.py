@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Unit tests for remote_file.RemoteFile (block cache, read-ahead, range coalescing, URL refresh).
+"""
+
+import io
+import sys
+import unittest
+import zipfile
+from pathlib import Path
+from unittest.mock import Mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from remote_file import RemoteFile, URLExpiredError, _coalesce
+from tests.test_payload import RangeServer, build_payload, build_ota_zip
+from payload import OP_REPLACE
+
+
+class ExpiringServer(RangeServer):
+    """RangeServer that answers 403 for URLs in `expired`."""
+
+    def __init__(self, data, expired):
+        super().__init__(data)
+        self.expired = set(expired)
+        self.urls = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.urls.append(url)
+        if url in self.expired:
+            response = Mock()
+            response.status_code = 403
+            response.raise_for_status = Mock(side_effect=OSError("403 Forbidden"))
+            return response
+        return super().get(url, headers, timeout, stream)
+
+
+class TestRemoteFile(unittest.TestCase):
+    """Tests for RemoteFile reads over a fake Range server."""
+
+    def setUp(self):
+        self.data = bytes(range(256)) * 1024  # 256 KiB
+
+    def _open(self, server, **kwargs):
+        kwargs.setdefault('block_size', 1024)
+        return RemoteFile('https://example.com/ota.zip', session=server, **kwargs)
+
+    def test_read_seek_and_size(self):
+        remote = self._open(RangeServer(self.data))
+        self.assertEqual(remote.size, len(self.data))
+        remote.seek(1000)
+        self.assertEqual(remote.read(100), self.data[1000:1100])
+        remote.seek(-10, io.SEEK_END)
+        self.assertEqual(remote.read(), self.data[-10:])
+        self.assertEqual(remote.read(5), b'')
+
+    def test_tail_is_cached_by_size_probe(self):
+        server = RangeServer(self.data)
+        remote = self._open(server)
+        remote.seek(-22, io.SEEK_END)
+        self.assertEqual(remote.read(22), self.data[-22:])
+        self.assertEqual(remote.requests_made, 1)
+
+    def test_zip_metadata_in_two_requests(self):
+        payload, _ = build_payload([('xbl_config', [(OP_REPLACE, b'X' * 50000, 0)])])
+        ota = build_ota_zip(payload)
+        server = RangeServer(ota)
+        with RemoteFile('https://example.com/ota.zip', session=server) as remote:
+            with zipfile.ZipFile(remote) as z:
+                metadata = z.read('META-INF/com/android/metadata')
+        self.assertIn(b'post-build=Test/1.0', metadata)
+        self.assertLessEqual(len(server.ranges), 2)
+
+    def test_prefetch_coalesces_nearby_ranges(self):
+        server = RangeServer(self.data)
+        remote = self._open(server, coalesce_gap=2)
+        server.ranges.clear()
+        remote.prefetch([(0, 100), (2100, 100), (9000, 100)])
+        # Blocks 0 and 2 share a request; block 8 is too far away
+        self.assertEqual(server.ranges, [(0, 3071), (8192, 9215)])
+
+        remote.seek(2100)
+        self.assertEqual(remote.read(100), self.data[2100:2200])
+        self.assertEqual(len(server.ranges), 2)
+
+    def test_sequential_reads_pull_blocks_ahead(self):
+        server = RangeServer(self.data)
+        remote = self._open(server, read_ahead=2)
+        server.ranges.clear()
+        remote.read(1024)
+        remote.read(1024)
+        self.assertEqual(server.ranges, [(0, 1023), (1024, 4095)])
+        # Served from the read-ahead, which is topped up to stay two blocks ahead
+        self.assertEqual(remote.read(1024), self.data[2048:3072])
+        self.assertEqual(server.ranges[-1], (4096, 5119))
+
+    def test_lru_evicts_old_blocks(self):
+        server = RangeServer(self.data)
+        remote = self._open(server, cache_bytes=2048, read_ahead=0)
+        for offset in (0, 4096, 8192):
+            remote.seek(offset)
+            remote.read(10)
+        server.ranges.clear()
+        remote.seek(0)
+        self.assertEqual(remote.read(10), self.data[:10])
+        self.assertEqual(server.ranges, [(0, 1023)])
+
+    def test_read_larger_than_cache(self):
+        remote = self._open(RangeServer(self.data), cache_bytes=4096)
+        self.assertEqual(remote.read(), self.data)
+        remote.seek(0)
+        self.assertEqual(remote.read(), self.data)
+
+    def test_expired_url_is_refreshed(self):
+        server = ExpiringServer(self.data, expired={'https://example.com/ota.zip'})
+        refresh = Mock(return_value='https://example.com/ota.zip?sig=new')
+        remote = self._open(server, refresh=refresh)
+        self.assertEqual(remote.read(10), self.data[:10])
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(remote.url, 'https://example.com/ota.zip?sig=new')
+
+    def test_expired_url_without_replacement(self):
+        server = ExpiringServer(self.data, expired={'https://example.com/ota.zip'})
+        with self.assertRaises(URLExpiredError):
+            self._open(server, refresh=Mock(return_value=None))
+
+    def test_probe_without_range_support_does_not_read_body(self):
+        response = Mock(status_code=200, headers={})
+        type(response).content = property(lambda _: self.fail("body read before the status check"))
+        server = Mock()
+        server.get.return_value = response
+        with self.assertRaises(OSError):
+            self._open(server)
+        self.assertTrue(server.get.call_args.kwargs['stream'])
+        response.close.assert_called()
+
+    def test_coalesce(self):
+        self.assertEqual(_coalesce([0, 1, 3, 9, 10], 1), [(0, 3), (9, 10)])
+        self.assertEqual(_coalesce([], 4), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for run_pipeline.py
+"""
+
+import asyncio
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import run_pipeline
+from run_pipeline import Pipeline, DiskBudget, record_results
+from variant_health import VariantHealth
+from job_queue import JobQueue
+
+ITEM = {"device": "15", "variant": "EU", "device_short": "15", "device_name": "OnePlus 15"}
+
+
+class TestDiskBudget(unittest.TestCase):
+    """Test suite for download space reservations."""
+
+    def test_reservations_wait_for_space(self):
+        events = []
+
+        async def job(budget, name, size):
+            async with budget.reserve(size):
+                events.append(f"start {name}")
+                await asyncio.sleep(0.01)
+                events.append(f"end {name}")
+
+        async def scenario():
+            budget = DiskBudget(10)
+            await asyncio.gather(job(budget, 'a', 6), job(budget, 'b', 6), job(budget, 'c', 50))
+            return budget.used
+
+        self.assertEqual(asyncio.run(scenario()), 0)
+        # Never two jobs at once: every start is followed by its own end
+        self.assertEqual(events, ['start a', 'end a', 'start b', 'end b', 'start c', 'end c'])
+
+
+class TestPipeline(unittest.TestCase):
+    """Test suite for per-variant scheduling."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.history_dir = self.temp_dir / 'history'
+        self.history_dir.mkdir()
+        patcher = patch('run_pipeline.default_catalog')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pipeline = Pipeline(self.history_dir, self.temp_dir / 'work', cache_dir=self.temp_dir / 'cache',
+                                 executor=ThreadPoolExecutor(2))
+        self.addCleanup(self.pipeline.close)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write_history(self, version):
+        data = {"history": [{"version": version, "arb": 0, "major": 3, "minor": 0,
+                             "first_seen": "2026-01-01", "last_checked": "2026-01-01", "status": "current"}],
+                "device": "OnePlus 15", "device_id": "15", "region": "EU", "model": "CPH2747"}
+        (self.history_dir / '15_EU.json').write_text(json.dumps(data, indent=2))
+
+    @patch('run_pipeline.analyze_firmware')
+    @patch('run_pipeline.resolve_latest', return_value={'url': 'https://x/fw.zip', 'version': 'CPH2747_16.0.3.503(EX01)'})
+    def test_known_version_skipped(self, mock_resolve, mock_analyze):
+        self._write_history('CPH2747_16.0.3.503(EX01)')
+        self.assertEqual(asyncio.run(self.pipeline.run([ITEM])), [])
+        mock_analyze.assert_not_called()
+
+    @patch('run_pipeline.analyze_firmware', return_value={'arb_index': '1', 'major': '3', 'minor': '0'})
+    @patch('run_pipeline.resolve_latest', return_value={'url': 'https://x/fw.zip', 'version': 'CPH2747_16.0.3.503(EX01)'})
+    def test_new_version_analyzed_remotely_and_recorded(self, mock_resolve, mock_analyze):
+        self._write_history('CPH2747_16.0.2.401(EX01)')
+        results = asyncio.run(self.pipeline.run([ITEM]))
+
+        self.assertEqual(results, [{'arb_index': '1', 'major': '3', 'minor': '0', 'device_short': '15',
+                                    'variant': 'EU', 'version': 'CPH2747_16.0.3.503(EX01)'}])
+        self.assertEqual(mock_analyze.call_args.kwargs['url'], 'https://x/fw.zip')
+
+        self.assertEqual(record_results(results, self.history_dir), ['15_EU'])
+        history = json.loads((self.history_dir / '15_EU.json').read_text())['history']
+        self.assertEqual([(e['version'], e['status']) for e in history],
+                         [('CPH2747_16.0.3.503(EX01)', 'current'), ('CPH2747_16.0.2.401(EX01)', 'archived')])
+
+    @patch('run_pipeline.download')
+    @patch('run_pipeline.remote_size', return_value=1024)
+    @patch('run_pipeline.analyze_firmware', side_effect=[None, {'arb_index': '0', 'major': '3', 'minor': '0'}])
+    @patch('run_pipeline.resolve_latest', return_value={'url': 'https://x/fw.zip', 'version': 'V1'})
+    def test_falls_back_to_full_download(self, mock_resolve, mock_analyze, mock_size, mock_download):
+        results = asyncio.run(self.pipeline.run([ITEM]))
+        self.assertEqual(results[0]['arb_index'], '0')
+        mock_download.assert_called_once()
+        zip_path = mock_analyze.call_args_list[1].args[0]
+        self.assertTrue(zip_path.endswith('firmware.zip'))
+        self.assertFalse((self.temp_dir / 'work' / '15_EU').exists())
+
+    @patch('run_pipeline.analyze_firmware', side_effect=RuntimeError('boom'))
+    @patch('run_pipeline.resolve_latest', return_value={'url': 'https://x/fw.zip', 'version': 'V1'})
+    def test_variant_failure_does_not_stop_others(self, mock_resolve, mock_analyze):
+        other = dict(ITEM, device='13', device_short='13', variant='CN')
+        self.assertEqual(asyncio.run(self.pipeline.run([ITEM, other])), [])
+        self.assertEqual(mock_analyze.call_count, 2)
+
+    @patch('run_pipeline.analyze_firmware', return_value={'arb_index': '1', 'major': '3', 'minor': '0'})
+    @patch('run_pipeline.resolve_latest', return_value={'url': 'https://x/fw.zip', 'version': 'CPH2747_16.0.3.503(EX01)'})
+    def test_shared_package_analyzed_once(self, mock_resolve, mock_analyze):
+        # 15 GLO and 15 EU are both CPH2747
+        results = asyncio.run(self.pipeline.run([ITEM, dict(ITEM, variant='GLO')]))
+        self.assertEqual(mock_analyze.call_count, 1)
+        self.assertEqual([(r['variant'], r['arb_index']) for r in results], [('EU', '1'), ('GLO', '1')])
+
+    @patch('run_pipeline.analyze_firmware', return_value=None)
+    @patch('run_pipeline.resolve_latest', return_value={'url': 'https://x/page.html', 'version': 'V1'})
+    def test_outcomes_recorded_and_failing_variants_probed(self, mock_resolve, mock_analyze):
+        self.pipeline.health = VariantHealth(None)
+        self.assertEqual(asyncio.run(self.pipeline.run([ITEM])), [])
+        state = self.pipeline.health.entries['15_EU']
+        self.assertEqual((state['last_outcome'], state['failures']), ('non_zip_url', 1))
+
+        # Still no direct link: the probe fails without another analysis
+        self.assertEqual(asyncio.run(self.pipeline.run([ITEM])), [])
+        self.assertEqual(mock_analyze.call_count, 1)
+        self.assertEqual(self.pipeline.health.entries['15_EU']['failures'], 2)
+
+    @patch('run_pipeline.analyze_firmware', side_effect=[None, {'arb_index': '2', 'major': '3', 'minor': '0'}])
+    @patch('run_pipeline.resolve_latest', return_value={'url': 'https://x/page.html', 'version': 'V1'})
+    def test_queue_retries_failures_without_redoing_successes(self, mock_resolve, mock_analyze):
+        self.pipeline.queue = JobQueue(self.temp_dir / 'jobs.db', retry_delay=0)
+        self.addCleanup(self.pipeline.queue.close)
+        self.assertEqual(asyncio.run(self.pipeline.run([ITEM])), [])
+        self.assertEqual(self.pipeline.queue.counts()['pending'], 1)
+
+        self.assertEqual(asyncio.run(self.pipeline.run([ITEM]))[0]['arb_index'], '2')
+        # Done: a rerun before the result is recorded does not analyze again
+        self.assertEqual(asyncio.run(self.pipeline.run([ITEM])), [])
+        self.assertEqual(mock_analyze.call_count, 2)
+        self.assertEqual([r['arb_index'] for r in self.pipeline.queue.unrecorded_results()], ['2'])
+
+    @patch('run_pipeline.analyze_firmware', return_value={'arb_index': '0', 'major': '3', 'minor': '0'})
+    @patch('run_pipeline.get_signed_url_springer', return_value={'url': 'https://x/old.zip', 'version': 'V0'})
+    @patch('run_pipeline.resolve_latest', return_value={'url': 'https://x/fw.zip', 'version': 'V1'})
+    def test_drain_checks_queued_historical_versions(self, mock_resolve, mock_springer, mock_analyze):
+        queue = self.pipeline.queue = JobQueue(self.temp_dir / 'jobs.db')
+        self.addCleanup(queue.close)
+        queue.enqueue([dict(ITEM, version='V0')])
+
+        self.assertEqual(asyncio.run(self.pipeline.drain(workers=2)), {'done': 1, 'failed': 0})
+        self.assertEqual(mock_springer.call_args.args[2], 'V0')
+        [result] = queue.unrecorded_results()
+        self.assertEqual((result['version'], result['historical']), ('V0', True))
+
+
+if __name__ == '__main__':
+    unittest.main()
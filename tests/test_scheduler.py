@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for scheduler.py
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scheduler import (release_dates, cadence_days, poll_interval, is_due, mark_polled, due_entries,
+                       record_polls, load_schedule, save_schedule, ACTIVE_INTERVAL, LEGACY_INTERVAL)
+
+TODAY = date(2026, 10, 18)
+
+
+def _doc(*first_seen):
+    return {"history": [{"version": f"V{i}", "first_seen": d} for i, d in enumerate(first_seen)]}
+
+
+class TestPollInterval(unittest.TestCase):
+    """Test suite for cadence-driven intervals."""
+
+    def test_release_dates_distinct_and_sorted(self):
+        doc = _doc("2026-02-04", "2026-01-01", "2026-02-04", None)
+        self.assertEqual(release_dates(doc), [date(2026, 1, 1), date(2026, 2, 4)])
+
+    def test_cadence_is_median_gap(self):
+        dates = release_dates(_doc("2026-01-01", "2026-01-31", "2026-03-02", "2026-06-30"))
+        self.assertEqual(cadence_days(dates), 30)
+        self.assertIsNone(cadence_days(dates[:1]))
+
+    def test_tiers_by_age(self):
+        self.assertEqual(poll_interval(_doc("2026-10-01"), TODAY), ACTIVE_INTERVAL)
+        self.assertEqual(poll_interval(_doc("2026-06-01"), TODAY), 3)
+        self.assertEqual(poll_interval(_doc("2026-01-01"), TODAY), 7)
+        self.assertEqual(poll_interval(_doc("2023-01-01"), TODAY), LEGACY_INTERVAL)
+
+    def test_within_cadence_stays_active(self):
+        # Releases every ~100 days, last one 150 days ago: due again soon
+        doc = _doc("2025-12-01", "2026-03-10", "2026-05-21")
+        self.assertEqual(poll_interval(doc, TODAY), ACTIVE_INTERVAL)
+
+    def test_no_history_polls_every_run(self):
+        self.assertEqual(poll_interval({"history": []}, TODAY), ACTIVE_INTERVAL)
+
+
+class TestSchedule(unittest.TestCase):
+    """Test suite for next-due bookkeeping."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_due_and_mark(self):
+        schedule = {}
+        self.assertTrue(is_due(schedule, "15_EU", TODAY))
+        mark_polled(schedule, "15_EU", 7, TODAY)
+        self.assertEqual(schedule["15_EU"]["next_due"], "2026-10-25")
+        self.assertFalse(is_due(schedule, "15_EU", date(2026, 10, 24)))
+        self.assertTrue(is_due(schedule, "15_EU", date(2026, 10, 25)))
+
+        entries = [{"device": "15", "variant": "EU"}, {"device": "15", "variant": "GLO"}]
+        self.assertEqual(due_entries(entries, schedule, TODAY), [entries[1]])
+
+    def test_new_release_resets_to_active(self):
+        history_dir = self.temp_dir / 'history'
+        history_dir.mkdir()
+        (history_dir / '7_EU.json').write_text(json.dumps(_doc("2021-01-01")))
+        entries = [{"device": "7", "device_short": "7", "variant": "EU"},
+                   {"device": "7", "device_short": "7", "variant": "GLO"}]
+        (history_dir / '7_GLO.json').write_text(json.dumps(_doc("2021-01-01")))
+        schedule = {}
+        record_polls(entries, {"7_GLO"}, schedule, TODAY, history_dir)
+        self.assertEqual(schedule["7_EU"]["interval_days"], LEGACY_INTERVAL)
+        self.assertEqual(schedule["7_GLO"]["interval_days"], ACTIVE_INTERVAL)
+
+    def test_load_prefers_environment(self):
+        path = self.temp_dir / 'schedule.json'
+        save_schedule({"a": {"next_due": "2026-01-01"}}, path)
+        with patch.dict(os.environ, {"POLL_SCHEDULE": '{"b": {}}'}):
+            self.assertEqual(load_schedule(path), {"b": {}})
+        with patch.dict(os.environ, {"POLL_SCHEDULE": ""}):
+            self.assertEqual(load_schedule(path), {"a": {"next_due": "2026-01-01"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
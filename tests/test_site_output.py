@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for site_output.py (minification, pre-compression, fingerprinted assets).
+"""
+
+import gzip
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import site_output
+from site_output import minify_css, minify_html, minify_js, write_output, fingerprint_assets
+from generate_site import generate
+
+TEMPLATE_DIR = Path(__file__).parent.parent / 'templates'
+
+
+class TestMinify(unittest.TestCase):
+    """Test suite for the minifiers."""
+
+    def test_css(self):
+        css = "/* comment */\n.a  >  .b {\n    color: red;\n    margin: 0 auto;\n}\n@media (max-width: 600px) { .c { top: 1px; } }\n"
+        self.assertEqual(minify_css(css), ".a>.b{color:red;margin:0 auto}@media (max-width:600px){.c{top:1px}}")
+
+    def test_js_keeps_lines(self):
+        js = "    // comment\n    const a = 1;\n\n    if (a) {\n        f('//not a comment');\n    }\n"
+        self.assertEqual(minify_js(js), "const a = 1;\nif (a) {\nf('//not a comment');\n}")
+
+    def test_html(self):
+        page = "<html>\n    <!-- note -->\n    <style>\n        .a { color: red; }\n    </style>\n    <p>Hello   world</p>\n</html>\n"
+        self.assertEqual(minify_html(page), "<html>\n<style>.a{color:red}</style>\n<p>Hello   world</p>\n</html>\n")
+
+
+class TestWriteOutput(unittest.TestCase):
+    """Test suite for compressed siblings and fingerprints."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_writes_gzip_sibling(self):
+        path = self.temp_dir / 'page.html'
+        self.assertTrue(write_output(path, "<p>\n    hi\n</p>\n"))
+        self.assertEqual(path.read_text(), "<p>\nhi\n</p>\n")
+        self.assertEqual(gzip.decompress((self.temp_dir / 'page.html.gz').read_bytes()), path.read_bytes())
+        self.assertEqual(path.stat().st_mode & 0o777, 0o644)
+        self.assertFalse(write_output(path, "<p>\n    hi\n</p>\n"))
+
+    def test_brotli_sibling_when_available(self):
+        fake = type('FakeBrotli', (), {'compress': staticmethod(lambda data, quality: b'br:' + data)})
+        with patch.object(site_output, 'brotli', fake):
+            write_output(self.temp_dir / 'data.json', '{}')
+        self.assertEqual((self.temp_dir / 'data.json.br').read_bytes(), b'br:{}')
+
+    def test_stale_brotli_sibling_removed_without_brotli(self):
+        path = self.temp_dir / 'data.json'
+        fake = type('FakeBrotli', (), {'compress': staticmethod(lambda data, quality: b'br:' + data)})
+        with patch.object(site_output, 'brotli', fake):
+            write_output(path, '{}')
+        with patch.object(site_output, 'brotli', None):
+            self.assertTrue(write_output(path, '{}'))
+        self.assertFalse((self.temp_dir / 'data.json.br').exists())
+        self.assertTrue((self.temp_dir / 'data.json.gz').exists())
+
+    def test_fingerprint_follows_content(self):
+        static = self.temp_dir / 'static'
+        static.mkdir()
+        (static / 'site.css').write_text('.a { color: red; }')
+        first, content = fingerprint_assets(self.temp_dir)['site.css']
+        self.assertRegex(first, r'^assets/site\.[0-9a-f]{10}\.css$')
+        self.assertEqual(content, '.a{color:red}')
+
+        (static / 'site.css').write_text('.a { color: blue; }')
+        self.assertNotEqual(fingerprint_assets(self.temp_dir)['site.css'][0], first)
+
+
+class TestGeneratedOutput(unittest.TestCase):
+    """Test suite for the output stage inside generate_site."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.history_dir = self.temp_dir / 'history'
+        self.output_dir = self.temp_dir / 'page'
+        self.template_dir = self.temp_dir / 'templates'
+        shutil.copytree(TEMPLATE_DIR, self.template_dir)
+        self.history_dir.mkdir()
+        data = {"history": [{"version": "V1", "arb": 0, "major": 3, "minor": 0,
+                             "first_seen": "2026-01-01", "last_checked": "2026-01-01", "status": "current"}],
+                "device": "OnePlus 15", "device_id": "15", "region": "EU", "model": "CPH2747"}
+        (self.history_dir / '15_EU.json').write_text(json.dumps(data, indent=2))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _build(self):
+        generate(self.history_dir, self.output_dir, self.template_dir, incremental=True)
+
+    def test_pages_reference_fingerprinted_assets(self):
+        self._build()
+        css = [p.name for p in (self.output_dir / 'assets').glob('site.*.css')]
+        self.assertEqual(len(css), 1)
+        self.assertIn(f'href="assets/{css[0]}"', (self.output_dir / 'index.html').read_text())
+        self.assertIn(f'href="../assets/{css[0]}"', (self.output_dir / 'devices' / '15.html').read_text())
+        self.assertTrue((self.output_dir / 'index.html.gz').exists())
+        self.assertTrue((self.output_dir / 'assets' / (css[0] + '.gz')).exists())
+
+    def test_changed_asset_replaces_old_fingerprint(self):
+        self._build()
+        old = next((self.output_dir / 'assets').glob('site.*.css'))
+        stylesheet = self.template_dir / 'static' / 'site.css'
+        stylesheet.write_text(stylesheet.read_text() + '\n.extra { color: red; }\n')
+
+        self._build()
+        self.assertFalse(old.exists())
+        self.assertFalse(Path(str(old) + '.gz').exists())
+        self.assertEqual(len(list((self.output_dir / 'assets').glob('site.*.css'))), 1)
+
+    def test_rebuild_without_brotli_drops_br_files(self):
+        fake = type('FakeBrotli', (), {'compress': staticmethod(lambda data, quality: b'br:' + data)})
+        with patch.object(site_output, 'brotli', fake):
+            self._build()
+        self.assertTrue((self.output_dir / 'index.html.br').exists())
+
+        with patch.object(site_output, 'brotli', None):
+            self._build()
+        self.assertEqual(list(self.output_dir.rglob('*.br')), [])
+        self.assertTrue((self.output_dir / 'index.html.gz').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
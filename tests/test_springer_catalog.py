@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for springer_catalog.py
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from springer_catalog import SpringerCatalog, parse_catalog, default_catalog, CATALOG_CACHE_ENV
+from fetch_firmware import get_springer_versions, get_signed_url_springer
+
+DEVICES = {
+    "OP 15": {"GLO": ["CPH2747_16.0.3.503(EX01)", "CPH2747_16.0.3.501(EX01)"], "EU": ["CPH2747_16.0.3.503(EX01)"]},
+    "OP 13 (PJZ110)": {"CN": ["PJZ110_16.0.2.400(CN01)"]},
+}
+PAGE = f"<html><select id=\"device\" data-devices='{json.dumps(DEVICES)}'></select></html>"
+
+
+def _response(status=200, text=PAGE, headers=None):
+    response = Mock()
+    response.status_code = status
+    response.text = text
+    response.headers = headers or {}
+    response.raise_for_status = Mock()
+    return response
+
+
+class TestSpringerCatalog(unittest.TestCase):
+    """Test suite for catalog fetching, memoization and disk caching."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = Path(self.temp_dir) / 'catalog.json'
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_parse_catalog(self):
+        self.assertEqual(parse_catalog(PAGE), DEVICES)
+        self.assertIsNone(parse_catalog('<html></html>'))
+
+    def test_page_fetched_once_for_many_lookups(self):
+        session = MagicMock()
+        session.get.return_value = _response()
+        catalog = SpringerCatalog(session)
+
+        for region in ('GLO', 'EU', 'IN'):
+            get_springer_versions('15', region, catalog=catalog)
+        versions, name = get_springer_versions('15', 'GLO', catalog=catalog)
+
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual(name, 'OP 15')
+        self.assertEqual(versions[0], 'CPH2747_16.0.3.503(EX01)')
+        self.assertIsNone(get_springer_versions('15', 'IN', catalog=catalog))
+
+    def test_resolve_device_prefix_and_case(self):
+        session = MagicMock()
+        session.get.return_value = _response()
+        catalog = SpringerCatalog(session)
+
+        self.assertEqual(catalog.resolve_device('op 15'), 'OP 15')
+        self.assertEqual(catalog.resolve_device('OP 13'), 'OP 13 (PJZ110)')
+        self.assertIsNone(catalog.resolve_device('OP 1'))
+
+    def test_disk_cache_within_ttl(self):
+        session = MagicMock()
+        session.get.return_value = _response(headers={'ETag': '"abc"'})
+        SpringerCatalog(session, cache_path=self.cache_path).load()
+
+        fresh_session = MagicMock()
+        catalog = SpringerCatalog(fresh_session, cache_path=self.cache_path)
+
+        self.assertEqual(catalog.load(), DEVICES)
+        fresh_session.get.assert_not_called()
+
+    def test_stale_cache_revalidated_with_etag(self):
+        self.cache_path.write_text(json.dumps({
+            'fetched_at': time.time() - 7200, 'etag': '"abc"', 'last_modified': None, 'devices': DEVICES,
+        }))
+        session = MagicMock()
+        session.get.return_value = _response(status=304, text='')
+
+        catalog = SpringerCatalog(session, cache_path=self.cache_path)
+
+        self.assertEqual(catalog.load(), DEVICES)
+        self.assertEqual(session.get.call_args[1]['headers']['If-None-Match'], '"abc"')
+        self.assertGreater(json.loads(self.cache_path.read_text())['fetched_at'], time.time() - 60)
+
+    def test_signed_url_from_disk_catalog_loads_page_first(self):
+        SpringerCatalog(MagicMock(get=Mock(return_value=_response())), cache_path=self.cache_path).load()
+        session = MagicMock()
+        session.get.return_value = _response()
+        session.post.return_value = _response(text='<div id="resultBox" data-url="https://dl.example/ota.zip"></div>')
+        catalog = SpringerCatalog(session, cache_path=self.cache_path)
+
+        result = get_signed_url_springer('15', 'GLO', catalog=catalog)
+
+        self.assertEqual(result['url'], 'https://dl.example/ota.zip')
+        # One page load on the session the form is posted with, and only once
+        self.assertEqual(session.get.call_count, 1)
+        self.assertTrue(catalog.prime_session())
+        self.assertEqual(session.get.call_count, 1)
+        self.assertEqual([c[0] for c in session.method_calls], ['get', 'post'])
+
+    def test_default_catalog_uses_pooled_session_and_disk_cache(self):
+        session = MagicMock()
+        with patch('springer_catalog.get_client') as mock_client, \
+                patch.dict('os.environ', {CATALOG_CACHE_ENV: str(self.cache_path)}):
+            mock_client.return_value.session_for.return_value = session
+            catalog = default_catalog()
+        self.assertIs(catalog.session, session)
+        self.assertEqual(catalog.cache_path, self.cache_path)
+
+    def test_signed_url_without_catalog_uses_default_catalog(self):
+        session = MagicMock()
+        session.get.return_value = _response()
+        session.post.return_value = _response(text='<div id="resultBox" data-url="https://dl.example/ota.zip"></div>')
+        with patch('springer_catalog.springer_session', return_value=session), \
+                patch.dict('os.environ', {CATALOG_CACHE_ENV: str(self.cache_path)}):
+            self.assertEqual(get_signed_url_springer('15', 'GLO')['url'], 'https://dl.example/ota.zip')
+        self.assertTrue(self.cache_path.exists())
+
+    def test_fetch_failure_returns_none(self):
+        session = MagicMock()
+        session.get.side_effect = Exception('Network error')
+        self.assertIsNone(SpringerCatalog(session).load())
+
+
+if __name__ == '__main__':
+    unittest.main()
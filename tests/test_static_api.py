@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for static_api.py and its integration into generate_site.py.
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from static_api import API_DIR, build_api, content_hash
+from generate_site import generate, process_data
+
+TEMPLATE_DIR = Path(__file__).parent.parent / 'templates'
+
+
+def make_history(version, archived=()):
+    entries = [{"version": version, "arb": 1, "major": 3, "minor": 0,
+                "first_seen": "2026-02-01", "last_checked": "2026-02-01", "status": "current"}]
+    entries += [{"version": v, "arb": 0, "major": 3, "minor": 0,
+                 "first_seen": "2026-01-01", "last_checked": "2026-01-01", "status": "archived"} for v in archived]
+    return {"history": entries, "device": "OnePlus 15", "device_id": "15", "region": "EU", "model": "CPH2747"}
+
+
+class TestBuildApi(unittest.TestCase):
+    """Test suite for the API tree."""
+
+    def setUp(self):
+        self.files = build_api(process_data({'15_EU': make_history('NEW', ['OLD'])}))
+
+    def test_tree_layout(self):
+        self.assertEqual(sorted(self.files), [f'{API_DIR}/15/EU.json', f'{API_DIR}/index.json', f'{API_DIR}/latest.json'])
+
+    def test_variant_and_latest_documents(self):
+        variant = json.loads(self.files[f'{API_DIR}/15/EU.json'])
+        self.assertEqual(variant['current']['version'], 'NEW')
+        self.assertEqual(variant['current']['arb'], 1)
+        self.assertEqual([e['version'] for e in variant['history']], ['OLD'])
+
+        latest = json.loads(self.files[f'{API_DIR}/latest.json'])
+        self.assertEqual(latest, {'15_EU': variant['current']})
+
+    def test_index_hashes_match_files(self):
+        index = json.loads(self.files[f'{API_DIR}/index.json'])
+        self.assertEqual(index['latest']['sha256'], content_hash(self.files[f'{API_DIR}/latest.json']))
+        region = index['devices'][0]['regions'][0]
+        self.assertEqual(region['sha256'], content_hash(self.files[f"{API_DIR}/{region['path']}"]))
+
+    def test_output_is_stable(self):
+        again = build_api(process_data({'15_EU': make_history('NEW', ['OLD'])}))
+        self.assertEqual(again, self.files)
+
+
+class TestGeneratedApi(unittest.TestCase):
+    """Test suite for the API files written by generate_site."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.history_dir = self.temp_dir / 'history'
+        self.output_dir = self.temp_dir / 'page'
+        self.history_dir.mkdir()
+        (self.history_dir / '15_EU.json').write_text(json.dumps(make_history('NEW'), indent=2))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_api_written_and_pruned(self):
+        generate(self.history_dir, self.output_dir, TEMPLATE_DIR, incremental=True)
+        variant_file = self.output_dir / API_DIR / '15' / 'EU.json'
+        self.assertTrue(variant_file.exists())
+        self.assertTrue((self.output_dir / API_DIR / 'latest.json').exists())
+
+        (self.history_dir / '15_EU.json').unlink()
+        generate(self.history_dir, self.output_dir, TEMPLATE_DIR, incremental=True)
+        self.assertFalse(variant_file.exists())
+        self.assertFalse(variant_file.parent.exists())
+        self.assertEqual(json.loads((self.output_dir / API_DIR / 'latest.json').read_text()), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
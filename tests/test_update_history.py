@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tests for update_history.py batch merge mode.
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from update_history import merge_histories, merge_artifacts, save_history, load_history, fanout_results, main
+
+
+def _entry(version, status='archived', first_seen='2026-01-01', last_checked='2026-01-01', arb=0):
+    return {"version": version, "arb": arb, "major": 3, "minor": 0,
+            "first_seen": first_seen, "last_checked": last_checked, "status": status}
+
+
+def _doc(*entries):
+    return {"history": list(entries), "device": "OnePlus 15", "device_id": "15", "region": "EU", "model": "CPH2747"}
+
+
+class TestMergeHistories(unittest.TestCase):
+    """Test suite for the per-variant conflict rules."""
+
+    def test_union_and_dates(self):
+        base = _doc(_entry('V2', 'current', '2026-02-01', '2026-02-05'), _entry('V1'))
+        incoming = _doc(_entry('V2', 'current', '2026-02-03', '2026-02-10', arb=1), _entry('V0'))
+
+        merged = merge_histories(base, [incoming])
+
+        self.assertEqual([e['version'] for e in merged['history']], ['V2', 'V1', 'V0'])
+        v2 = merged['history'][0]
+        self.assertEqual((v2['first_seen'], v2['last_checked'], v2['arb']), ('2026-02-01', '2026-02-10', 1))
+        self.assertEqual(list(merged), ['history', 'device', 'device_id', 'region', 'model'])
+
+    def test_stale_artifact_cannot_demote_newer_current(self):
+        base = _doc(_entry('V2', 'current', '2026-02-01', '2026-02-01'), _entry('V1', first_seen='2026-01-01'))
+        # A job that started from an older checkout still thinks V1 is current
+        stale = _doc(_entry('V1', 'current', '2026-01-01', '2026-02-02'))
+
+        merged = merge_histories(base, [stale])
+
+        statuses = {e['version']: e['status'] for e in merged['history']}
+        self.assertEqual(statuses, {'V2': 'current', 'V1': 'archived'})
+        self.assertEqual(merged['history'][0]['version'], 'V2')
+
+    def test_order_independent(self):
+        base = _doc(_entry('V1', 'current'))
+        a = _doc(_entry('V2', 'current', '2026-02-01', '2026-02-01'))
+        b = _doc(_entry('V3', 'current', '2026-03-01', '2026-03-01'))
+        first = merge_histories(base, [a, b])
+        second = merge_histories(base, [b, a])
+        self.assertEqual(first['history'][0]['version'], 'V3')
+        self.assertEqual(sum(e['status'] == 'current' for e in first['history']), 1)
+        self.assertEqual({e['version']: e['status'] for e in first['history']},
+                         {e['version']: e['status'] for e in second['history']})
+
+    def test_same_release_spelled_differently(self):
+        base = _doc(_entry('CPH2747_16.0.3.503(EX01)', 'current'))
+        incoming = _doc(_entry('16.0.3.503(EX01)', 'current', last_checked='2026-01-02'))
+        merged = merge_histories(base, [incoming])
+        self.assertEqual(len(merged['history']), 1)
+        self.assertEqual(merged['history'][0]['last_checked'], '2026-01-02')
+
+
+class TestMergeArtifacts(unittest.TestCase):
+    """Test suite for --merge over a downloaded artifacts tree."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.history_dir = self.temp_dir / 'history'
+        self.artifacts = self.temp_dir / 'artifacts'
+        save_history(self.history_dir / '15_EU.json', _doc(_entry('V1', 'current')))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _artifact(self, name, filename, data):
+        path = self.artifacts / name / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data))
+
+    def test_history_and_result_artifacts(self):
+        self._artifact('history-15-EU', '15_EU.json', _doc(_entry('V1', 'current'), _entry('V0')))
+        self._artifact('result-15-GLO', 'result.json', {
+            'arb_index': '1', 'major': '3', 'minor': '0', 'device_short': '15', 'variant': 'GLO', 'version': 'G1'})
+        self._artifact('result-13-EU', 'result.json', {'arb_index': '0', 'major': '3', 'minor': '0'})
+
+        written = merge_artifacts(self.artifacts, self.history_dir)
+
+        self.assertEqual(written, ['15_EU', '15_GLO'])
+        self.assertEqual([e['version'] for e in load_history(self.history_dir / '15_EU.json')['history']], ['V1', 'V0'])
+        glo = load_history(self.history_dir / '15_GLO.json')
+        self.assertEqual(glo['history'][0]['arb'], 1)
+        self.assertEqual(glo['history'][0]['status'], 'current')
+        self.assertEqual(glo['device_id'], '15')
+
+    def test_malformed_result_is_skipped(self):
+        self._artifact('result-15-GLO', 'result.json', {
+            'arb_index': '', 'major': '', 'minor': '', 'device_short': '15', 'variant': 'GLO', 'version': 'G1'})
+        self._artifact('result-15-IN', 'result.json', {
+            'arb_index': '2', 'major': '3', 'minor': '0', 'device_short': '15', 'variant': 'IN', 'version': 'I1'})
+
+        with patch('builtins.print') as mock_print:
+            written = merge_artifacts(self.artifacts, self.history_dir)
+
+        self.assertEqual(written, ['15_IN'])
+        self.assertFalse((self.history_dir / '15_GLO.json').exists())
+        self.assertIn('invalid ARB values', mock_print.call_args_list[0][0][0])
+
+    @patch('update_history.save_history')
+    def test_unchanged_files_not_rewritten(self, mock_save):
+        self._artifact('history-15-EU', '15_EU.json', _doc(_entry('V1', 'current')))
+        self.assertEqual(merge_artifacts(self.artifacts, self.history_dir), [])
+        mock_save.assert_not_called()
+
+    def test_cli_merge(self):
+        self._artifact('history-15-EU', '15_EU.json', _doc(_entry('V1', 'current'), _entry('V0')))
+        argv = ['update_history.py', '--merge', str(self.artifacts), '--history-dir', str(self.history_dir)]
+        with patch('sys.argv', argv), patch('builtins.print'):
+            main()
+        self.assertEqual(len(load_history(self.history_dir / '15_EU.json')['history']), 2)
+
+    def test_fanout_results_merge_into_each_variant(self):
+        result = {"arb_index": "1", "major": "3", "minor": "0",
+                  "device_short": "15", "variant": "GLO", "version": "CPH2747_16.0.3.503(EX01)"}
+        targets = [{"device_short": "15", "variant": "EU", "version": "CPH2747_16.0.3.503(EX01)"}]
+        written = fanout_results(result, targets, self.artifacts / 'fanout-15-GLO')
+        self.assertEqual([p.name for p in written], ['result_15_EU.json'])
+        self.assertEqual(fanout_results(result, None, self.artifacts / 'none'), [])
+
+        self.assertEqual(merge_artifacts(self.artifacts, self.history_dir), ['15_EU'])
+        entry = load_history(self.history_dir / '15_EU.json')['history'][0]
+        self.assertEqual((entry['version'], entry['arb'], entry['status']), ('CPH2747_16.0.3.503(EX01)', 1, 'current'))
+
+    def test_save_history_is_atomic(self):
+        target = self.history_dir / '15_EU.json'
+        with patch('update_history.json.dump', side_effect=ValueError('boom')):
+            with self.assertRaises(ValueError):
+                save_history(target, _doc())
+        self.assertEqual(load_history(target)['history'][0]['version'], 'V1')
+        self.assertEqual(list(self.history_dir.iterdir()), [target])
+
+
+if __name__ == '__main__':
+    unittest.main()
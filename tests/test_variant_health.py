@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for variant_health.py
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from variant_health import (VariantHealth, available_entries, backoff_days, load_outcomes,
+                            OK, FETCH_FAILED, NON_ZIP_URL, EXTRACTION_FAILED)
+
+ENTRIES = [{"device": "9R", "variant": "IN"}, {"device": "15", "variant": "EU"}]
+
+
+class TestVariantHealth(unittest.TestCase):
+    """Test suite for outcome recording, backoff and probes."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.path = self.temp_dir / 'variant_health.json'
+        self.health = VariantHealth(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_backoff_doubles_up_to_cap(self):
+        self.assertEqual([backoff_days(n) for n in (1, 2, 3, 4, 5, 6, 10)], [1, 2, 4, 8, 16, 30, 30])
+
+    def test_consecutive_failures_back_off(self):
+        for _ in range(3):
+            self.health.record("9R_IN", FETCH_FAILED, at="2026-10-01T00:05:00+00:00")
+        state = self.health.entries["9R_IN"]
+        self.assertEqual(state['failures'], 3)
+        self.assertEqual(state['next_probe'], "2026-10-05")
+
+        self.assertTrue(self.health.is_backing_off("9R_IN", date(2026, 10, 4)))
+        self.assertFalse(self.health.is_backing_off("9R_IN", date(2026, 10, 5)))
+        self.assertEqual(available_entries(ENTRIES, self.health, date(2026, 10, 4)), [ENTRIES[1]])
+
+    def test_success_clears_failures(self):
+        self.health.record("9R_IN", EXTRACTION_FAILED, "V1", "boom", at="2026-10-01T00:00:00+00:00")
+        self.health.record("9R_IN", OK, "V2", at="2026-10-02T00:00:00+00:00")
+        state = self.health.entries["9R_IN"]
+        self.assertEqual((state['failures'], state['last_outcome'], state['version']), (0, OK, "V2"))
+        self.assertNotIn('next_probe', state)
+        self.assertFalse(self.health.is_backing_off("9R_IN", date(2026, 10, 1)))
+
+    def test_probe_rejects_variants_that_would_fail_again(self):
+        self.health.record("9R_IN", NON_ZIP_URL, "V1")
+        self.health.record("13_CN", EXTRACTION_FAILED, "CPH2653_15.0.0.700(CN01)")
+        self.health.record("15_EU", FETCH_FAILED)
+
+        self.assertFalse(self.health.probe("9R_IN", "IN", {'url': 'https://x/page', 'version': 'V2'}))
+        self.assertTrue(self.health.probe("9R_IN", "IN", {'url': 'https://x/fw.zip', 'version': 'V2'}))
+        # Same release spelled without the model prefix is still the package that failed
+        self.assertFalse(self.health.probe("13_CN", "CN", {'url': 'https://x/fw.zip', 'version': '15.0.0.700(CN01)'}))
+        self.assertTrue(self.health.probe("13_CN", "CN", {'url': 'https://x/fw.zip', 'version': 'CPH2653_15.0.0.800(CN01)'}))
+        self.assertFalse(self.health.probe("15_EU", "EU", None))
+        # Healthy variants are never probed
+        self.assertTrue(self.health.probe("12_EU", "EU", None))
+
+        self.assertEqual(self.health.entries["9R_IN"]['failures'], 2)
+        self.assertEqual(self.health.entries["13_CN"]['failures'], 2)
+        self.assertEqual(self.health.entries["15_EU"]['failures'], 2)
+
+    def test_merge_outcome_artifacts_and_save(self):
+        for name, records in (("outcome-9R-IN", [{"key": "9R_IN", "outcome": OK, "version": "V2",
+                                                   "at": "2026-10-02T00:00:00+00:00"}]),
+                              ("outcome-probes", [{"key": "9R_IN", "outcome": FETCH_FAILED,
+                                                   "at": "2026-10-01T00:00:00+00:00"}])):
+            (self.temp_dir / name).mkdir()
+            (self.temp_dir / name / 'outcome.json').write_text(json.dumps(records))
+
+        records = load_outcomes(self.temp_dir)
+        self.assertEqual(len(records), 2)
+        self.health.merge(records)
+        self.health.save()
+
+        # Applied oldest first, so the later success wins
+        saved = json.loads(self.path.read_text())
+        self.assertEqual((saved["9R_IN"]['failures'], saved["9R_IN"]['last_outcome']), (0, OK))
+
+
+if __name__ == '__main__':
+    unittest.main()
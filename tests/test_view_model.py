@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for view_model.py
+"""
+
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import view_model
+from view_model import build_view_model, get_view_model, ordered_devices
+
+
+def _entry(version, status='archived', last_checked='2026-01-01', arb=0):
+    return {"version": version, "arb": arb, "major": 3, "minor": 0, "last_checked": last_checked, "status": status}
+
+
+HISTORY = {
+    "15_CN": {"model": "PLK110", "history": [_entry('C1', 'current')]},
+    "15_TH": {"model": "CPH2747", "history": [_entry('T1', 'current')]},
+    "15_GLO": {"model": "CPH2747", "history": [
+        _entry('G1', last_checked='2026-01-01'),
+        _entry('G3', 'current', '2026-03-01'),
+        _entry('G2', last_checked='2026-02-01'),
+    ]},
+    "15_AE": {"model": "CPH2747", "history": [_entry('A1')]},
+    "15_EU": {"model": "CPH2747", "history": []},
+    "Unknown Device_GLO": {"history": [_entry('X1', 'current')]},
+}
+
+
+class TestViewModel(unittest.TestCase):
+    """Test suite for the shared history aggregation."""
+
+    def test_variant_order_current_and_history(self):
+        device = build_view_model(HISTORY)['15']
+
+        self.assertEqual([v['region'] for v in device['variants']], ['GLO', 'CN', 'AE', 'TH'])
+        glo = device['variants'][0]
+        self.assertEqual(glo['current']['version'], 'G3')
+        self.assertEqual([e['version'] for e in glo['history']], ['G2', 'G1'])
+        # No 'current' marker: first entry is used
+        self.assertEqual(device['variants'][2]['current']['version'], 'A1')
+
+    def test_devices_follow_config_and_ignore_unknown(self):
+        view = build_view_model(HISTORY)
+        self.assertNotIn('Unknown Device', view)
+        self.assertEqual(ordered_devices(view)[0]['id'], '15')
+        self.assertEqual(view['13']['variants'], [])
+
+    def test_memoized_by_history_hash(self):
+        with patch('view_model.build_view_model', wraps=view_model.build_view_model) as mock_build:
+            first = get_view_model(HISTORY)
+            second = get_view_model(dict(HISTORY))
+            self.assertIs(first, second)
+            self.assertEqual(mock_build.call_count, 1)
+
+            get_view_model({"15_GLO": HISTORY["15_GLO"]})
+            self.assertEqual(mock_build.call_count, 2)
+
+    def test_site_and_readme_share_one_build(self):
+        from generate_site import process_data
+        from generate_readme import generate_readme
+        history = {"15_GLO": HISTORY["15_GLO"], "15_IN": {"model": "CPH2745", "history": [_entry('I1', 'current')]}}
+
+        with patch('view_model.build_view_model', wraps=view_model.build_view_model) as mock_build:
+            devices = process_data(history)
+            readme = generate_readme(history)
+
+        self.assertEqual(mock_build.call_count, 1)
+        self.assertEqual([v['region_name'] for v in devices[0]['variants']], ['Global', 'India'])
+        self.assertIn('| Global | CPH2747 | G3 |', readme)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -284,7 +284,7 @@ class TestWorkflowValidation(unittest.TestCase):
         run_commands = generate_step['run']
         self.assertIn('data/history', run_commands)
         self.assertIn('generate_readme.py', run_commands)
-        self.assertIn('find artifacts', run_commands)
+        self.assertIn('update_history.py --merge artifacts', run_commands)
 
     def test_commit_and_push_step(self):
         """Test commit and push step configuration."""
@@ -3,13 +3,17 @@
 Update JSON history files with new ARB check results.
 """
 
+import os
 import json
 import argparse
 import sys
+import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional
 from config import DEVICE_METADATA, get_display_name, get_model_number
+from history_store import open_store
+from firmware_version import version_key, version_sort_key
 
 def load_history(history_file: Path) -> Dict:
     """Load existing history JSON or create new structure."""
@@ -19,10 +23,33 @@ def load_history(history_file: Path) -> Dict:
     return {"history": []}
 
 def save_history(history_file: Path, data: Dict):
-    """Save history JSON."""
+    """Save history JSON atomically (temp file in the same directory, then rename)."""
     history_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(history_file, 'w') as f:
-        json.dump(data, f, indent=2)
+    fd, tmp = tempfile.mkstemp(dir=history_file.parent, prefix=f".{history_file.name}.")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, history_file)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def init_metadata(history: Dict, device_short: str, variant: str, version: Optional[str]):
+    """Fill device/device_id/region/model for a new history file."""
+    if history.get('device'):
+        return
+    history['device'] = get_display_name(device_short)
+    history['device_id'] = device_short
+    history['region'] = variant
+    
+    model_num = get_model_number(device_short, variant)
+    if model_num == "Unknown" and version and "_" in version:
+        # Try to extract from version string (e.g., PKG110_16...)
+        extracted = version.split("_")[0]
+        if extracted.isalnum() and len(extracted) > 3:
+            model_num = extracted
+    
+    history['model'] = model_num
 
 def update_history_entry(history: Dict, version: str, arb: int, major: int, minor: int, is_historical: bool = False) -> bool:
     """
@@ -30,9 +57,10 @@ def update_history_entry(history: Dict, version: str, arb: int, major: int, mino
     """
     today = datetime.now().strftime("%Y-%m-%d")
     
-    # Check if version already exists
+    # Check if version already exists (same release, even if spelled differently upstream)
+    key = version_key(version)
     for entry in history['history']:
-        if entry['version'] == version:
+        if version_key(entry['version']) == key:
             entry['last_checked'] = today
             if not is_historical and entry['status'] == 'archived':
                 # Promote to current
@@ -68,6 +96,147 @@ def update_history_entry(history: Dict, version: str, arb: int, major: int, mino
         history['history'].append(new_entry)
         return False
 
+def _current_rank(entry: Dict):
+    """Newest release wins the single 'current' slot; ties broken deterministically."""
+    return (entry.get('first_seen', ''), entry.get('last_checked', ''), version_sort_key(entry.get('version', '')))
+
+def merge_histories(base: Dict, incoming: List[Dict]) -> Dict:
+    """
+    Merge history documents for one variant.
+    - Versions are unioned; existing entries keep their position, new ones are appended.
+    - first_seen is the earliest, last_checked the latest; arb/major/minor come from the latest check.
+    - Exactly one entry is 'current' (the newest release any input marked current) and it goes first.
+    """
+    merged = {k: v for k, v in base.items() if k != 'history'}
+    entries = {}
+    order = []
+    marked_current = []
+
+    for doc in [base] + incoming:
+        for key, value in doc.items():
+            if key != 'history' and merged.get(key) in (None, '', 'Unknown'):
+                merged[key] = value
+        for entry in doc.get('history', []):
+            version = version_key(entry['version'])
+            if entry.get('status') == 'current':
+                marked_current.append(version)
+            existing = entries.get(version)
+            if existing is None:
+                entries[version] = dict(entry)
+                order.append(version)
+                continue
+            seen = [d for d in (existing.get('first_seen'), entry.get('first_seen')) if d]
+            if entry.get('last_checked', '') > existing.get('last_checked', ''):
+                existing.update({k: v for k, v in entry.items() if k != 'status'})
+            if seen:
+                existing['first_seen'] = min(seen)
+
+    current = max((entries[v] for v in set(marked_current)), key=_current_rank, default=None)
+    history = []
+    for version in order:
+        entry = entries[version]
+        entry['status'] = 'current' if entry is current else 'archived'
+        history.append(entry)
+    if current is not None:
+        history.remove(current)
+        history.insert(0, current)
+
+    # Keep the on-disk key order: history first, then metadata
+    return {'history': history, **{k: v for k, v in merged.items() if k != 'history'}}
+
+def result_to_history(data: Dict, today: str) -> Optional[Dict]:
+    """
+    Turn a self-describing result.json (device_short, variant, version, arb_index...) into a history doc.
+    Returns None if it is not a result; raises ValueError if its ARB fields are not numbers.
+    """
+    device_short, variant, version = data.get('device_short'), data.get('variant'), data.get('version')
+    arb = data.get('arb_index') if data.get('arb_index') is not None else data.get('arb')
+    if not all([device_short, variant, version, arb is not None]):
+        return None
+    try:
+        arb, major, minor = int(arb), int(data.get('major', 0)), int(data.get('minor', 0))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid ARB values (arb_index={arb!r}, major={data.get('major')!r}, minor={data.get('minor')!r})")
+    history = {"history": [{
+        "version": version,
+        "arb": arb,
+        "major": major,
+        "minor": minor,
+        "first_seen": today,
+        "last_checked": today,
+        "status": "archived" if data.get('historical') else "current"
+    }]}
+    init_metadata(history, device_short, variant, version)
+    return history
+
+def merge_artifacts(artifacts_dir: Path, history_dir: Path, store=None) -> List[str]:
+    """
+    Merge every history JSON and result.json under artifacts_dir into history_dir in one pass
+    (see merge_documents). Returns the keys of the files written.
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    incoming = {}
+    for path in sorted(Path(artifacts_dir).rglob('*.json')):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable artifact {path}: {e}")
+            continue
+        if not isinstance(data, dict):
+            continue
+        if 'history' in data:
+            incoming.setdefault(path.stem, []).append(data)
+            continue
+        try:
+            doc = result_to_history(data, today)
+        except ValueError as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        if doc is None:
+            print(f"Skipping {path}: not a history file or self-describing result")
+            continue
+        incoming.setdefault(f"{data['device_short']}_{data['variant']}", []).append(doc)
+
+    return merge_documents(incoming, history_dir, store)
+
+def merge_documents(incoming: Dict[str, List[Dict]], history_dir: Path, store=None) -> List[str]:
+    """
+    Merge {"<device>_<variant>": [history doc, ...]} into history_dir.
+    Each variant file is written at most once (atomically) and only if it changed.
+    Returns the keys of the files written.
+    """
+    written = []
+    for key in sorted(incoming):
+        history_file = Path(history_dir) / f"{key}.json"
+        base = load_history(history_file)
+        merged = merge_histories(base, incoming[key])
+        if merged == base:
+            continue
+        save_history(history_file, merged)
+        if store:
+            store.put_variant(key, merged)
+        written.append(key)
+    return written
+
+def fanout_results(result: Dict, targets: Optional[List[Dict]], out_dir: Path, historical: bool = False) -> List[Path]:
+    """
+    Write one self-describing result per fan-out target ({device_short, variant, version}),
+    for variants that share the analyzed firmware package (see generate_matrix.group_by_firmware).
+    The files are picked up by --merge like any other result artifact.
+    """
+    written = []
+    for target in targets or []:
+        data = {**result, **{k: target[k] for k in ('device_short', 'variant', 'version')}}
+        if historical:
+            data['historical'] = True
+        path = Path(out_dir) / f"result_{target['device_short']}_{target['variant']}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        written.append(path)
+    return written
+
 def main():
     parser = argparse.ArgumentParser(description="Update firmware history JSON.")
     
@@ -83,9 +252,35 @@ def main():
     parser.add_argument("--json-file", help="Path to result.json containing the data")
     
     parser.add_argument("--historical", action="store_true", help="Flag to indicate historical data backfill")
+    parser.add_argument("--db", help="Also keep this SQLite history store in sync (defaults to $HISTORY_DB)")
+    
+    # Mode 3: Batch merge of downloaded workflow artifacts
+    parser.add_argument("--merge", metavar="ARTIFACTS_DIR", help="Merge all history/result JSON files under a directory")
+    parser.add_argument("--history-dir", default="data/history", help="History directory for --merge")
+    
+    # Mode 4: Copy a result to variants sharing the same firmware package
+    parser.add_argument("--fanout", metavar="TARGETS_JSON", help="JSON list of {device_short, variant, version} to copy --json-file to")
+    parser.add_argument("--fanout-dir", default="fanout", help="Output directory for --fanout results")
     
     args = parser.parse_args()
     
+    if args.fanout is not None:
+        if not args.json_file:
+            parser.error("--fanout requires --json-file")
+        with open(args.json_file, 'r') as f:
+            result = json.load(f)
+        written = fanout_results(result, json.loads(args.fanout or 'null'), Path(args.fanout_dir), args.historical)
+        print(f"Wrote {len(written)} fan-out result(s)")
+        return
+    
+    if args.merge:
+        store = open_store(args.db)
+        written = merge_artifacts(Path(args.merge), Path(args.history_dir), store)
+        if store:
+            store.close()
+        print(f"Merged artifacts into {len(written)} history file(s)")
+        return
+    
     # Data extraction logic
     device_short = args.device_short
     variant = args.variant
@@ -119,24 +314,16 @@ def main():
         sys.exit(1)
 
     history_file = Path(f"data/history/{device_short}_{variant}.json")
+    store = open_store(args.db)
+    # The committed JSON is the source of truth; the store only mirrors it
     history = load_history(history_file)
-    
-    if not history.get('device'):
-        history['device'] = get_display_name(device_short)
-        history['device_id'] = device_short
-        history['region'] = variant
-        
-        model_num = get_model_number(device_short, variant)
-        if model_num == "Unknown" and version and "_" in version:
-            # Try to extract from version string (e.g., PKG110_16...)
-            extracted = version.split("_")[0]
-            if extracted.isalnum() and len(extracted) > 3:
-                model_num = extracted
-        
-        history['model'] = model_num
+    init_metadata(history, device_short, variant, version)
     
     is_new = update_history_entry(history, version, int(arb), int(major), int(minor), args.historical)
     save_history(history_file, history)
+    if store:
+        store.put_variant(history_file.stem, history)
+        store.close()
     
     if is_new:
         print(f"Added new version: {version}")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Per-variant check outcomes and failure backoff.
+
+Every check records an outcome (ok, fetch_failed, non_zip_url, download_failed,
+extraction_failed) in data/variant_health.json. A variant that keeps failing
+is backed off exponentially (1, 2, 4 ... up to 30 days after its last failure)
+and left out of the matrix until its next probe date. When a probe is due, the
+cheap upstream resolution that generate_matrix.py runs anyway decides whether
+a full job is worth it: a variant that still cannot be resolved, still only
+offers a non-zip link, or still lists the package that failed extraction is
+recorded as failing again without spending a runner. The first successful
+check clears the failure count.
+
+In CI each job writes its outcomes to outcome.json (a JSON list, uploaded as an
+artifact) and update-readme folds them into the store with --merge.
+"""
+
+import json
+import argparse
+import logging
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from firmware_version import same_version
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = "data/variant_health.json"
+OUTCOME_FILE = "outcome.json"
+
+OK = "ok"
+FETCH_FAILED = "fetch_failed"
+NON_ZIP_URL = "non_zip_url"
+DOWNLOAD_FAILED = "download_failed"
+EXTRACTION_FAILED = "extraction_failed"
+OUTCOMES = (OK, FETCH_FAILED, NON_ZIP_URL, DOWNLOAD_FAILED, EXTRACTION_FAILED)
+
+BACKOFF_BASE_DAYS = 1
+MAX_BACKOFF_DAYS = 30
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def backoff_days(failures: int) -> int:
+    """Days to wait before probing a variant again after its n-th consecutive failure."""
+    return min(BACKOFF_BASE_DAYS * 2 ** (max(failures, 1) - 1), MAX_BACKOFF_DAYS)
+
+
+def is_direct_url(url: Optional[str], region: str) -> bool:
+    """Same rule as the workflow's Download Firmware step: zips, or CN links (downloaded as-is)."""
+    return bool(url) and ('.zip' in url or region == "CN")
+
+
+class VariantHealth:
+    """Outcome history keyed by "<device>_<region>" (path=None for in-memory); new records are kept in `pending`."""
+
+    def __init__(self, path=HEALTH_PATH):
+        self.path = Path(path) if path else None
+        self.entries: Dict[str, Dict] = {}
+        self.pending: List[Dict] = []
+        if self.path and self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable health store {self.path}: {e}")
+
+    def failures(self, key: str) -> int:
+        return self.entries.get(key, {}).get('failures', 0)
+
+    def is_backing_off(self, key: str, today: date) -> bool:
+        next_probe = self.entries.get(key, {}).get('next_probe')
+        return self.failures(key) > 0 and next_probe is not None and next_probe > today.isoformat()
+
+    def record(self, key: str, outcome: str, version: Optional[str] = None,
+               detail: Optional[str] = None, at: Optional[str] = None):
+        if outcome not in OUTCOMES:
+            raise ValueError(f"Unknown outcome: {outcome}")
+        at = at or _now()
+        state = self.entries.setdefault(key, {'failures': 0})
+        if outcome == OK:
+            state.update(failures=0, last_outcome=OK, last_success=at, version=version)
+            state.pop('next_probe', None)
+            state.pop('detail', None)
+        else:
+            failures = state.get('failures', 0) + 1
+            next_probe = date.fromisoformat(at[:10]) + timedelta(days=backoff_days(failures))
+            state.update(failures=failures, last_outcome=outcome, last_failure=at,
+                         next_probe=next_probe.isoformat(), detail=detail)
+            if version:
+                state['version'] = version
+            logger.info(f"{key}: {outcome} ({failures} in a row), next probe {next_probe}")
+        self.pending.append({'key': key, 'outcome': outcome, 'version': version, 'detail': detail, 'at': at})
+
+    def probe(self, key: str, region: str, info: Optional[Dict]) -> bool:
+        """
+        Cheap re-probe of a failing variant from its resolved latest firmware (url/version).
+        Returns False, recording another failure, if a full check would fail the same way.
+        Healthy variants always pass.
+        """
+        state = self.entries.get(key)
+        if not state or not state.get('failures'):
+            return True
+        version = info.get('version') if info else None
+        last = state.get('last_outcome')
+        if not version:
+            self.record(key, FETCH_FAILED, detail="probe: latest firmware could not be resolved")
+            return False
+        if last == NON_ZIP_URL and not is_direct_url(info.get('url'), region):
+            self.record(key, NON_ZIP_URL, version, detail="probe: still no direct download link")
+            return False
+        if last == EXTRACTION_FAILED and same_version(version, state.get('version') or ''):
+            self.record(key, EXTRACTION_FAILED, version, detail="probe: same package as the failed check")
+            return False
+        logger.info(f"{key}: probe passed after {last}, scheduling a full check")
+        return True
+
+    def merge(self, records: List[Dict]):
+        """Apply outcome records (e.g. from CI artifacts) in timestamp order."""
+        for rec in sorted(records, key=lambda r: r.get('at') or ''):
+            self.record(rec['key'], rec['outcome'], rec.get('version'), rec.get('detail'), rec.get('at'))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+
+    def write_outcomes(self, path=OUTCOME_FILE):
+        with open(path, 'w') as f:
+            json.dump(self.pending, f, indent=2)
+
+
+def available_entries(entries: List[Dict], health: VariantHealth, today: date) -> List[Dict]:
+    """Matrix entries that are not in a failure backoff window."""
+    kept = [e for e in entries if not health.is_backing_off(f"{e['device']}_{e['variant']}", today)]
+    if len(kept) < len(entries):
+        logger.info(f"Failure backoff: skipping {len(entries) - len(kept)} of {len(entries)} variants")
+    return kept
+
+
+def load_outcomes(artifacts_dir: Path) -> List[Dict]:
+    """Outcome records from every outcome.json under a directory of downloaded artifacts."""
+    records = []
+    for path in sorted(Path(artifacts_dir).rglob(OUTCOME_FILE)):
+        try:
+            with open(path, 'r') as f:
+                records.extend(json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Skipping unreadable outcome file {path}: {e}")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record check outcomes and show failure backoff.")
+    parser.add_argument("device_id", nargs="?", help="Device ID (with --outcome)")
+    parser.add_argument("region", nargs="?", help="Region code (with --outcome)")
+    parser.add_argument("--outcome", choices=OUTCOMES, help="Write one check outcome to --output")
+    parser.add_argument("--version", help="Firmware version the outcome refers to")
+    parser.add_argument("--detail", help="Short failure description")
+    parser.add_argument("--fanout", help="JSON list of {device_short, variant} sharing the same package")
+    parser.add_argument("--output", default=OUTCOME_FILE, help="Outcome file for --outcome")
+    parser.add_argument("--merge", metavar="ARTIFACTS_DIR", help="Fold every outcome.json under a directory into the store")
+    parser.add_argument("--store", default=HEALTH_PATH, help="Health store file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    if args.outcome:
+        if not args.device_id or not args.region:
+            parser.error("--outcome requires device_id and region")
+        # In-memory store: only the outcome records are written
+        health = VariantHealth(None)
+        targets = [(args.device_id, args.region)]
+        targets += [(t['device_short'], t['variant']) for t in json.loads(args.fanout or 'null') or []]
+        for device_id, region in targets:
+            health.record(f"{device_id}_{region}", args.outcome, args.version or None, args.detail)
+        health.write_outcomes(args.output)
+        return
+
+    health = VariantHealth(args.store)
+    if args.merge:
+        records = load_outcomes(Path(args.merge))
+        health.merge(records)
+        health.save()
+        logger.info(f"Merged {len(records)} outcome(s) into {args.store}")
+        return
+
+    today = date.today()
+    for key, state in sorted(health.entries.items()):
+        if state.get('failures'):
+            status = "backing off" if health.is_backing_off(key, today) else "probe due"
+            print(f"{key:24} {state.get('last_outcome'):18} x{state['failures']:<3} {status:12} next probe {state.get('next_probe')}")
+
+
+if __name__ == "__main__":
+    main()
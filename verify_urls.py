@@ -1,6 +1,5 @@
-
 import json
-import subprocess
+from fetch_firmware import fetch_all
 from config import DEVICE_METADATA
 
 def verify_firmware():
@@ -9,32 +8,24 @@ def verify_firmware():
         "missing": []
     }
     
+    # Resolve every variant concurrently in-process instead of one subprocess per variant
+    resolved = fetch_all()
+    
     for device_id, meta in DEVICE_METADATA.items():
         name = meta["name"]
         print(f"Checking {name} ({device_id})...")
         for region in meta["models"].keys():
-            print(f"  Region: {region}...", end=" ", flush=True)
-            try:
-                # Use fetch_firmware.py to check
-                # We use --json to get structured output
-                cmd = ["python", "fetch_firmware.py", device_id, region, "--json"]
-                process = subprocess.run(cmd, capture_output=True, text=True)
-                
-                if process.returncode == 0:
-                    data = json.loads(process.stdout)
-                    if data.get("url"):
-                        print("OK")
-                        results["found"].append(f"{device_id}_{region}")
-                    else:
-                        print("MISSING URL")
-                        results["missing"].append(f"{device_id}_{region}")
-                else:
-                    print(f"FAILED (Exit {process.returncode})")
-                    results["missing"].append(f"{device_id}_{region}")
-                    
-            except Exception as e:
-                print(f"ERROR: {e}")
-                results["missing"].append(f"{device_id}_{region}")
+            key = f"{device_id}_{region}"
+            data = resolved.get(key)
+            if not data:
+                print(f"  Region: {region}... FAILED")
+                results["missing"].append(key)
+            elif data.get("url"):
+                print(f"  Region: {region}... OK")
+                results["found"].append(key)
+            else:
+                print(f"  Region: {region}... MISSING URL")
+                results["missing"].append(key)
                 
     return results
 
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Shared view model for generate_site.py and generate_readme.py.
+
+History data ({"<device>_<region>": history_doc}) is grouped by device in a
+single pass; each variant gets its current entry and its older entries sorted
+newest release first (firmware_version.version_sort_key). Results are memoized
+by a hash of the history input so both generators (or repeated calls) reuse
+the same aggregation.
+"""
+
+import json
+import hashlib
+from typing import Dict, List, Optional
+
+from config import DEVICE_ORDER, DEVICE_METADATA
+from firmware_version import version_sort_key
+
+PREFERRED_REGION_ORDER = ['GLO', 'EU', 'IN', 'NA', 'VISIBLE', 'CN']
+
+_cache = {}
+
+
+def region_sort_key(region: str):
+    """Preferred regions first, everything else alphabetically after."""
+    try:
+        return PREFERRED_REGION_ORDER.index(region), region
+    except ValueError:
+        return len(PREFERRED_REGION_ORDER), region
+
+
+def history_digest(history_data: Dict) -> str:
+    """Stable hash of the history input."""
+    return hashlib.sha256(json.dumps(history_data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def build_variant(region: str, data: Dict) -> Optional[Dict]:
+    """Current entry plus sorted older entries for one history document, or None if it has no entries."""
+    entries = data.get('history', [])
+    current = next((e for e in entries if e.get('status') == 'current'), None)
+    if current is None and entries:
+        current = entries[0]
+    if current is None:
+        return None
+
+    history = [e for e in entries if e.get('status') != 'current']
+    # Newest release first (parsed version order, then date)
+    history.sort(key=lambda x: (version_sort_key(x.get('version', '')), x.get('last_checked', '')), reverse=True)
+    return {
+        'region': region,
+        'model': data.get('model', 'Unknown'),
+        'current': current,
+        'history': history,
+    }
+
+
+def build_view_model(history_data: Dict) -> Dict[str, Dict]:
+    """
+    {device_id: {'id', 'name', 'variants': [variant, ...]}} for every device in DEVICE_METADATA,
+    in DEVICE_ORDER. Variants are ordered by region preference; devices without data have none.
+    """
+    by_device = {}
+    for key, data in history_data.items():
+        device_id, _, region = key.rpartition('_')
+        by_device.setdefault(device_id, {})[region] = data
+
+    ordered_ids = [d for d in DEVICE_ORDER if d in DEVICE_METADATA]
+    ordered_ids += [d for d in DEVICE_METADATA if d not in ordered_ids]
+
+    view = {}
+    for device_id in ordered_ids:
+        meta = DEVICE_METADATA[device_id]
+        documents = by_device.get(device_id, {})
+        variants = []
+        for region in sorted(documents, key=region_sort_key):
+            variant = build_variant(region, documents[region])
+            if variant:
+                variants.append(variant)
+        view[device_id] = {'id': device_id, 'name': meta['name'], 'variants': variants}
+    return view
+
+
+def get_view_model(history_data: Dict) -> Dict[str, Dict]:
+    """Memoized build_view_model keyed by the history hash."""
+    digest = history_digest(history_data)
+    if digest not in _cache:
+        _cache.clear()
+        _cache[digest] = build_view_model(history_data)
+    return _cache[digest]
+
+
+def ordered_devices(view: Dict[str, Dict]) -> List[Dict]:
+    """Devices listed in DEVICE_ORDER, in that order."""
+    return [view[d] for d in DEVICE_ORDER if d in view]